@@ -44,6 +44,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so the total time includes all the other middleware (does nothing when `GOLEAVE_REQUEST_TIMING` is off)
+    'main_app.middleware.RequestTimingMiddleware',
+    'main_app.middleware.MetricsMiddleware',
+    'main_app.middleware.ReplicaStickinessMiddleware', # does nothing when `GOLEAVE_READ_REPLICAS` is empty
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -108,6 +112,105 @@ DATABASES = {
     }
 }
 
+# DB connections (reused, NOT opened for every request)
+# Source: `https://docs.djangoproject.com/en/5.2/ref/databases/#connection-pool`
+# 1. Connection pool (needs psycopg 3: `pip install "psycopg[binary,pool]"`): every worker process keeps
+#    between `min_size` and `max_size` open connections, a request borrows one and gives it back when it ends.
+#    Works with WSGI and ASGI. Under ASGI an async view may borrow one connection for every query it runs at the same time,
+#    so `max_size` should cover (concurrent requests x their queries). Numbers of the pool: `/metrics` (`goleave_db_pool_*`).
+GOLEAVE_DB_POOL = {
+    'min_size': 2,
+    'max_size': 10,
+    'max_lifetime': 60 * 30, # seconds, older connections are closed and replaced
+    'max_idle': 60 * 5, # seconds, unused connections above `min_size` are closed
+    'timeout': 10, # seconds to wait for a free connection before the request fails
+}
+# 2. Without psycopg 3 (psycopg2): persistent connections, one for every worker thread, kept for this time (seconds)
+GOLEAVE_DB_CONN_MAX_AGE = 60
+
+try:
+    import psycopg_pool # noqa: F401
+except ImportError:
+    DATABASES['default']['CONN_MAX_AGE'] = GOLEAVE_DB_CONN_MAX_AGE
+else:
+    DATABASES['default']['OPTIONS'] = {'pool': GOLEAVE_DB_POOL} # `CONN_MAX_AGE` must stay 0 with a pool
+# check the connection before it is used (pool: when it is borrowed, persistent: at the start of every request)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+
+# Cache (used for the dashboard stats and the employees leave balances)
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# NOTE: the version stamps of the cached data (leave types, working days, dashboard, balances) and the read replicas pin
+# must be seen by ALL the worker processes: with more than one worker (gunicorn / uwsgi) use a shared cache (2.),
+# `python manage.py check --deploy` warns about a per-process cache (`main_app/checks.py`)
+
+# 1. Local memory (one process only, e.g. `runserver`: every worker process has its own cache)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'goleave',
+    }
+}
+
+# 2. Redis (many servers/workers share the same cache, so the invalidations reach all of them)
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://127.0.0.1:6379',
+#     }
+# }
+
+
+# Working days (used to calculate `total_days` of the leave requests)
+# one character for every day from Monday to Sunday: '1' = working day, '0' = weekend
+# Source: `https://numpy.org/doc/stable/reference/generated/numpy.busdaycalendar.html`
+GOLEAVE_WEEKMASK = '1111001' # Sunday - Thursday (weekend: Friday & Saturday)
+
+
+# Request timing (`main_app/middleware.py`): SQL / auth / serializer / view time
+# in the `Server-Timing` header and in the `goleave.requests` log
+GOLEAVE_REQUEST_TIMING = False
+GOLEAVE_SLOW_REQUEST_MS = 500 # slower requests are logged as warnings with their top SQL statements
+GOLEAVE_SLOW_REQUEST_TOP_SQL = 5
+
+# Prometheus metrics (`GET /metrics`, `main_app/metrics.py`)
+GOLEAVE_METRICS = True
+# with more than one worker process: a directory shared by all of them (e.g. '/tmp/goleave-metrics'),
+# empty it when the server is restarted
+GOLEAVE_METRICS_DIR = None
+GOLEAVE_METRICS_TOKEN = None # if set, `/metrics` needs `Authorization: Bearer <token>`
+
+# Read replicas (`main_app/replicas.py`): aliases of `DATABASES` that are read-only copies of 'default',
+# the reads of GET requests go to them. e.g. add to `DATABASES`:
+#     'replica': {
+#         'ENGINE': 'django.db.backends.postgresql',
+#         'NAME': 'GoLeave',
+#         'HOST': 'replica.example.com',
+#         ...
+#         'TEST': {'MIRROR': 'default'}, # the tests use 'default' for it
+#     },
+# and set `GOLEAVE_READ_REPLICAS = ['replica']`
+GOLEAVE_READ_REPLICAS = []
+GOLEAVE_REPLICA_STICKY_SECONDS = 10 # after a write (or a login), the reads of the user go to the primary for this time
+DATABASE_ROUTERS = ['main_app.replicas.ReadReplicaRouter']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'goleave': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -153,9 +256,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT with `employee_id` and `role` claims (NO DB query per request)
+        'main_app.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+}
+
+SIMPLE_JWT = {
+    # add `employee_id` and `role` claims to the tokens of `login/`
+    'TOKEN_OBTAIN_SERIALIZER': 'main_app.authentication.GoLeaveTokenObtainPairSerializer',
+    # read the claims again (role changes, inactive users) on `token/refresh/`
+    'TOKEN_REFRESH_SERIALIZER': 'main_app.authentication.GoLeaveTokenRefreshSerializer',
 }
\ No newline at end of file
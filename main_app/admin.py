@@ -1,9 +1,12 @@
 from django.contrib import admin
-from .models import Employee, LeaveRequest, LeaveType, LeaveHistory, LeaveBalance
+from .models import Employee, LeaveRequest, LeaveType, LeaveHistory, LeaveBalance, AbsenceDay, PublicHoliday, BalanceRolloverCheckpoint
 
 # Register your models here.
 admin.site.register(Employee)
 admin.site.register(LeaveRequest)
 admin.site.register(LeaveType)
 admin.site.register(LeaveHistory)
-admin.site.register(LeaveBalance)
\ No newline at end of file
+admin.site.register(LeaveBalance)
+admin.site.register(AbsenceDay)
+admin.site.register(PublicHoliday)
+admin.site.register(BalanceRolloverCheckpoint)
\ No newline at end of file
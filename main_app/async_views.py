@@ -0,0 +1,163 @@
+import asyncio
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections, connections
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Employee, LeaveBalance
+from .registry import leave_types
+from .conditional import conditional_response, add_validators, objects_watermark, latest, last_modified_time
+from .replicas import replica_cache_timeout
+from .cache import dashboard_stats_key, leave_balances_key, DASHBOARD_CACHE_TIMEOUT, LEAVE_BALANCES_CACHE_TIMEOUT
+from .views import dashboard_queries, employee_balance_data
+
+# Async views (ASGI: `GoLeave_backend/asgi.py`, e.g. `uvicorn GoLeave_backend.asgi:application`)
+# Learned from the Source: `https://docs.djangoproject.com/en/5.2/topics/async/`
+# A sync view keeps its worker busy while it waits for the DB, and runs its queries one after another.
+# These views wait without blocking the event loop (one worker serves many requests at the same time),
+# and they run the independent queries of a request at the same time, every one in a thread with its own DB connection.
+# They return the same JSON (and share the same cache entries) as the sync views.
+# NOTE: under WSGI (`runserver`, gunicorn sync workers) they still work, but every request gets its own event loop.
+
+
+# -------------------------🔸 Concurrent queries 🔸-------------------------
+def run_query(query):
+    # runs in a thread of the executor: its DB connection is kept or closed like at the end of a request (`CONN_MAX_AGE`)
+    close_old_connections()
+    try:
+        return query()
+    finally:
+        close_old_connections()
+
+
+async def run_queries(queries, concurrent=True):
+    # runs the functions (that do NOT depend on each other) and returns their results in the same order
+    if not concurrent:
+        return [await sync_to_async(query)() for query in queries]
+    return await asyncio.gather(*(sync_to_async(run_query, thread_sensitive=False)(query) for query in queries))
+
+
+def read_cache(key_function, *args):
+    # the cache key needs the version stamps (one cache round trip) + the entry (another one)
+    cache_key = key_function(*args)
+    return cache_key, cache.get(cache_key)
+
+
+# -------------------------🔸 AsyncAPIView 🔸-------------------------
+# `APIView` with `async def get()`: DRF calls the handlers synchronously,
+# so `dispatch()` is rewritten to await them (authentication, permissions and throttling stay the same DRF code).
+class AsyncAPIView(APIView):
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # authentication / permissions may read the DB (e.g. old tokens without claims): in the request thread
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            # `options()` and `http_method_not_allowed()` are the sync ones of `APIView`
+            response = handler(request, *args, **kwargs)
+            if isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # inside a transaction (e.g. the tests) the other connections can NOT see its rows,
+        # so the queries run one after another on the connection of the request
+        self.concurrent_queries = not any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+
+    async def run_queries(self, queries):
+        return await run_queries(queries, concurrent=self.concurrent_queries)
+
+
+# -------------------------🔸 Views 🔸-------------------------
+# `async/dashboard/stats/`: same as `DashboardStatsView`
+class AsyncDashboardStatsView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request):
+        user = request.user
+
+        # 1. Return the cached stats if nothing changed since the last load (zero DB queries)
+        cache_key, stats = await sync_to_async(read_cache, thread_sensitive=False)(dashboard_stats_key, user.id)
+        if stats is not None:
+            return Response(stats)
+
+        employee = await Employee.objects.filter(user_id=user.id).afirst()
+        if employee is None:
+            return Response(
+                {'error': 'Employee profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # 2. Run the queries of his role at the same time (admin: counters + recent requests --> the time of the slowest one)
+        stats = {}
+        for part in await self.run_queries(dashboard_queries(employee)):
+            stats.update(part)
+
+        # 3. Save the stats in the cache (removed when any leave request/history/balance is saved)
+        await cache.aset(cache_key, stats, timeout=replica_cache_timeout(DASHBOARD_CACHE_TIMEOUT))
+
+        return Response(stats)
+
+
+# the cache entry of `LeaveBalanceByEmployeeView`: {'data': balances by leave type, 'validators': (ETag parts, last modified)}
+def balances_entry(employee_id):
+    leave_balances = list(LeaveBalance.objects.filter(employee_id=employee_id, is_active=True))
+    # the watermark is taken from the rows themselves (NO watermark query),
+    # so the data and its validators always come from the same snapshot
+    last_change, count = objects_watermark(leave_balances, 'last_updated')
+    types_change, types_count = objects_watermark(leave_types.all())
+    return {
+        'data': employee_balance_data(leave_balances),
+        'validators': (
+            (last_change, count, types_change, types_count),
+            last_modified_time(latest(last_change, types_change), 'leavebalance', 'leavetype'),
+        ),
+    }
+
+
+# `async/leave-balances/<employee_id>/`: same as `LeaveBalanceByEmployeeView` (same cache entries)
+class AsyncLeaveBalanceByEmployeeView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request, employee_id):
+        # 1. The cached balances (with their validators)
+        cache_key, cached = await sync_to_async(read_cache, thread_sensitive=False)(leave_balances_key, employee_id)
+
+        if cached is None:
+            # 2. His balances + "does the employee exist" at the same time
+            cached, employee_exists = await self.run_queries([
+                lambda: balances_entry(employee_id),
+                Employee.objects.filter(id=employee_id).exists,
+            ])
+            if not employee_exists:
+                return Response(
+                    {'error': 'Employee profile not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            await cache.aset(cache_key, cached, timeout=replica_cache_timeout(LEAVE_BALANCES_CACHE_TIMEOUT))
+
+        # 3. `304 Not Modified` if the client already has them
+        response, etag, last_modified = conditional_response(request, *cached['validators'])
+        return add_validators(response or Response(cached['data']), etag, last_modified)
@@ -0,0 +1,88 @@
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User, Employee
+
+# Claims-based JWT authentication
+# the access token (from `login/`) carries `employee_id` and `role`,
+# so authentication and permissions do NOT need any DB query.
+# The `User` row is loaded only if a view really uses it (e.g. `request.user.username`).
+# NOTE: the claims are NOT checked again until the access token expires (`ACCESS_TOKEN_LIFETIME`, 5 minutes by default):
+# a role change, a deactivated or a deleted user is applied when the access token is refreshed (`token/refresh/`),
+# `GoLeaveTokenRefreshSerializer` reads the role again and refuses inactive or deleted users.
+
+
+# Put the current `employee_id` and `role` of the user in the token
+def add_employee_claims(token, user):
+    employee = Employee.objects.filter(user_id=user.id).only('id', 'role').first()
+    token['employee_id'] = employee.id if employee else None
+    token['role'] = employee.role if employee else None
+    return token
+
+
+class GoLeaveTokenObtainPairSerializer(TokenObtainPairSerializer):
+    # Learned from the Source: `https://django-rest-framework-simplejwt.readthedocs.io/en/latest/customizing_token_claims.html`
+    @classmethod
+    def get_token(cls, user):
+        return add_employee_claims(super().get_token(user), user)
+
+
+class GoLeaveTokenRefreshSerializer(TokenRefreshSerializer):
+    # simplejwt copies the claims of the refresh token (from the login) into the new access token,
+    # so an admin that was demoted would stay admin until the refresh token expires (1 day):
+    # the claims are read again from the DB before the new access token is made
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first() if user_id else None
+        if user is None:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        # `TokenRefreshSerializer.validate()` refuses inactive users and makes the access token (with the new claims)
+        return super().validate({**attrs, 'refresh': str(add_employee_claims(refresh, user))})
+
+
+class ClaimsUser(SimpleLazyObject):
+    # Lazy user: `id`, `employee_id` and `role` come from the token,
+    # any other attribute (username, email, ...) loads the `User` row from the DB (once)
+    def __init__(self, validated_token):
+        # the claim is saved as a string in the token
+        user_id = User._meta.get_field(api_settings.USER_ID_FIELD).to_python(validated_token[api_settings.USER_ID_CLAIM])
+        super().__init__(lambda: User.objects.get(**{api_settings.USER_ID_FIELD: user_id}))
+
+        # `LazyObject.__setattr__()` loads the user, so write directly in `__dict__`
+        self.__dict__.update({
+            'id': user_id,
+            'pk': user_id,
+            'employee_id': validated_token.get('employee_id'),
+            'role': validated_token.get('role'),
+            'is_authenticated': True,
+            'is_anonymous': False,
+        })
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        # old tokens (issued before the claims were added) --> load the user from the DB as before
+        if 'role' not in validated_token:
+            return super().get_user(validated_token)
+
+        return ClaimsUser(validated_token)
+
+
+# Get the role of the user: from the token claims (NO query) or from `user.employee`
+def get_user_role(user):
+    if user is None or not user.is_authenticated:
+        return None
+    if isinstance(user, ClaimsUser):
+        return user.role
+    employee = getattr(user, 'employee', None)
+    return employee.role if employee else None
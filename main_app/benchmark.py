@@ -0,0 +1,411 @@
+import asyncio
+import io
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+import django
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from django.urls import URLResolver, get_resolver
+
+from .authentication import GoLeaveTokenObtainPairSerializer
+from .models import User, Employee, LeaveType, LeaveRequest
+from .synthetic import SYNTHETIC_PASSWORD
+
+# Endpoint benchmarks (used by `python manage.py benchmark_endpoints`)
+# every route of `main_app/urls.py` is called with the Django test client (full middleware + DRF stack, NO network)
+# and measured: latency (p50 / p95 / p99), number of SQL queries and peak memory (tracemalloc).
+# Every call runs in a transaction that is rolled back, so POST / PUT / PATCH / DELETE do NOT change the data
+# and every iteration sees the same rows.
+
+BENCHMARK_ITERATIONS = 20
+BENCHMARK_WARMUP = 2
+
+HTTP_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+
+
+# -------------------------🔸 1. Routes 🔸-------------------------
+# returns [(url pattern, view class)] of `main_app/urls.py` with the full prefix (e.g. 'api/leave-requests/')
+def main_app_routes():
+    for resolver in get_resolver().url_patterns:
+        if isinstance(resolver, URLResolver) and getattr(resolver.urlconf_name, '__name__', resolver.urlconf_name) == 'main_app.urls':
+            return [
+                (str(resolver.pattern) + str(pattern.pattern), pattern.callback.view_class)
+                for pattern in resolver.url_patterns
+                if hasattr(pattern.callback, 'view_class')
+            ]
+    return []
+
+
+# Ids and bodies used to call the routes (taken from the data in the DB)
+def sample_data():
+    admin = Employee.objects.filter(role='admin').select_related('user').order_by('id').first()
+    if admin is None:
+        raise LookupError('No admin employee found, run `python manage.py generate_synthetic_data` first.')
+    employee = Employee.objects.filter(role='employee').select_related('user').order_by('id').first() or admin
+    leave_request = LeaveRequest.objects.filter(status='pending').order_by('id').first() or LeaveRequest.objects.order_by('id').first()
+    if leave_request is None:
+        raise LookupError('No leave requests found, run `python manage.py generate_synthetic_data` first.')
+
+    token = GoLeaveTokenObtainPairSerializer.get_token(admin.user)
+    far_future = date.today() + timedelta(days=3650)
+    return {
+        'admin': admin,
+        'employee': employee,
+        'leave_request': leave_request,
+        'leave_type': LeaveType.objects.order_by('id').first(),
+        'pending_ids': list(LeaveRequest.objects.filter(status='pending').order_by('id').values_list('id', flat=True)[:20]),
+        'access': str(token.access_token),
+        'refresh': str(token),
+        'far_future': far_future,
+    }
+
+
+def url_kwargs(samples):
+    return {
+        'user_id': samples['employee'].user_id,
+        'employee_id': samples['employee'].id,
+        'leave_request_id': samples['leave_request'].id,
+        'leave_type_id': samples['leave_type'].id,
+    }
+
+
+def employee_body(username):
+    return {
+        'username': username, 'email': f'{username}@example.com', 'password': 'Benchmark-123',
+        'first_name': 'Bench', 'last_name': 'Mark', 'job_title': 'Developer',
+        'department': 'IT', 'role': 'employee', 'hire_date': '2024-01-01',
+    }
+
+
+# (view class name, method) --> function(samples) that returns (query string, body)
+ROUTE_REQUESTS = {
+    ('LeaveRequestConflictsView', 'get'): lambda samples: (urlencode({
+        'employee': samples['employee'].id, 'start_date': date.today() - timedelta(days=90), 'end_date': date.today(),
+    }), None),
+    ('AbsenceCalendarView', 'get'): lambda samples: (urlencode({
+        'department': samples['employee'].department,
+        'start_date': date.today().replace(day=1), 'end_date': date.today().replace(day=1) + timedelta(days=30),
+    }), None),
+    ('EmployeeListCreateView', 'post'): lambda samples: ('', {
+        'job_title': 'Developer', 'department': 'IT', 'role': 'employee', 'hire_date': '2024-01-01',
+    }),
+    ('EmployeeUpdateView', 'put'): lambda samples: ('', {
+        'job_title': samples['employee'].job_title, 'department': samples['employee'].department,
+        'role': samples['employee'].role, 'hire_date': str(samples['employee'].hire_date),
+    }),
+    ('EmployeeImportView', 'post'): lambda samples: ('type=ndjson', '\n'.join(
+        json.dumps(employee_body(f'benchmark_import_{i}')) for i in range(5)
+    )),
+    ('LeaveTypeUpdateView', 'put'): lambda samples: ('', {
+        'type': samples['leave_type'].type, 'description': samples['leave_type'].description,
+        'max_days_allowed': samples['leave_type'].max_days_allowed,
+    }),
+    ('LeaveRequestListCreateView', 'post'): lambda samples: ('', {
+        'employee': samples['employee'].id, 'leave_type': samples['leave_type'].id,
+        'start_date': str(samples['far_future']), 'end_date': str(samples['far_future'] + timedelta(days=2)), 'reason': 'Benchmark',
+    }),
+    ('LeaveRequestUpdateView', 'put'): lambda samples: ('', {
+        'employee': samples['leave_request'].employee_id, 'leave_type': samples['leave_request'].leave_type_id,
+        'start_date': str(samples['leave_request'].start_date), 'end_date': str(samples['leave_request'].end_date),
+        'reason': samples['leave_request'].reason,
+    }),
+    ('BulkLeaveRequestTransitionView', 'patch'): lambda samples: ('', {
+        'ids': samples['pending_ids'] or [samples['leave_request'].id], 'action': 'approved',
+    }),
+    ('SignupUserView', 'post'): lambda samples: ('', employee_body('benchmark_signup')),
+    ('TokenObtainPairView', 'post'): lambda samples: ('', {
+        'username': samples['admin'].user.username, 'password': SYNTHETIC_PASSWORD,
+    }),
+    ('TokenRefreshView', 'post'): lambda samples: ('', {'refresh': samples['refresh']}),
+}
+
+
+# -------------------------🔸 2. Measure 🔸-------------------------
+class QueryCounter:
+    # counts the SQL queries with `connection.execute_wrapper()` (works with DEBUG = False too)
+    # transaction statements (BEGIN, SAVEPOINT, ...) are NOT counted, they come from the rolled back transaction
+    TRANSACTION_STATEMENTS = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK')
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(self.TRANSACTION_STATEMENTS):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, percent):
+    # nearest-rank percentile
+    values = sorted(values)
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def call(client, method, url, body, content_type):
+    # one call in a transaction that is rolled back (the DB is the same after every call)
+    with transaction.atomic():
+        response = client.generic(method.upper(), url, body or '', content_type=content_type)
+        # streaming responses (`?format=ndjson`) are generated while they are read
+        if response.streaming:
+            b''.join(response.streaming_content)
+        transaction.set_rollback(True)
+    reset_queries() # DEBUG = True keeps every query in memory
+    return response
+
+
+def benchmark_route(client, method, url, body, content_type, iterations, warmup, cold_cache):
+    for _ in range(warmup):
+        call(client, method, url, body, content_type)
+
+    latencies = []
+    queries = []
+    statuses = set()
+    for _ in range(iterations):
+        if cold_cache:
+            cache.clear()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = call(client, method, url, body, content_type)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+        statuses.add(response.status_code)
+
+    # peak memory in a separate call (tracemalloc makes the code slower, so it is NOT on while measuring the latency)
+    if cold_cache:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        call(client, method, url, body, content_type)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': sorted(statuses),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'mean': round(statistics.fmean(latencies), 3),
+            'min': round(min(latencies), 3),
+            'max': round(max(latencies), 3),
+        },
+        'queries': {'mean': round(statistics.fmean(queries), 2), 'max': max(queries)},
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+@contextmanager
+def test_environment():
+    # the test client uses the host 'testserver' (added to `ALLOWED_HOSTS` by the test environment)
+    try:
+        setup_test_environment()
+        own_environment = True
+    except RuntimeError:
+        own_environment = False # already set up (e.g. inside the tests)
+
+    try:
+        yield
+    finally:
+        if own_environment:
+            teardown_test_environment()
+
+
+def dataset_meta():
+    return {
+        'users': User.objects.count(),
+        'employees': Employee.objects.count(),
+        'leave_requests': LeaveRequest.objects.count(),
+    }
+
+
+def run_benchmarks(iterations=BENCHMARK_ITERATIONS, warmup=BENCHMARK_WARMUP, only=None, cold_cache=False):
+    with test_environment():
+        samples = sample_data()
+        kwargs = url_kwargs(samples)
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {samples['access']}")
+
+        results = []
+        for pattern, view_class in main_app_routes():
+            url = '/' + pattern
+            for name, value in kwargs.items():
+                url = url.replace(f'<int:{name}>', str(value))
+            if only and only not in url:
+                continue
+
+            for method in HTTP_METHODS:
+                if not hasattr(view_class, method):
+                    continue
+                query_string, body = ROUTE_REQUESTS.get((view_class.__name__, method), lambda samples: ('', None))(samples)
+                content_type = 'application/x-ndjson' if isinstance(body, str) else 'application/json'
+                if isinstance(body, dict):
+                    body = json.dumps(body)
+
+                result = benchmark_route(
+                    client, method, url + (f'?{query_string}' if query_string else ''), body, content_type,
+                    iterations, warmup, cold_cache,
+                )
+                results.append({'route': pattern, 'view': view_class.__name__, 'method': method.upper(), 'url': url, **result})
+
+    return {
+        'meta': {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'iterations': iterations,
+            'warmup': warmup,
+            'cold_cache': cold_cache,
+            'dataset': dataset_meta(),
+        },
+        'routes': results,
+    }
+
+
+# -------------------------🔸 3. WSGI vs ASGI 🔸-------------------------
+# (used by `python manage.py benchmark_asgi`)
+# the same read-heavy endpoints under high concurrency, called through the real Django handlers (NO network):
+#   - WSGI: the sync view, `concurrency` threads call `WSGIHandler` (like a threaded WSGI server)
+#   - ASGI: the async view, `concurrency` tasks call `ASGIHandler` in ONE event loop (like one uvicorn worker)
+# NOTE: the calls are NOT rolled back, use GET routes only.
+
+ASGI_BENCHMARK_CONCURRENCY = 50
+ASGI_BENCHMARK_REQUESTS = 500
+
+# name --> (sync url, async url), `{employee_id}` comes from the sample data
+ASGI_BENCHMARK_ROUTES = {
+    'dashboard-stats': ('/api/dashboard/stats/', '/api/async/dashboard/stats/'),
+    'employee-leave-balances': ('/api/leave-balances/{employee_id}/', '/api/async/leave-balances/{employee_id}/'),
+}
+
+
+def latency_summary(latencies, seconds):
+    return {
+        'requests_per_second': round(len(latencies) / seconds, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+        },
+    }
+
+
+def run_wsgi(url, access, concurrency, requests):
+    handler = WSGIHandler()
+    path, _, query_string = url.partition('?')
+
+    def call(_):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query_string, 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': f'Bearer {access}',
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        statuses = []
+        started = time.perf_counter()
+        response = handler(environ, lambda status, headers, exc_info=None: statuses.append(int(status.split()[0])))
+        b''.join(response)
+        response.close() # sends `request_finished` (closes the DB connection of the thread, like a real server)
+        return (time.perf_counter() - started) * 1000, statuses[0]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(requests)))
+    return results, time.perf_counter() - started
+
+
+def run_asgi(url, access, concurrency, requests):
+    handler = ASGIHandler()
+    path, _, query_string = url.partition('?')
+
+    async def call():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {access}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        body_sent = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnected.wait() # the client never goes away
+            return {'type': 'http.disconnect'}
+
+        statuses = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        started = time.perf_counter()
+        await handler(scope, receive, send)
+        return (time.perf_counter() - started) * 1000, statuses[0]
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited():
+            async with semaphore:
+                return await call()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(limited() for _ in range(requests)))
+        return results, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+def run_asgi_benchmarks(concurrency=ASGI_BENCHMARK_CONCURRENCY, requests=ASGI_BENCHMARK_REQUESTS, cold_cache=False):
+    samples = sample_data()
+    # cold cache: NO cache at all (clearing it between calls does NOT work with concurrent calls)
+    no_cache = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+
+    results = []
+    with test_environment(), (no_cache if cold_cache else nullcontext()):
+        for name, urls in ASGI_BENCHMARK_ROUTES.items():
+            sync_url, async_url = (url.format(employee_id=samples['employee'].id) for url in urls)
+            result = {'name': name}
+            for server, url, run in (('wsgi', sync_url, run_wsgi), ('asgi', async_url, run_asgi)):
+                run(url, samples['access'], concurrency, BENCHMARK_WARMUP) # warm up (connections, caches, imports)
+                calls, seconds = run(url, samples['access'], concurrency, requests)
+                result[server] = {
+                    'url': url,
+                    'status': sorted({status for _, status in calls}),
+                    **latency_summary([latency for latency, _ in calls], seconds),
+                }
+            result['speedup'] = round(result['asgi']['requests_per_second'] / result['wsgi']['requests_per_second'], 2)
+            results.append(result)
+
+    return {
+        'meta': {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'concurrency': concurrency,
+            'requests': requests,
+            'cold_cache': cold_cache,
+            'dataset': dataset_meta(),
+        },
+        'routes': results,
+    }
@@ -0,0 +1,177 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+# Versioned cache keys, Learned from the Source: `https://docs.djangoproject.com/en/5.2/topics/cache/#cache-versioning`
+# instead of deleting every cached entry when the data changes, we only increase a version number,
+# the old entries are never read again and they expire by themselves.
+# NOTE: the versions are seen by the other worker processes only if the cache is shared (Redis / Memcached),
+# NOT with `LocMemCache` (`main_app/checks.py`)
+
+DASHBOARD_VERSION_KEY = 'goleave:dashboard:version'
+DASHBOARD_CACHE_TIMEOUT = 60 * 5 # 5 minutes (just in case an invalidation is missed)
+
+LEAVE_BALANCES_VERSION_KEY = 'goleave:balances:version' # version of ALL employees balances
+LEAVE_BALANCES_CACHE_TIMEOUT = 60 * 60 # 1 hour
+
+
+def get_version(version_key):
+    return get_versions(version_key)[0]
+
+
+def get_versions(*version_keys):
+    # read all versions in ONE cache round trip (important for Redis)
+    versions = cache.get_many(version_keys)
+    for version_key in version_keys:
+        if versions.get(version_key) is None:
+            version = new_version()
+            # `add()` does NOT overwrite the version if another worker already created it
+            if not cache.add(version_key, version, timeout=None):
+                version = cache.get(version_key, version)
+            versions[version_key] = version
+    return [versions[version_key] for version_key in version_keys]
+
+
+def bump_version(version_key):
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        # version key does not exist (first write or evicted from the cache)
+        cache.set(version_key, new_version(), timeout=None)
+
+
+def new_version():
+    # start from the current time (ms), so an evicted version never goes back to an old value
+    return int(time.time() * 1000)
+
+
+# -------------------------🔸 Per-worker copies 🔸-------------------------
+# how often (seconds) a worker checks the version stamp in the cache
+VERSION_CHECK_INTERVAL = 5
+
+
+# Data kept in the memory of every worker (`LeaveTypeRegistry`, `WorkdayCalendar`) instead of asking the DB each time,
+# loaded again when the version stamp `version_key` in the cache changes.
+# Subclasses set `version_key` and implement `_load(version)`, their readers call `_refresh()` first.
+class VersionedLocalCopy:
+    version_key = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+
+        with self._lock:
+            if self._version is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+                return
+            version = get_version(self.version_key)
+            if version != self._version:
+                self._load(version)
+                self._version = version
+            self._checked_at = now
+
+    # build the new data and replace the old one at once (readers never see a half-built copy)
+    def _load(self, version):
+        raise NotImplementedError
+
+    @staticmethod
+    def from_primary(queryset):
+        # always from the primary: a copy loaded from a lagging replica would be kept until the next change
+        return queryset.using(DEFAULT_DB_ALIAS)
+
+    def invalidate(self):
+        # called from the `save()` / `delete()` of the model
+        bump_version(self.version_key)
+        # again after the commit: a worker that loaded the old rows between the two loads again
+        transaction.on_commit(lambda: bump_version(self.version_key))
+        # this worker loads again on next use, the other workers after `VERSION_CHECK_INTERVAL`
+        self._version = None
+
+
+# -------------------------🔸 Dashboard stats 🔸-------------------------
+def dashboard_stats_key(user_id):
+    return f'goleave:dashboard:{get_version(DASHBOARD_VERSION_KEY)}:user:{user_id}'
+
+
+def invalidate_dashboard_stats():
+    # called from `LeaveRequest.save()`, `LeaveHistory.save()`, ... (every write that changes the dashboard counters)
+    bump_version(DASHBOARD_VERSION_KEY)
+    # again after the commit: counts read between the two are never read again
+    transaction.on_commit(lambda: bump_version(DASHBOARD_VERSION_KEY))
+
+
+# -------------------------🔸 Employee leave balances 🔸-------------------------
+def employee_balances_version_key(employee_id):
+    return f'goleave:balances:{employee_id}:version'
+
+
+def leave_balances_key(employee_id):
+    all_version, employee_version = get_versions(LEAVE_BALANCES_VERSION_KEY, employee_balances_version_key(employee_id))
+    return f'goleave:balances:{all_version}:{employee_version}:employee:{employee_id}'
+
+
+def invalidate_leave_balances(employee_id=None):
+    # called from `LeaveBalance.save()`, `employee_id=None` --> invalidate the balances of ALL employees (bulk updates)
+    version_key = LEAVE_BALANCES_VERSION_KEY if employee_id is None else employee_balances_version_key(employee_id)
+    bump_version(version_key)
+    # again after the commit: a request that cached the old balance between the two is never read again
+    transaction.on_commit(lambda: bump_version(version_key))
+
+
+# -------------------------🔸 Leave requests list 🔸-------------------------
+# ONE version stamp for ALL the leave requests (and the employees shown in them), changed by every write,
+# the ETag / Last-Modified of `/leave-requests/` come from it: a conditional GET costs NO query
+# (instead of a COUNT + MAX(updated_at) of all the matching rows on every page).
+LEAVE_REQUESTS_VERSION_KEY = 'goleave:leave-requests:version'
+LEAVE_REQUESTS_CHANGED_AT_KEY = 'goleave:leave-requests:changed-at' # time (seconds) of the last change
+
+
+def leave_requests_version():
+    # (version, time of the last change) in ONE cache round trip
+    values = cache.get_many([LEAVE_REQUESTS_VERSION_KEY, LEAVE_REQUESTS_CHANGED_AT_KEY])
+    changed_at = values.get(LEAVE_REQUESTS_CHANGED_AT_KEY)
+    if changed_at is None:
+        # unknown (first use or evicted): now, so a client never gets `304` for an older copy
+        changed_at = time.time()
+        if not cache.add(LEAVE_REQUESTS_CHANGED_AT_KEY, changed_at, timeout=None):
+            changed_at = cache.get(LEAVE_REQUESTS_CHANGED_AT_KEY, changed_at)
+    version = values.get(LEAVE_REQUESTS_VERSION_KEY)
+    if version is None:
+        version = get_version(LEAVE_REQUESTS_VERSION_KEY)
+    return version, changed_at
+
+
+def invalidate_leave_requests():
+    # called from `LeaveRequest.save()` / `delete()`, `Employee.save()`, ... and after every `update()` / `bulk_create()`
+    bump_leave_requests_version()
+    # again after the commit: a request that read the old rows between the two gets another ETag
+    transaction.on_commit(bump_leave_requests_version)
+
+
+def bump_leave_requests_version():
+    bump_version(LEAVE_REQUESTS_VERSION_KEY)
+    cache.set(LEAVE_REQUESTS_CHANGED_AT_KEY, time.time(), timeout=None)
+
+
+# -------------------------🔸 Deletions (Last-Modified) 🔸-------------------------
+# a deleted row can NOT move `max(updated_at)` of a list, so the time of the last deletion of every model is kept here
+def deleted_at_key(model_name):
+    return f'goleave:deleted-at:{model_name}'
+
+
+def mark_deleted(*model_names):
+    # called from `Employee.delete()`, `LeaveType.delete()`, ... (with the models deleted by CASCADE too)
+    now = time.time()
+    cache.set_many({deleted_at_key(model_name): now for model_name in model_names}, timeout=None)
+
+
+def last_deleted(*model_names):
+    # timestamp (seconds) of the last deletion of these models, or None
+    return max(cache.get_many([deleted_at_key(model_name) for model_name in model_names]).values(), default=None)
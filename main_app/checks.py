@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# System checks (`python manage.py check --deploy`)
+# Source: `https://docs.djangoproject.com/en/5.2/topics/checks/`
+
+# The `default` cache is shared state between the worker processes, it keeps:
+#   - the version stamps: leave types registry, working-day calendar, cached dashboard stats and balances
+#   - the read-your-writes pin of the read replicas (`main_app/replicas.py`)
+# so a write in one worker is seen by ALL the others. These backends keep a separate cache in every process
+# (or nothing at all): with more than one worker (gunicorn / uwsgi) the others keep stale leave types and balances
+# and read from a replica right after a write.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            f"The default cache ({backend.rsplit('.', 1)[-1]}) is NOT shared by the worker processes, "
+            "the version stamps of the cached data and the read replicas pin do NOT reach the other workers.",
+            hint="Use a shared cache (e.g. 'django.core.cache.backends.redis.RedisCache' or Memcached) "
+                 "when the server runs more than one worker process, see `CACHES` in settings.py.",
+            id='main_app.W001',
+        )
+    ]
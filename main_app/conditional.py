@@ -0,0 +1,87 @@
+import functools
+import hashlib
+from datetime import datetime, timezone
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import last_deleted
+
+# Conditional GET (ETag / Last-Modified), Learned from the Source: `https://docs.djangoproject.com/en/5.2/topics/conditional-view-processing/`
+# the validators of a list come from a cheap aggregate "watermark" of its rows: (max `updated_at`, number of rows),
+# so a changed, added or deleted row gives a new ETag.
+# The leave requests list (too big for a watermark of all its rows) uses a version stamp instead (`leave_requests_version()`).
+# A client that sends the ETag (`If-None-Match`) or the date (`If-Modified-Since`) it already has
+# gets `304 Not Modified` (empty body) BEFORE the rows are read and serialized.
+
+
+# (last change, number of rows) of a queryset in ONE aggregate query,
+# `fields`: the datetime fields to check (e.g. 'updated_at' and 'employee__updated_at' for the joined employee)
+# NOTE: it reads ALL the matching rows (COUNT), on a filter that matches most of the table it is a full scan
+def queryset_watermark(queryset, *fields):
+    values = queryset.order_by().aggregate(
+        watermark_count=Count('id'), **{f'watermark_last_{i}': Max(field) for i, field in enumerate(fields)}
+    )
+    count = values.pop('watermark_count')
+    return latest(*values.values()), count
+
+
+# (last change, number of objects) of objects already in memory (e.g. the leave types registry)
+def objects_watermark(objects, field='updated_at'):
+    return latest(*(getattr(obj, field) for obj in objects)), len(objects)
+
+
+def latest(*datetimes):
+    return max((value for value in datetimes if value is not None), default=None)
+
+
+def last_modified_time(last_change, *deleted_models):
+    # a deletion does NOT change `max(updated_at)`, so the time of the last deletion counts too
+    deleted = last_deleted(*deleted_models) if deleted_models else None
+    if deleted is not None:
+        last_change = latest(last_change, timestamp_datetime(deleted))
+    return last_change
+
+
+def timestamp_datetime(seconds):
+    # time kept in the cache (`time.time()`) --> aware datetime
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def make_etag(request, parts):
+    # the same watermark gives a different ETag for another page, filter or format
+    key = repr((request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), parts))
+    return quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+
+# (`304 Not Modified` / `412` response or None, ETag, Last-Modified timestamp) of a request
+def conditional_response(request, parts, last_modified):
+    etag = make_etag(request, parts)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified), etag, last_modified
+
+
+def add_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+    return response
+
+
+# Decorator of `APIView.get()`, the view defines `get_validators(request, *args, **kwargs)`
+# that returns (watermark parts for the ETag, last modified datetime), or (None, None) to skip it (e.g. invalid params).
+# It runs inside the DRF view, so authentication and permissions are checked first.
+def conditional_get(method):
+    @functools.wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        parts, last_modified = view.get_validators(request, *args, **kwargs)
+        if parts is None:
+            return method(view, request, *args, **kwargs)
+
+        response, etag, last_modified = conditional_response(request, parts, last_modified)
+        if response is None:
+            response = method(view, request, *args, **kwargs)
+        return add_validators(response, etag, last_modified)
+    return wrapper
@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction, DatabaseError
+
+from .models import User, Employee, LeaveBalance
+from .cache import invalidate_dashboard_stats
+
+# Bulk employees onboarding (CSV / NDJSON)
+# used by `POST /employees/import/` and `python manage.py import_employees <file>`
+#   1. parse and validate all rows (bad rows are reported, NOT imported)
+#   2. hash the passwords in a process pool (the slowest part of creating a user)
+#   3. create the users, employees and leave balances with `bulk_create()` in chunks (one transaction per chunk)
+
+IMPORT_FIELDS = ['username', 'email', 'password', 'first_name', 'last_name', 'job_title', 'department', 'role', 'hire_date']
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+IMPORT_CHUNK_SIZE = 500
+
+# less rows than this --> hash the passwords in this process (starting a process pool is slower)
+MIN_ROWS_FOR_PROCESS_POOL = 50
+
+
+# -------------------------🔸 1. Parse & validate 🔸-------------------------
+# returns a list of (line number, row dict)
+def parse_rows(content, file_format):
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+
+    if file_format == 'ndjson':
+        rows = []
+        for line_number, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            rows.append((line_number, row if isinstance(row, dict) else None))
+        return rows
+
+    # csv: the first line is the header
+    reader = csv.DictReader(io.StringIO(content))
+    return [(line_number, row) for line_number, row in enumerate(reader, start=2)]
+
+
+def validate_row(row):
+    if row is None:
+        return {'row': 'Invalid JSON object'}
+
+    errors = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if value is None or not str(value).strip():
+            errors[field] = 'This field is required.'
+
+    if row.get('department') and row['department'] not in dict(Employee.DEPARTMENT_CHOICES):
+        errors['department'] = f"Invalid department '{row['department']}'."
+    if row.get('role') and row['role'] not in dict(Employee.ROLE_TYPES):
+        errors['role'] = f"Invalid role '{row['role']}'."
+    if row.get('hire_date'):
+        try:
+            date.fromisoformat(str(row['hire_date']))
+        except ValueError:
+            errors['hire_date'] = 'Date must be in YYYY-MM-DD format.'
+    if row.get('username') and len(str(row['username'])) > User._meta.get_field('username').max_length:
+        errors['username'] = 'Username is too long.'
+
+    return errors
+
+
+# -------------------------🔸 2. Hash passwords 🔸-------------------------
+def init_hash_worker(settings_module):
+    # every new process (spawn on macOS/Windows) needs Django settings to know the password hasher
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    if len(passwords) < MIN_ROWS_FOR_PROCESS_POOL or workers == 1:
+        return [make_password(password) for password in passwords]
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_hash_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'GoLeave_backend.settings'),),
+    ) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+# -------------------------🔸 3. Create users & employees 🔸-------------------------
+def create_employees(rows):
+    users = User.objects.bulk_create([
+        User(
+            username=row['username'],
+            email=row['email'],
+            password=row['password'],
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+        )
+        for row in rows
+    ])
+    employees = Employee.objects.bulk_create([
+        Employee(
+            user_id=user.id,
+            job_title=row['job_title'],
+            department=row['department'],
+            role=row['role'],
+            hire_date=date.fromisoformat(str(row['hire_date'])),
+        )
+        for user, row in zip(users, rows)
+    ])
+    LeaveBalance.objects.provision([employee.id for employee in employees])
+
+
+def import_employees(rows, workers=None, chunk_size=IMPORT_CHUNK_SIZE):
+    errors = []
+    valid_rows = []
+    seen_usernames = set()
+
+    # 1. Validate every row
+    for line_number, row in rows:
+        row_errors = validate_row(row)
+        if not row_errors:
+            if row['username'] in seen_usernames:
+                row_errors['username'] = 'Duplicated username in the file.'
+            seen_usernames.add(row['username'])
+        if row_errors:
+            errors.append({'line': line_number, 'username': (row or {}).get('username'), 'errors': row_errors})
+        else:
+            valid_rows.append((line_number, {field: str(row[field]) for field in IMPORT_FIELDS}))
+
+    # if User Already Exists (one query for all usernames)
+    existing = set(User.objects.filter(username__in=[row['username'] for line_number, row in valid_rows]).values_list('username', flat=True))
+    for line_number, row in valid_rows:
+        if row['username'] in existing:
+            errors.append({'line': line_number, 'username': row['username'], 'errors': {'username': 'User Already Exists'}})
+    valid_rows = [(line_number, row) for line_number, row in valid_rows if row['username'] not in existing]
+
+    # 2. Hash all passwords in parallel
+    hashed = hash_passwords([row['password'] for line_number, row in valid_rows], workers=workers)
+    for (line_number, row), password in zip(valid_rows, hashed):
+        row['password'] = password
+
+    # 3. Create them in chunks (one transaction per chunk)
+    created = 0
+    for start in range(0, len(valid_rows), chunk_size):
+        chunk = valid_rows[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                create_employees([row for line_number, row in chunk])
+            created += len(chunk)
+        except DatabaseError:
+            # something in this chunk failed --> create its rows one by one to find the bad rows
+            for line_number, row in chunk:
+                try:
+                    with transaction.atomic():
+                        create_employees([row])
+                    created += 1
+                except DatabaseError as error:
+                    errors.append({'line': line_number, 'username': row['username'], 'errors': {'row': str(error)}})
+
+    # `bulk_create()` does NOT call `Employee.save()`
+    if created:
+        invalidate_dashboard_stats()
+
+    errors.sort(key=lambda error: error['line'])
+    return {'created': created, 'failed': len(errors), 'errors': errors}
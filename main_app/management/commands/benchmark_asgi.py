@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.benchmark import ASGI_BENCHMARK_CONCURRENCY, ASGI_BENCHMARK_REQUESTS, run_asgi_benchmarks
+
+# Run it on a DB with synthetic data (PostgreSQL, the concurrent queries do NOT help SQLite), e.g.:
+#   python manage.py generate_synthetic_data --employees 1000 --leave-requests 20000
+#   python manage.py benchmark_asgi --concurrency 100 --requests 2000 --cold-cache
+
+
+class Command(BaseCommand):
+    help = 'Compare the throughput of the sync views (WSGI) and the async views (ASGI) under high concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=ASGI_BENCHMARK_CONCURRENCY, help='requests at the same time')
+        parser.add_argument('--requests', type=int, default=ASGI_BENCHMARK_REQUESTS, help='requests for every route and server')
+        parser.add_argument('--cold-cache', action='store_true', help='run without cache (every request reads the DB)')
+        parser.add_argument('--output', help='JSON file (default: print the JSON)')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be at least 1.')
+
+        try:
+            report = run_asgi_benchmarks(
+                concurrency=options['concurrency'],
+                requests=options['requests'],
+                cold_cache=options['cold_cache'],
+            )
+        except LookupError as error:
+            raise CommandError(str(error))
+
+        if not options['output']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        Path(options['output']).write_text(json.dumps(report, indent=2))
+        for result in report['routes']:
+            for server in ('wsgi', 'asgi'):
+                self.stdout.write(
+                    f"{result['name']:<25} {server.upper():<5} {result[server]['requests_per_second']:>9.1f} req/s  "
+                    f"p50 {result[server]['latency_ms']['p50']:>8.2f} ms  p95 {result[server]['latency_ms']['p95']:>8.2f} ms  "
+                    f"p99 {result[server]['latency_ms']['p99']:>8.2f} ms"
+                )
+            self.stdout.write(f"{result['name']:<25} ASGI / WSGI: x{result['speedup']}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(report['routes'])} routes measured, results saved in {options['output']}"))
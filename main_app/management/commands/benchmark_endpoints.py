@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.benchmark import BENCHMARK_ITERATIONS, BENCHMARK_WARMUP, run_benchmarks
+
+# Run it on a DB with synthetic data, e.g.:
+#   python manage.py generate_synthetic_data --employees 1000 --leave-requests 20000
+#   python manage.py benchmark_endpoints --output before.json
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API route (p50/p95/p99 latency, SQL queries, peak memory) and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=BENCHMARK_ITERATIONS)
+        parser.add_argument('--warmup', type=int, default=BENCHMARK_WARMUP)
+        parser.add_argument('--only', help='only the routes that contain this text (e.g. leave-requests)')
+        parser.add_argument('--cold-cache', action='store_true', help='clear the cache before every call')
+        parser.add_argument('--output', help='JSON file (default: print the JSON)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1.')
+
+        try:
+            report = run_benchmarks(
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                only=options['only'],
+                cold_cache=options['cold_cache'],
+            )
+        except LookupError as error:
+            raise CommandError(str(error))
+
+        if not options['output']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        Path(options['output']).write_text(json.dumps(report, indent=2))
+        for result in report['routes']:
+            self.stdout.write(
+                f"{result['method']:<6} {result['url']:<45} {','.join(map(str, result['status'])):<8} "
+                f"p50 {result['latency_ms']['p50']:>8.2f} ms  p95 {result['latency_ms']['p95']:>8.2f} ms  "
+                f"p99 {result['latency_ms']['p99']:>8.2f} ms  {result['queries']['max']:>3} queries  "
+                f"{result['peak_memory_kb']:>9.1f} KB"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(report['routes'])} routes measured, results saved in {options['output']}"))
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.synthetic import generate_org, delete_org
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic organization (employees, balances, leave requests and history)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100)
+        parser.add_argument('--leave-requests', type=int, default=1000, help='total number of leave requests')
+        parser.add_argument('--seed', type=int, default=1, help='same seed --> same data')
+        parser.add_argument('--reset', action='store_true', help='delete the data of this seed first')
+
+    def handle(self, *args, **options):
+        if options['employees'] < 1 or options['leave_requests'] < 0:
+            raise CommandError('--employees must be at least 1 and --leave-requests can NOT be negative.')
+
+        if options['reset']:
+            delete_org(options['seed'])
+
+        summary = generate_org(
+            employees=options['employees'],
+            leave_requests=options['leave_requests'],
+            seed=options['seed'],
+        )
+
+        self.stdout.write(json.dumps(summary))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {summary['employees']} employees and {summary['leave_requests']} leave requests created (seed {summary['seed']})"
+        ))
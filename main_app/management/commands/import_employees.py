@@ -0,0 +1,30 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.imports import IMPORT_FORMATS, IMPORT_CHUNK_SIZE, parse_rows, import_employees
+
+
+class Command(BaseCommand):
+    help = 'Import employees (users + employees + leave balances) from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with header) or NDJSON file')
+        parser.add_argument('--file-format', choices=IMPORT_FORMATS, help='default: from the file extension')
+        parser.add_argument('--workers', type=int, default=None, help='password hashing processes (default: number of CPUs)')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'File not found: {path}')
+
+        file_format = options['file_format'] or ('ndjson' if path.suffix in ('.ndjson', '.jsonl') else 'csv')
+        rows = parse_rows(path.read_bytes(), file_format)
+
+        result = import_employees(rows, workers=options['workers'], chunk_size=options['chunk_size'])
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']} ({error['username']}): {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {result['created']} employees created, {result['failed']} failed"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from main_app.models import LeaveBalance, PROVISION_CHUNK_SIZE
+
+# Backfill: create the missing balances of every (employee x leave type)
+# new employees and leave types get their balances automatically, this is for the data created before that.
+# The balances that already exist are NOT changed (`bulk_create(ignore_conflicts=True)`), so it is safe to run it again.
+
+
+class Command(BaseCommand):
+    help = 'Create the missing leave balances of all employees and leave types'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=PROVISION_CHUNK_SIZE, help='employees per chunk')
+
+    def handle(self, *args, **options):
+        before = LeaveBalance.objects.count()
+        LeaveBalance.objects.provision_all(chunk_size=options['chunk_size'])
+        created = LeaveBalance.objects.count() - before
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {created} leave balances created'))
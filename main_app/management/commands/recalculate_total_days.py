@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main_app.models import LeaveRequest
+from main_app.cache import invalidate_leave_requests
+from main_app.workdays import workdays
+
+# Calculate `total_days` of the leave requests again (e.g. after adding public holidays or changing `GOLEAVE_WEEKMASK`)
+# every chunk is counted with ONE `busday_count()` call and saved with ONE `bulk_update()`.
+# Approved requests are skipped: their days were already deducted from the balances.
+
+
+class Command(BaseCommand):
+    help = 'Recalculate total_days (working days) of the leave requests that are not approved'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='only count the requests that would change')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = LeaveRequest.objects.exclude(status='approved').order_by('id').only('id', 'start_date', 'end_date', 'total_days')
+
+        checked = changed = 0
+        last_id = 0
+        while True:
+            # keyset pagination (`id > last id`), NOT offset
+            chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            counts = workdays.count_many(
+                [leave_request.start_date for leave_request in chunk],
+                [leave_request.end_date for leave_request in chunk],
+            )
+            to_update = []
+            now = timezone.now()
+            for leave_request, total_days in zip(chunk, counts):
+                if leave_request.total_days != total_days:
+                    leave_request.total_days = total_days
+                    leave_request.updated_at = now # `bulk_update()` does NOT set `auto_now` fields
+                    to_update.append(leave_request)
+
+            if to_update and not options['dry_run']:
+                with transaction.atomic():
+                    LeaveRequest.objects.bulk_update(to_update, ['total_days', 'updated_at'], batch_size=500)
+
+            checked += len(chunk)
+            changed += len(to_update)
+
+        # `bulk_update()` does NOT call `save()`
+        if changed and not options['dry_run']:
+            invalidate_leave_requests()
+
+        action = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(f'✅ {checked} leave requests checked, {changed} {action}'))
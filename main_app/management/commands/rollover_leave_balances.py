@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.rollover import ROLLOVER_CHUNK_SIZE, rollover_balances
+
+
+class Command(BaseCommand):
+    help = 'Reset the expired leave balances for the new year (with carry over), resumable and chunked'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='run date YYYY-MM-DD (default: today), balances with reset_date before it are reset')
+        parser.add_argument('--chunk-size', type=int, default=ROLLOVER_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='only report the changes')
+        parser.add_argument('--restart', action='store_true', help='ignore the saved checkpoint of this run date')
+
+    def handle(self, *args, **options):
+        try:
+            run_date = date.fromisoformat(options['date']) if options['date'] else date.today()
+        except ValueError:
+            raise CommandError('Date must be in YYYY-MM-DD format.')
+
+        summary = rollover_balances(
+            run_date,
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            restart=options['restart'],
+        )
+
+        if summary.get('resumed_after_id'):
+            self.stdout.write(f"resumed after balance id {summary['resumed_after_id']}")
+        for leave_type, totals in sorted(summary['by_leave_type'].items()):
+            self.stdout.write(
+                f"{leave_type}: {totals['balances']} balances, "
+                f"{totals['carried_over_days']} days carried over, {totals['forfeited_days']} days forfeited"
+            )
+
+        action = 'would be reset (dry run)' if summary['dry_run'] else 'reset'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {summary['processed']} balances {action}, {summary['carried_over_days']} days carried over"
+        ))
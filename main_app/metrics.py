@@ -0,0 +1,262 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+# Prometheus metrics (`GET /metrics`, text format)
+# Source: `https://prometheus.io/docs/instrumenting/exposition_formats/#text-based-format`
+# Every worker process keeps its own counters and histograms in memory.
+# With more than one worker (gunicorn / uwsgi) set `GOLEAVE_METRICS_DIR` to a directory shared by all of them:
+# every worker writes its numbers to `<dir>/metrics-<pid>.json` (at most once every `FLUSH_INTERVAL` seconds)
+# and `/metrics` adds up the files of ALL workers, so the result does NOT depend on which worker answered the scrape.
+# A new worker that gets the pid of an old (dead) one starts from the old numbers, so counters never go back.
+# The DB connection pool numbers are read from every worker when it writes its file (`snapshot()`),
+# and only the files of the workers that are still running are added up for them.
+
+FLUSH_INTERVAL = 1 # seconds
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# request latency buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS_HELP = {
+    'goleave_http_request_duration_seconds': ('histogram', 'Request latency by view class, method and status code.'),
+    'goleave_leave_request_transitions_total': ('counter', 'Leave requests moved to a new status (approved / rejected / pending).'),
+    'goleave_leave_request_transition_duration_seconds': ('histogram', 'Time to change the status of the leave requests of one call.'),
+    'goleave_balance_deductions_total': ('counter', 'Balance deductions of approved leave requests (deducted / failed).'),
+}
+
+# DB connection pool (psycopg `ConnectionPool.get_stats()`) --> metric
+# Source: `https://www.psycopg.org/psycopg3/docs/advanced/pool.html#pool-stats`
+POOL_STATS = {
+    'pool_min': ('goleave_db_pool_min_connections', 'gauge', 'Minimum number of connections of the pool.'),
+    'pool_max': ('goleave_db_pool_max_connections', 'gauge', 'Maximum number of connections of the pool.'),
+    'pool_size': ('goleave_db_pool_connections', 'gauge', 'Connections of the pool (in use + available + being opened).'),
+    'pool_available': ('goleave_db_pool_available_connections', 'gauge', 'Idle connections ready to be used.'),
+    'requests_waiting': ('goleave_db_pool_requests_waiting', 'gauge', 'Requests waiting for a free connection right now.'),
+    'requests_num': ('goleave_db_pool_requests_total', 'counter', 'Connections asked from the pool.'),
+    'requests_queued': ('goleave_db_pool_requests_queued_total', 'counter', 'Requests that had to wait for a free connection.'),
+    'requests_wait_ms': ('goleave_db_pool_requests_wait_milliseconds_total', 'counter', 'Time spent waiting for a free connection.'),
+    'requests_errors': ('goleave_db_pool_requests_errors_total', 'counter', 'Requests that got no connection (timeout, pool closed, ...).'),
+    'usage_ms': ('goleave_db_pool_usage_milliseconds_total', 'counter', 'Time the connections were used by the app.'),
+    'returns_bad': ('goleave_db_pool_returns_bad_total', 'counter', 'Connections returned in a bad state and thrown away.'),
+    'connections_num': ('goleave_db_pool_connections_opened_total', 'counter', 'Connections opened to the DB.'),
+    'connections_ms': ('goleave_db_pool_connections_milliseconds_total', 'counter', 'Time spent opening connections to the DB.'),
+    'connections_errors': ('goleave_db_pool_connections_errors_total', 'counter', 'Failed attempts to open a connection.'),
+    'connections_lost': ('goleave_db_pool_connections_lost_total', 'counter', 'Connections found broken by the health check.'),
+}
+METRICS_HELP.update({name: (metric_type, help_text) for name, metric_type, help_text in POOL_STATS.values()})
+
+
+def labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Metrics:
+
+    def __init__(self, collectors=()):
+        # collectors: functions that return the current [(name, labels, value)] of this process (e.g. the DB pools)
+        self.collectors = collectors
+        self._lock = threading.Lock()
+        self._pid = None
+        self._flushed_at = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = defaultdict(float) # (name, labels) --> value
+            self.histograms = {} # (name, labels) --> [count of every bucket ..., count of +Inf, sum]
+            self.gauges = defaultdict(float) # (name, labels) --> value (read from the collectors, NOT kept)
+
+    @property
+    def directory(self):
+        return getattr(settings, 'GOLEAVE_METRICS_DIR', None)
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self.counters[(name, labels_key(labels))] += amount
+        self.maybe_flush()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, labels_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+        self.maybe_flush()
+
+    # -------------------------🔸 Multi-process files 🔸-------------------------
+    def path(self, pid=None):
+        return os.path.join(self.directory, f'metrics-{pid or os.getpid()}.json')
+
+    def snapshot(self):
+        gauges = [[name, labels, value] for collector in self.collectors for name, labels, value in collector()]
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), list(values)] for (name, labels), values in self.histograms.items()],
+                'gauges': gauges,
+            }
+
+    def load(self, data, gauges=False):
+        # add the numbers of a snapshot to this process (used for the file of a dead worker with the same pid)
+        # `gauges`: also the numbers of the collectors (only when merging the files of running workers)
+        with self._lock:
+            if gauges:
+                for name, labels, value in data.get('gauges', []):
+                    self.gauges[(name, labels_key(labels))] += value
+            for name, labels, value in data.get('counters', []):
+                self.counters[(name, labels_key(labels))] += value
+            for name, labels, values in data.get('histograms', []):
+                key = (name, labels_key(labels))
+                histogram = self.histograms.setdefault(key, [0] * (len(values) - 1) + [0.0])
+                for i, value in enumerate(values):
+                    histogram[i] += value
+
+    def maybe_flush(self):
+        if self.directory and time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if not self.directory:
+            return
+        pid = os.getpid()
+        if self._pid != pid:
+            # first write of this process (also after a fork)
+            if self._pid is None:
+                atexit.register(self.flush)
+            else:
+                self.reset() # forked from a process that already had numbers, they are in the parent file
+            self._pid = pid
+            os.makedirs(self.directory, exist_ok=True)
+            self.load(read_file(self.path(pid)) or {})
+
+        self._flushed_at = time.monotonic()
+        # write + rename, so a scrape never reads a half-written file
+        temp_path = f'{self.path(pid)}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temp_path, self.path(pid))
+
+    def collect(self):
+        # numbers of ALL processes: {(name, labels): value}, {(name, labels): histogram} and {(name, labels): value}
+        if not self.directory:
+            data = [(self.snapshot(), True)]
+        else:
+            self.flush()
+            data = [
+                (read_file(os.path.join(self.directory, file_name)), process_running(int(pid)))
+                for file_name in sorted(os.listdir(self.directory))
+                for pid in [file_name[len('metrics-'):-len('.json')]]
+                if file_name.startswith('metrics-') and file_name.endswith('.json') and pid.isdigit()
+            ]
+
+        merged = Metrics()
+        for snapshot, running in data:
+            merged.load(snapshot or {}, gauges=running)
+        return merged.counters, merged.histograms, merged.gauges
+
+
+def read_file(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def process_running(pid):
+    # the pool numbers of a dead worker are NOT added (its connections are closed)
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass # running, but owned by another user
+    return True
+
+
+# -------------------------🔸 DB connection pools 🔸-------------------------
+# `DATABASES[...]['OPTIONS']['pool']` (psycopg 3), one pool for every alias in every worker process
+def database_pool_samples():
+    samples = []
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is None:
+            continue
+        for stat, value in pool.get_stats().items():
+            if stat in POOL_STATS:
+                samples.append((POOL_STATS[stat][0], {'database': alias}, value))
+    return samples
+
+
+metrics = Metrics(collectors=[database_pool_samples])
+
+
+# -------------------------🔸 Exposition 🔸-------------------------
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, **extra):
+    labels = list(labels) + list(extra.items())
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics():
+    counters, histograms, gauges = metrics.collect()
+
+    samples = defaultdict(list)
+    for (name, labels), value in sorted({**counters, **gauges}.items()):
+        samples[name].append(f'{name}{format_labels(labels)} {format_value(value)}')
+    for (name, labels), values in sorted(histograms.items()):
+        cumulative = 0
+        for bucket, count in zip(LATENCY_BUCKETS + ('+Inf',), values[:-1]):
+            cumulative += count
+            samples[name].append(f'{name}_bucket{format_labels(labels, le=bucket)} {format_value(cumulative)}')
+        samples[name].append(f'{name}_sum{format_labels(labels)} {format_value(values[-1])}')
+        samples[name].append(f'{name}_count{format_labels(labels)} {format_value(cumulative)}')
+
+    lines = []
+    for name in sorted(samples):
+        metric_type, help_text = METRICS_HELP.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(samples[name])
+    return '\n'.join(lines) + '\n'
+
+
+# -------------------------🔸 GoLeave metrics 🔸-------------------------
+def observe_request(view, method, status, seconds):
+    metrics.observe('goleave_http_request_duration_seconds', seconds, view=view, method=method, status=str(status))
+
+
+def observe_transitions(action, count, seconds, source):
+    # `source`: 'single' (approve / reject / pending views) or 'bulk' (`leave-requests/bulk/`)
+    if count:
+        metrics.inc('goleave_leave_request_transitions_total', count, action=action, source=source)
+    metrics.observe('goleave_leave_request_transition_duration_seconds', seconds, action=action, source=source)
+
+
+def observe_balance_deductions(deducted=0, failed=0):
+    if deducted:
+        metrics.inc('goleave_balance_deductions_total', deducted, result='deducted')
+    if failed:
+        metrics.inc('goleave_balance_deductions_total', failed, result='failed')
@@ -0,0 +1,271 @@
+import functools
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .authentication import ClaimsJWTAuthentication
+from .metrics import observe_request
+from .replicas import read_database, read_replicas, sticky_seconds, pin_key, choose_read_database
+
+# Request timing (opt-in: `GOLEAVE_REQUEST_TIMING = True` in `settings.py`)
+# for every request we measure: number of SQL queries + SQL time, authentication time, serializer time (`.data`),
+# view time (including the rendering) and the total time.
+# They are sent back in the `Server-Timing` header (shown in the browser dev tools -> Network -> Timing)
+# and written as ONE JSON log line (logger `goleave.requests`).
+# Requests slower than `GOLEAVE_SLOW_REQUEST_MS` are logged as a warning with the top SQL statements.
+# When it is off, the middleware raises `MiddlewareNotUsed`: Django removes it from the chain
+# and DRF is NOT patched, so it costs nothing.
+# NOTE: streaming responses (`?format=ndjson`) run their queries while the body is sent, after the middleware.
+
+logger = logging.getLogger('goleave.requests')
+
+DEFAULT_SLOW_REQUEST_MS = 500
+DEFAULT_SLOW_REQUEST_TOP_SQL = 5
+MAX_SQL_LENGTH = 500 # long statements (e.g. `IN (...)` with many ids) are cut in the logs
+
+# timings of the current request (read by the patched DRF methods)
+current_timings = ContextVar('goleave_request_timings', default=None)
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.statements = {} # sql --> [count, ms] (the params are NOT in the sql, so N+1 queries are grouped)
+        self.auth_ms = 0.0
+        self.serializer_ms = 0.0
+        self.view_started = None
+        self.view_ms = 0.0
+        self.running = set()
+
+    # `connection.execute_wrapper()`
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.sql_count += 1
+            self.sql_ms += duration
+            statement = self.statements.setdefault(sql, [0, 0.0])
+            statement[0] += 1
+            statement[1] += duration
+
+    def top_statements(self, limit):
+        statements = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'sql': sql[:MAX_SQL_LENGTH], 'count': count, 'ms': round(duration, 2)}
+            for sql, (count, duration) in statements
+        ]
+
+
+# -------------------------🔸 DRF instrumentation 🔸-------------------------
+def timed(attribute):
+    # adds the time of the function to `RequestTimings.<attribute>`,
+    # nested calls (e.g. a serializer that calls another serializer `.data`) are counted once
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            timings = current_timings.get()
+            if timings is None or attribute in timings.running:
+                return function(*args, **kwargs)
+
+            timings.running.add(attribute)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                setattr(timings, attribute, getattr(timings, attribute) + (time.perf_counter() - started) * 1000)
+                timings.running.discard(attribute)
+        wrapper.goleave_timed = True
+        return wrapper
+    return decorator
+
+
+def instrument_drf():
+    # patched once, only when the middleware is on
+    if getattr(APIView.perform_authentication, 'goleave_timed', False):
+        return
+    APIView.perform_authentication = timed('auth_ms')(APIView.perform_authentication)
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        serializer_class.data = property(timed('serializer_ms')(serializer_class.__dict__['data'].fget))
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view_class = getattr(match.func, 'view_class', None)
+    return view_class.__name__ if view_class else match.view_name
+
+
+# -------------------------🔸 Request timing middleware 🔸-------------------------
+class RequestTimingMiddleware:
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GOLEAVE_REQUEST_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'GOLEAVE_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+        self.top_sql = getattr(settings, 'GOLEAVE_SLOW_REQUEST_TOP_SQL', DEFAULT_SLOW_REQUEST_TOP_SQL)
+        instrument_drf()
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+            if timings.view_started is not None:
+                timings.view_ms = (time.perf_counter() - timings.view_started) * 1000
+        finally:
+            current_timings.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings.sql_ms:.1f};desc="{timings.sql_count} queries"',
+            f'auth;dur={timings.auth_ms:.1f}',
+            f'serializer;dur={timings.serializer_ms:.1f}',
+            f'view;dur={timings.view_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name(request),
+            'status': response.status_code,
+            'sql_queries': timings.sql_count,
+            'sql_ms': round(timings.sql_ms, 2),
+            'auth_ms': round(timings.auth_ms, 2),
+            'serializer_ms': round(timings.serializer_ms, 2),
+            'view_ms': round(timings.view_ms, 2),
+            'total_ms': round(total_ms, 2),
+        }
+        if total_ms >= self.slow_request_ms:
+            record['slow'] = True
+            record['top_sql'] = timings.top_statements(self.top_sql)
+            logger.warning(json.dumps(record), extra={'timing': record})
+        else:
+            logger.info(json.dumps(record), extra={'timing': record})
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+        return None
+
+
+# -------------------------🔸 Metrics middleware 🔸-------------------------
+# latency of every request by view class, method and status code (`/metrics`), turn it off with `GOLEAVE_METRICS = False`
+# sync and async (under ASGI the async views are NOT sent to a thread because of this middleware)
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'GOLEAVE_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        observe_request(view_name(request) or 'unknown', request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        observe_request(view_name(request) or 'unknown', request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+
+# -------------------------🔸 Read replicas middleware 🔸-------------------------
+# sends the reads of GET / HEAD / OPTIONS requests to a replica (`main_app/replicas.py`), and keeps a user on the primary
+# for `GOLEAVE_REPLICA_STICKY_SECONDS` after his last write (and after login: his token is new), so he reads his own writes.
+# The user is the `user_id` of the JWT (NOT the session or the IP: many employees share the office IP).
+# When `GOLEAVE_READ_REPLICAS` is empty, the middleware raises `MiddlewareNotUsed`.
+# NOTE: streaming responses (`?format=ndjson`) run their queries after the middleware, on the primary.
+class ReplicaStickinessMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.replicas = read_replicas()
+        if not self.replicas:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.authentication = ClaimsJWTAuthentication()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def token_user(self, request):
+        # (user id, the token was issued during the sticky window) from the `Authorization` header, (None, False) if invalid
+        header = self.authentication.get_header(request)
+        raw_token = self.authentication.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None, False
+        try:
+            token = self.authentication.get_validated_token(raw_token)
+        except (InvalidToken, TokenError):
+            return None, False
+        issued_at = token.get('iat')
+        return token.get(jwt_settings.USER_ID_CLAIM), issued_at is not None and time.time() - issued_at < sticky_seconds()
+
+    def read_database(self, request, pinned):
+        if request.method in SAFE_METHODS and not pinned:
+            return choose_read_database(self.replicas)
+        return None # writes (and everything they read) go to the primary
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user_id, new_token = self.token_user(request)
+        pinned = user_id is not None and (new_token or cache.get(pin_key(user_id)) is not None)
+
+        token = read_database.set(self.read_database(request, pinned))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+
+        if user_id is not None and request.method not in SAFE_METHODS:
+            cache.set(pin_key(user_id), True, timeout=sticky_seconds())
+        return response
+
+    async def __acall__(self, request):
+        user_id, new_token = self.token_user(request)
+        pinned = user_id is not None and (new_token or await cache.aget(pin_key(user_id)) is not None)
+
+        token = read_database.set(self.read_database(request, pinned))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+
+        if user_id is not None and request.method not in SAFE_METHODS:
+            await cache.aset(pin_key(user_id), True, timeout=sticky_seconds())
+        return response
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# Range index for the leave requests overlap check (`LeaveRequest.objects.overlapping()`)
+# PostgreSQL only: GiST index on (employee_id, daterange(start_date, end_date, '[]'))
+# Source: `https://www.postgresql.org/docs/current/rangetypes.html#RANGETYPES-INDEXING`
+# `btree_gist` extension is needed to put `employee_id` (bigint) in a GiST index,
+# if it is not available on the server we create a B-tree index on (employee_id, start_date, end_date) instead.
+
+INDEX_NAME = 'leaverequest_employee_period_idx'
+
+
+def create_overlap_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist'")
+        has_btree_gist = cursor.fetchone() is not None
+
+    if has_btree_gist:
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON main_app_leaverequest '
+            "USING gist (employee_id, daterange(start_date, end_date, '[]'))"
+        )
+    else:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON main_app_leaverequest (employee_id, start_date, end_date)'
+        )
+
+
+def drop_overlap_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0008_alter_leaverequest_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_overlap_index, drop_overlap_index),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:13
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+
+
+# Add the days of the leave requests that are already approved
+def backfill_absence_days(apps, schema_editor):
+    LeaveRequest = apps.get_model('main_app', 'LeaveRequest')
+    AbsenceDay = apps.get_model('main_app', 'AbsenceDay')
+
+    days = []
+    approved = (
+        LeaveRequest.objects.filter(status='approved')
+        .values_list('id', 'employee_id', 'employee__department', 'start_date', 'end_date')
+        .order_by('id')
+    )
+    for leave_request_id, employee_id, department, start_date, end_date in approved.iterator(chunk_size=2000):
+        for offset in range((end_date - start_date).days + 1):
+            days.append(AbsenceDay(
+                date=start_date + timedelta(days=offset),
+                employee_id=employee_id,
+                department=department,
+                leave_request_id=leave_request_id,
+            ))
+        if len(days) >= 5000:
+            AbsenceDay.objects.bulk_create(days, batch_size=1000)
+            days = []
+    AbsenceDay.objects.bulk_create(days, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0009_leaverequest_overlap_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenceDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('department', models.CharField(choices=[('HR', 'Human Resources'), ('MKT', 'Marketing'), ('R&D', 'Research & Development'), ('SALES', 'Sales'), ('FIN', 'Finance'), ('IT', 'Information Technology'), ('ADMIN', 'Administration'), ('CS', 'Customer Service'), ('ACC', 'Accounting'), ('QA', 'Quality Assurance'), ('MNT', 'Maintenance'), ('BIZ', 'Business'), ('DES', 'Designing'), ('LEAD', 'Leadership'), ('LEGAL', 'Legal'), ('OTHER', 'Other')], max_length=20)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_app.employee')),
+                ('leave_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_app.leaverequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['department', 'date'], name='absenceday_department_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('leave_request', 'date'), name='absenceday_unique_request_date')],
+            },
+        ),
+        migrations.RunPython(backfill_absence_days, migrations.RunPython.noop),
+    ]
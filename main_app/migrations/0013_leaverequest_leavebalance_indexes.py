@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0012_balance_rollover'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leavebalance',
+            index=models.Index(fields=['employee', 'is_active'], name='leavebal_employee_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['employee', 'status'], name='leavereq_employee_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['status', '-created_at'], name='leavereq_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['-created_at', '-id'], name='leavereq_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-created_at'], name='leavereq_pending_created_idx'),
+        ),
+    ]
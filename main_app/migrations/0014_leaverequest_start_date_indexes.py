@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0013_leaverequest_leavebalance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['-start_date', '-id'], name='leavereq_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['status', '-start_date', '-id'], name='leavereq_status_start_idx'),
+        ),
+    ]
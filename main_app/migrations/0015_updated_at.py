@@ -0,0 +1,33 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+# `updated_at` of the employees, leave types and leave requests (ETag / Last-Modified of the lists),
+# the existing rows get the time of the migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0014_leaverequest_start_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='leavetype',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='leaverequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,79 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+# Overlapping leave requests are refused by PostgreSQL itself: the check of `LeaveRequestSerializer.validate()`
+# is a SELECT, so two requests created at the same time can both pass it.
+# Exclusion constraint: no two requests of the same employee with overlapping periods (rejected requests do NOT count)
+# Source: `https://docs.djangoproject.com/en/5.2/ref/contrib/postgres/constraints/`
+# `btree_gist` is needed to put `employee_id` (bigint) in its GiST index, the migration fails if it is not available.
+# The index of the constraint has the same expression as `leaverequest_employee_period_idx` (migration 0009),
+# so `LeaveRequest.objects.overlapping()` uses it and the old index (GiST or its B-tree fallback) is removed.
+# The plain date filters of the list (`start_date__lte` / `end_date__gte` of an employee) can NOT use a range index:
+# they get a declared B-tree index on (employee, start_date, end_date), on every database.
+# NOTE: the constraint is PostgreSQL only (SQLite has no exclusion constraints),
+# the migration fails if the table already has overlapping requests: reject or fix them first.
+
+OLD_INDEX_NAME = 'leaverequest_employee_period_idx'
+
+
+class DateRange(models.Func):
+    function = 'daterange'
+    output_field = DateRangeField()
+
+
+class AddPostgreSQLConstraint(migrations.AddConstraint):
+    # NOT added to the model state (the model does not declare it),
+    # so SQLite never tries to create it when a later migration rebuilds the table
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def drop_old_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {OLD_INDEX_NAME}')
+
+
+def create_old_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {OLD_INDEX_NAME} ON main_app_leaverequest '
+            "USING gist (employee_id, daterange(start_date, end_date, '[]'))"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0015_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_old_index, create_old_index),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['employee', 'start_date', 'end_date'], name='leavereq_employee_period_idx'),
+        ),
+        BtreeGistExtension(),
+        AddPostgreSQLConstraint(
+            model_name='leaverequest',
+            constraint=ExclusionConstraint(
+                name='leaverequest_no_overlap', # `LeaveRequest.OVERLAP_CONSTRAINT`
+                expressions=[
+                    ('employee', RangeOperators.EQUAL),
+                    (DateRange('start_date', 'end_date', models.Value('[]')), RangeOperators.OVERLAPS),
+                ],
+                condition=~models.Q(status='rejected'),
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+# `deducted_days` of a leave request: the days its approval took from the balance,
+# given back when the request stops being approved (approve --> pending --> approve deducted them twice).
+# The approved requests without the "NOT deducted" warning were deducted when they were approved: `total_days`.
+
+
+def set_deducted_days(apps, schema_editor):
+    LeaveRequest = apps.get_model('main_app', 'LeaveRequest')
+    LeaveRequest.objects.filter(status='approved', is_warning_displayed=False).update(deducted_days=models.F('total_days'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0016_leaverequest_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaverequest',
+            name='deducted_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(set_deducted_days, migrations.RunPython.noop),
+    ]
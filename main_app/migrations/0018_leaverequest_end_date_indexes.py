@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0017_leaverequest_deducted_days'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['-end_date', '-id'], name='leavereq_end_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['status', '-end_date', '-id'], name='leavereq_status_end_idx'),
+        ),
+    ]
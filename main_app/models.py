@@ -1,8 +1,19 @@
-from django.db import models
+from django.db import models, transaction, connections
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.db.models.expressions import RawSQL
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from django.forms import ValidationError
-from datetime import date
+from datetime import date, timedelta
+
+from .cache import invalidate_dashboard_stats, invalidate_leave_balances, invalidate_leave_requests, mark_deleted
+from .registry import leave_types
+from .workdays import workdays
+from .metrics import observe_balance_deductions
 
 # Create your models here.
 
@@ -11,6 +22,12 @@ User = get_user_model()
 
 
 # -------------------------🔸 Employee model 🔸-------------------------
+class EmployeeQuerySet(models.QuerySet):
+    # join `user` in the same query (`EmployeeSerializer` nests `UserSerializer`)
+    def with_user(self):
+        return self.select_related('user')
+
+
 class Employee(models.Model):
     
     DEPARTMENT_CHOICES = (
@@ -41,8 +58,27 @@ class Employee(models.Model):
     department = models.CharField(max_length=20, choices=DEPARTMENT_CHOICES, default='OTHER', null=False, blank=False)
     role = models.CharField(max_length=20, choices=ROLE_TYPES, default='employee')
     hire_date = models.DateField('Hire date')
+    updated_at = models.DateTimeField(auto_now=True) # ETag / Last-Modified of the lists (`main_app/conditional.py`)
 
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+
+    objects = EmployeeQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        super().save(*args, **kwargs)
+        # new employee --> create his balances of all leave types now (NOT on the first approval)
+        if is_new:
+            LeaveBalance.objects.provision([self.pk])
+        # the absence calendar keeps a copy of the department (to filter by department without a join)
+        else:
+            AbsenceDay.objects.filter(employee_id=self.pk).exclude(department=self.department).update(department=self.department)
+            # the leave requests list shows the employee
+            invalidate_leave_requests()
+        # `total_employees` on the dashboard changed
+        invalidate_dashboard_stats()
+
+    # NOTE: a deleted employee (also by CASCADE from `User`) is handled by `employee_deleted()` (post_delete signal)
     
     def __str__(self):
         return f"Employee name: {self.user.first_name} {self.user.last_name} - {self.job_title} ({self.get_role_display()})"
@@ -71,12 +107,129 @@ class LeaveType(models.Model):
     type = models.CharField(max_length=20, choices=LEAVE_TYPES, unique=True, blank=False, null=False)
     description = models.TextField(blank=True)
     max_days_allowed = models.PositiveIntegerField(blank=True)
+    # how many unused days move to the next year when the balances are reset (`rollover_leave_balances` command)
+    max_carry_over_days = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        super().save(*args, **kwargs)
+        # reload the leave types registry in all workers
+        leave_types.invalidate()
+        # new leave type --> create its balance for every employee
+        if is_new:
+            LeaveBalance.objects.provision_all([self])
+        # cached balances of ALL employees show `max_days_allowed`
+        invalidate_leave_balances()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        mark_deleted('leavetype', 'leaverequest', 'leavebalance')
+        leave_types.invalidate()
+        invalidate_leave_requests()
+        invalidate_leave_balances()
+        return result
     
     def __str__(self):
         return self.get_type_display()
 
 
+# -------------------------🔸 PublicHoliday model 🔸-------------------------
+class PublicHoliday(models.Model):
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=100)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # compile the working-day calendars again in all workers
+        workdays.invalidate()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        workdays.invalidate()
+        return result
+
+    def __str__(self):
+        return f"{self.name} ({self.date})"
+
+    class Meta:
+        ordering = ['date']
+
+
 # -------------------------🔸 LeaveBalance model 🔸-------------------------
+PROVISION_CHUNK_SIZE = 5000
+
+
+class LeaveBalanceQuerySet(models.QuerySet):
+    # Deduct days in ONE atomic `UPDATE ... WHERE remaining_days >= days` (no read-modify-write in Python)
+    # returns the number of updated rows (0 --> not enough remaining days)
+    # NOTE: `update()` does NOT call `save()`, so the caller must invalidate the cached balances
+    def deduct(self, days):
+        return self.filter(remaining_days__gte=days).update(
+            used_days=F('used_days') + days,
+            remaining_days=F('remaining_days') - days,
+            last_updated=timezone.now(),
+        )
+
+    # Give back days deducted by an approval (the request is not approved anymore), in ONE atomic `UPDATE`
+    # a balance that was reset since then (new year, `used_days` < days) is NOT changed
+    # NOTE: `update()` does NOT call `save()`, so the caller must invalidate the cached balances
+    def refund(self, days):
+        return self.filter(used_days__gte=days).update(
+            used_days=F('used_days') - days,
+            remaining_days=F('remaining_days') + days,
+            last_updated=timezone.now(),
+        )
+
+    # Create the balances of every (employee x leave type) in ONE `bulk_create()`
+    # the balances that already exist are skipped (`ignore_conflicts`), returns the number of balances sent to the DB
+    # NOTE: `bulk_create()` does NOT call `save()`, so all the computed fields are set here
+    def provision(self, employee_ids, leave_types_list=None):
+        if leave_types_list is None:
+            leave_types_list = leave_types.all()
+        reset_date = date(date.today().year, 12, 31)
+        balances = [
+            LeaveBalance(
+                employee_id=employee_id,
+                leave_type_id=leave_type.id,
+                total_days=leave_type.max_days_allowed,
+                used_days=0,
+                remaining_days=leave_type.max_days_allowed,
+                reset_date=reset_date,
+            )
+            for employee_id in employee_ids
+            for leave_type in leave_types_list
+        ]
+        self.bulk_create(balances, batch_size=1000, ignore_conflicts=True)
+        # one employee --> remove only his cached balances
+        invalidate_leave_balances(employee_ids[0] if len(employee_ids) == 1 else None)
+        return len(balances)
+
+    # Same as `provision()` for ALL employees (in chunks of employee ids, so 100k employees are NOT loaded at once)
+    def provision_all(self, leave_types_list=None, chunk_size=PROVISION_CHUNK_SIZE):
+        provisioned = 0
+        last_id = 0
+        while True:
+            employee_ids = list(Employee.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not employee_ids:
+                return provisioned
+            provisioned += self.provision(employee_ids, leave_types_list)
+            last_id = employee_ids[-1]
+
+    # Reset the balances of ONE leave type for a new year in ONE `UPDATE` (no read-modify-write in Python):
+    #   total_days = remaining_days = max_days_allowed + min(remaining_days, max_carry_over_days), used_days = 0
+    # NOTE: `update()` does NOT call `save()`, so the caller must invalidate the cached balances
+    def rollover(self, leave_type, reset_date):
+        carry_over = Least(F('remaining_days'), Value(leave_type.max_carry_over_days))
+        return self.filter(leave_type_id=leave_type.id).update(
+            total_days=Value(leave_type.max_days_allowed) + carry_over,
+            remaining_days=Value(leave_type.max_days_allowed) + carry_over,
+            used_days=0,
+            reset_date=reset_date,
+            last_updated=timezone.now(),
+        )
+
+
 class LeaveBalance(models.Model):
     total_days = models.PositiveIntegerField(default=0)
     used_days = models.PositiveIntegerField(default=0)
@@ -90,15 +243,17 @@ class LeaveBalance(models.Model):
 
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE)
+
+    objects = LeaveBalanceQuerySet.as_manager()
     
 
     def save(self, *args, **kwargs):
-        # Calculate `remaining_days` automatically
-        self.remaining_days = self.total_days - self.used_days
-        
         # Set `total_days` from LeaveType (if not set)
         if not self.total_days:
             self.total_days = self.leave_type.max_days_allowed
+
+        # Calculate `remaining_days` automatically (after `total_days` is set)
+        self.remaining_days = self.total_days - self.used_days
         
         # Set `reset_date` to end of current year
         if not self.reset_date:
@@ -107,6 +262,20 @@ class LeaveBalance(models.Model):
         # Save it to the DB
         super().save(*args, **kwargs)
 
+        # remove the cached balances of this employee (`LeaveBalanceByEmployeeView`)
+        invalidate_leave_balances(self.employee_id)
+        # the employee dashboard shows the leave balance
+        invalidate_dashboard_stats()
+
+    # NOTE: the balances deleted by CASCADE are handled by `employee_deleted()` and `LeaveType.delete()`,
+    # a `post_delete` receiver here would load every one of them (NO fast delete) to remove the cache once per row
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        mark_deleted('leavebalance')
+        invalidate_leave_balances(self.employee_id)
+        invalidate_dashboard_stats()
+        return result
+
 
     # Get warning (status) and (message) based on `remaining_days`
     def get_warning_status(self):
@@ -120,8 +289,11 @@ class LeaveBalance(models.Model):
 
     # Check if employee can request this many days of leave
     def can_request_leave(self, requested_days):
+        # Get the leave type from the registry (NO DB query)
+        leave_type = leave_types.get(self.leave_type_id) or self.leave_type
+
         # Special leave type has NO limit (only requires approval)
-        if self.leave_type.type == 'SPECIAL':
+        if leave_type.type == 'SPECIAL':
             return True, "SPECIAL leave has NO limit - requires approval !"
         
         # Check if `requested_days` exceed `remaining_days`
@@ -129,18 +301,23 @@ class LeaveBalance(models.Model):
             return False, f"Requested {requested_days} days but only {self.remaining_days} available"
         
         # Check if `requested_days` exceed `max_days_allowed` for this type
-        if requested_days > self.leave_type.max_days_allowed:
-            return False, f"Cannot request more than {self.leave_type.max_days_allowed} days for {self.leave_type.get_type_display()}"
+        if requested_days > leave_type.max_days_allowed:
+            return False, f"Cannot request more than {leave_type.max_days_allowed} days for {leave_type.get_type_display()}"
         
         return True, "Leave request is valid"
     
 
     # Reduce days from balance
+    # ONE atomic `UPDATE ... WHERE remaining_days >= days` (safe when two admins approve at the same time)
     def reduce_days(self, days_to_reduce):
-        if days_to_reduce <= self.remaining_days:
+        if LeaveBalance.objects.filter(pk=self.pk).deduct(days_to_reduce):
             self.used_days += days_to_reduce
-            self.save()
+            self.remaining_days -= days_to_reduce
+            invalidate_leave_balances(self.employee_id)
+            invalidate_dashboard_stats()
+            transaction.on_commit(lambda: observe_balance_deductions(deducted=1))
             return True
+        transaction.on_commit(lambda: observe_balance_deductions(failed=1))
         return False
     
 
@@ -150,24 +327,80 @@ class LeaveBalance(models.Model):
     class Meta:
         # this for prevent duplicate balances for same employee and leave type!
         unique_together = ['employee', 'leave_type']
+        indexes = [
+            # active balances of an employee (`LeaveBalanceByEmployeeView`)
+            models.Index(fields=['employee', 'is_active'], name='leavebal_employee_active_idx'),
+        ]
+
+
+# -------------------------🔸 BalanceRolloverCheckpoint model 🔸-------------------------
+# Progress of the yearly balances reset (one row per run date), so a crashed run continues where it stopped
+class BalanceRolloverCheckpoint(models.Model):
+    run_date = models.DateField(unique=True) # balances with `reset_date` before this date are reset
+    last_balance_id = models.BigIntegerField(default=0) # keyset: the next chunk starts after this id
+    processed = models.PositiveIntegerField(default=0)
+    carried_over_days = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Rollover {self.run_date}: {self.processed} balances ({'finished' if self.finished_at else 'in progress'})"
 
 
 # -------------------------🔸 LeaveRequest model 🔸-------------------------
+class LeaveRequestQuerySet(models.QuerySet):
+    # join `employee__user` in the same query,
+    # so `LeaveRequestSerializer` does NOT fire extra queries for every row (N+1 problem)
+    # (`leave_type_details` comes from the leave types registry, so NO join is needed)
+    def with_details(self):
+        return self.select_related('employee__user')
+
+    # Requests that share at least one day with [start_date, end_date] (rejected requests do NOT count)
+    # use it after `.filter(employee=...)`, so it is ONE probe on the (employee, period) range index
+    def overlapping(self, start_date, end_date):
+        queryset = self.exclude(status='rejected')
+        if connections[self.db].vendor == 'postgresql':
+            # same expression as the GiST index of the exclusion constraint (migration 0016), `&&` = ranges overlap
+            table = self.model._meta.db_table
+            return queryset.filter(RawSQL(
+                f'''daterange("{table}"."start_date", "{table}"."end_date", '[]') && daterange(%s, %s, '[]')''',
+                (start_date, end_date),
+                output_field=models.BooleanField(),
+            ))
+        return queryset.filter(start_date__lte=end_date, end_date__gte=start_date)
+
+    # ids of the requests of this employee that overlap the period (for the error messages, at most `limit`)
+    def overlap_ids(self, employee_id, start_date, end_date, exclude_id=None, limit=10):
+        conflicts = self.filter(employee_id=employee_id).overlapping(start_date, end_date)
+        if exclude_id is not None:
+            conflicts = conflicts.exclude(id=exclude_id)
+        return list(conflicts.order_by('start_date').values_list('id', flat=True)[:limit])
+
+
 class LeaveRequest(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
     )
+
+    NOT_DEDUCTED_WARNING = "Warning: Not enough leave balance - days were NOT deducted"
+    # PostgreSQL refuses overlapping requests of the same employee (exclusion constraint, migration 0016)
+    OVERLAP_CONSTRAINT = 'leaverequest_no_overlap'
     
     start_date = models.DateField()
     end_date = models.DateField()
     total_days = models.PositiveIntegerField(blank=True, null=True) # --> Auto-Computed field
+    # days taken from the balance by the approval (0 --> nothing was deducted), given back when it is not approved anymore
+    deducted_days = models.PositiveIntegerField(default=0)
     reason = models.TextField()
     # attachment = models.FileField(blank=True, null=True) --> optional (i will do it later)
     is_outside_country = models.BooleanField(default=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, null=True, blank=True, default=None)
     created_at = models.DateTimeField(auto_now_add=True)
+    # NOTE: `auto_now` is NOT applied by `.update()` / `bulk_update()`, set `updated_at` there yourself
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Warning system fields that related to leave balance
     warning_message = models.TextField(blank=True, help_text="Warning message if balance is insufficient")
@@ -175,6 +408,21 @@ class LeaveRequest(models.Model):
 
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     leave_type = models.ForeignKey(LeaveType, on_delete=models.CASCADE)
+
+    objects = LeaveRequestQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the status saved in the DB, so `save()` knows when the request BECOMES approved
+        # Source: `https://docs.djangoproject.com/en/5.2/ref/models/instances/#customizing-model-loading`
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        if 'start_date' in field_names and 'end_date' in field_names:
+            instance._loaded_period = (values[field_names.index('start_date')], values[field_names.index('end_date')])
+        if 'employee_id' in field_names:
+            instance._loaded_employee_id = values[field_names.index('employee_id')]
+        return instance
     
     # use clean() method to validate fields (Learn concept from `https://stackoverflow.com/questions/12278753/clean-method-in-model-and-field-validation`)
     def clean(self):
@@ -182,16 +430,16 @@ class LeaveRequest(models.Model):
             if self.end_date < self.start_date:
                 raise ValidationError({ 'end_date': 'End date must be after start date!' })
 
-    # Calculate total days between start and end date
+    # Calculate total WORKING days between start and end date (weekends and public holidays are NOT counted)
     def calculate_total_days(self):
         if self.start_date and self.end_date:
-            return (self.end_date - self.start_date).days + 1
+            return workdays.count(self.start_date, self.end_date)
         return 0
     
     # Check if employee has sufficient balance and set warning message
     def check_balance_and_set_warning(self):
         try:
-            balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+            balance = LeaveBalance.objects.get(employee_id=self.employee_id, leave_type_id=self.leave_type_id)
             can_request, message = balance.can_request_leave(self.total_days)
             
             if not can_request:
@@ -205,29 +453,28 @@ class LeaveRequest(models.Model):
             self.warning_message = "Warning: No leave balance record found for this leave type"
             self.is_warning_displayed = True
     
-    # Update leave balance when request is approved
+    # Update leave balance when request is approved (returns True if the days were deducted)
+    # the balance always exists (created with the employee / leave type, `LeaveBalance.objects.provision()`)
     def update_leave_balance(self):
-        try:
-            balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
-            
-            # Only deduct if we haven't already done so
-            if not hasattr(self, '_balance_updated'):
-                success = balance.reduce_days(self.total_days)
-                if success:
-                    self._balance_updated = True
-                    # Clear warning if balance was successfully updated
-                    self.warning_message = ""
-                    self.is_warning_displayed = False
-                    
-        except LeaveBalance.DoesNotExist:
-            # Create new balance record if it doesn't exist
-            balance = LeaveBalance.objects.create(
-                employee=self.employee,
-                leave_type=self.leave_type,
-                total_days=self.leave_type.max_days_allowed,
-                used_days=self.total_days
-            )
-            self._balance_updated = True
+        balance = LeaveBalance.objects.filter(employee_id=self.employee_id, leave_type_id=self.leave_type_id)
+
+        # deduct in ONE atomic UPDATE (without reading the balance first)
+        if balance.deduct(self.total_days):
+            self.deducted_days = self.total_days
+            invalidate_leave_balances(self.employee_id)
+            transaction.on_commit(lambda: observe_balance_deductions(deducted=1))
+            return True
+
+        transaction.on_commit(lambda: observe_balance_deductions(failed=1))
+        return False
+
+    # Give back the deducted days when the request is not approved anymore
+    # (so approve --> pending --> approve deducts them only once)
+    def refund_leave_balance(self):
+        if self.deducted_days:
+            LeaveBalance.objects.filter(employee_id=self.employee_id, leave_type_id=self.leave_type_id).refund(self.deducted_days)
+            invalidate_leave_balances(self.employee_id)
+        self.deducted_days = 0
 
     # save Computed Field `total_days` automatically
     def save(self, *args, **kwargs):
@@ -237,13 +484,57 @@ class LeaveRequest(models.Model):
         # 2. Check balance and set warnings for pending or approved requests
         if self.status in ['pending', 'approved']:
             self.check_balance_and_set_warning()
-        
-        # Call super save first to ensure we have an ID
-        super().save(*args, **kwargs)
-        
-        # Update balance only after saving and only if approved
-        if self.status == 'approved':
-            self.update_leave_balance()
+
+        # 3. Update balance only ONCE, when the request changes to 'approved' (NOT on every save of an approved request)
+        # and give the days back when it stops being approved
+        loaded_status = getattr(self, '_loaded_status', None)
+        becomes_approved = self.status == 'approved' and loaded_status != 'approved'
+        stops_being_approved = loaded_status == 'approved' and self.status != 'approved'
+        # the absence calendar changes when the request becomes (or stops being) approved,
+        # or an approved request moves (other dates or another employee)
+        calendar_changed = (self.status == 'approved') != (loaded_status == 'approved') or (self.status == 'approved' and (
+            getattr(self, '_loaded_period', None) != (self.start_date, self.end_date)
+            or getattr(self, '_loaded_employee_id', None) != self.employee_id
+        ))
+        if becomes_approved:
+            # balance + request are saved together (or not at all)
+            with transaction.atomic():
+                if self.update_leave_balance():
+                    # Clear warning if balance was successfully updated
+                    self.warning_message = ""
+                    self.is_warning_displayed = False
+                elif not self.is_warning_displayed:
+                    self.warning_message = self.NOT_DEDUCTED_WARNING
+                    self.is_warning_displayed = True
+                super().save(*args, **kwargs)
+                AbsenceDay.objects.sync([self])
+        elif calendar_changed:
+            with transaction.atomic():
+                if stops_being_approved:
+                    self.refund_leave_balance()
+                super().save(*args, **kwargs)
+                AbsenceDay.objects.sync([self])
+        else:
+            super().save(*args, **kwargs)
+        self._loaded_status = self.status
+        self._loaded_period = (self.start_date, self.end_date)
+        self._loaded_employee_id = self.employee_id
+
+        # dashboard counters (pending, approved, ...) and the leave requests list changed
+        invalidate_dashboard_stats()
+        invalidate_leave_requests()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        mark_deleted('leaverequest')
+        invalidate_dashboard_stats()
+        invalidate_leave_requests()
+        return result
+
+    @classmethod
+    def is_overlap_error(cls, error):
+        # `IntegrityError` of the exclusion constraint (NOT another constraint)
+        return cls.OVERLAP_CONSTRAINT in str(error)
 
     def __str__(self):
         return f"LeaveRequest: {self.employee.user.first_name} - {self.leave_type.get_type_display()} - start:{self.start_date} end:{self.end_date} ({self.total_days} days)"
@@ -251,6 +542,24 @@ class LeaveRequest(models.Model):
     class Meta:
         # order leave requests by newest created date
         ordering = ['-created_at']
+        indexes = [
+            # requests of an employee by status (employee dashboard counters)
+            models.Index(fields=['employee', 'status'], name='leavereq_employee_status_idx'),
+            # requests by status, newest first (approved this month)
+            models.Index(fields=['status', '-created_at'], name='leavereq_status_created_idx'),
+            # leave requests list (cursor pagination order) and recent requests
+            models.Index(fields=['-created_at', '-id'], name='leavereq_created_id_idx'),
+            # pending requests are a small part of the table --> small partial index
+            models.Index(fields=['-created_at'], condition=models.Q(status='pending'), name='leavereq_pending_created_idx'),
+            # leave requests list sorted by `start_date` (`?ordering=start_date`), with or without `?status=`
+            models.Index(fields=['-start_date', '-id'], name='leavereq_start_id_idx'),
+            models.Index(fields=['status', '-start_date', '-id'], name='leavereq_status_start_idx'),
+            # same for `end_date` (`?ordering=end_date`)
+            models.Index(fields=['-end_date', '-id'], name='leavereq_end_id_idx'),
+            models.Index(fields=['status', '-end_date', '-id'], name='leavereq_status_end_idx'),
+            # the period filters of one employee (the overlap check uses the exclusion constraint, migration 0016)
+            models.Index(fields=['employee', 'start_date', 'end_date'], name='leavereq_employee_period_idx'),
+        ]
 
 # -------------------------🔸 LeaveHistory model 🔸-------------------------
 class LeaveHistory(models.Model):
@@ -272,9 +581,86 @@ class LeaveHistory(models.Model):
         # Automatically update leave request status when history is created
         super().save(*args, **kwargs)
         
-        # Update the leave request status to match the latest history action
-        self.leave_request.status = self.action_type
-        self.leave_request.save()
+        # Update the leave request status to match the latest history action (only if it is different, NO extra save)
+        if self.leave_request.status != self.action_type:
+            self.leave_request.status = self.action_type
+            self.leave_request.save()
+
+        invalidate_dashboard_stats()
     
     def __str__(self):
-        return f"LeaveHistory: the user {self.leave_request.employee.user.username} update request {self.leave_request.id} - {self.leave_request.leave_type.get_type_display()} - {self.get_action_type_display()}, Employee: {self.leave_request.employee.user.first_name}"
\ No newline at end of file
+        return f"LeaveHistory: the user {self.leave_request.employee.user.username} update request {self.leave_request.id} - {self.leave_request.leave_type.get_type_display()} - {self.get_action_type_display()}, Employee: {self.leave_request.employee.user.first_name}"
+
+
+# -------------------------🔸 AbsenceDay model 🔸-------------------------
+# One row per (day x employee) of every APPROVED leave request --> the team absence calendar
+# is ONE indexed range scan on (department, date) instead of expanding all the requests in Python.
+# Kept up to date by `LeaveRequest.save()` and `bulk_transition_leave_requests()` (`sync()`),
+# the existing approved requests are added by migration 0010.
+class AbsenceDayQuerySet(models.QuerySet):
+    # Rebuild the days of these leave requests (needs `id`, `employee_id`, `start_date`, `end_date` and `status`)
+    # 1 DELETE + (only for the approved ones) 1 query for the departments + 1 INSERT
+    def sync(self, leave_requests):
+        leave_requests = list(leave_requests)
+        if not leave_requests:
+            return
+
+        self.filter(leave_request_id__in=[leave_request.id for leave_request in leave_requests]).delete()
+
+        approved = [leave_request for leave_request in leave_requests if leave_request.status == 'approved']
+        if not approved:
+            return
+
+        departments = dict(
+            Employee.objects.filter(id__in={leave_request.employee_id for leave_request in approved})
+            .values_list('id', 'department')
+        )
+        self.bulk_create([
+            AbsenceDay(
+                date=leave_request.start_date + timedelta(days=offset),
+                employee_id=leave_request.employee_id,
+                department=departments.get(leave_request.employee_id, 'OTHER'),
+                leave_request_id=leave_request.id,
+            )
+            for leave_request in approved
+            for offset in range((leave_request.end_date - leave_request.start_date).days + 1)
+        ], batch_size=1000, ignore_conflicts=True)
+
+    # Absences of one department between two dates (inclusive)
+    def for_department(self, department, start_date, end_date):
+        return self.filter(department=department, date__gte=start_date, date__lte=end_date)
+
+
+class AbsenceDay(models.Model):
+    date = models.DateField()
+    department = models.CharField(max_length=20, choices=Employee.DEPARTMENT_CHOICES)
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    leave_request = models.ForeignKey(LeaveRequest, on_delete=models.CASCADE)
+
+    objects = AbsenceDayQuerySet.as_manager()
+
+    def __str__(self):
+        return f"AbsenceDay: {self.date} - employee {self.employee_id} ({self.department})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['leave_request', 'date'], name='absenceday_unique_request_date'),
+        ]
+        indexes = [
+            models.Index(fields=['department', 'date'], name='absenceday_department_date_idx'),
+        ]
+
+
+
+# -------------------------🔸 Deletions (post_delete signals) 🔸-------------------------
+# `Model.delete()` is NOT called for the rows deleted by CASCADE (e.g. `user.delete()` --> his employee --> his balances),
+# but `post_delete` is sent for every one of them, so the cached data is removed here.
+# Only on the parent: the balances are still deleted with ONE query (fast delete), NOT loaded one row at a time.
+@receiver(post_delete, sender=Employee)
+def employee_deleted(sender, instance, **kwargs):
+    # his leave requests and balances are deleted by CASCADE
+    mark_deleted('employee', 'leaverequest', 'leavebalance')
+    invalidate_leave_balances(instance.pk)
+    invalidate_dashboard_stats()
+    invalidate_leave_requests()
@@ -0,0 +1,135 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor, _reverse_ordering
+from rest_framework.utils.urls import remove_query_param
+
+# Keyset (cursor) pagination, Learned from the Source: `https://www.django-rest-framework.org/api-guide/pagination/#cursorpagination`
+# every page is fetched with `WHERE (<ordering fields>) < <cursor position> ... LIMIT page_size`,
+# so page 1000 costs the same as page 1 (no OFFSET scanning)
+# and the client only gets opaque `next` / `previous` links.
+# DRF keeps only the FIRST ordering field in the cursor and skips the rows with the same value with an OFFSET
+# (max `offset_cutoff` = 1000): with many rows on the same `start_date` the pages never end.
+# Here the cursor keeps the values of ALL the ordering fields (compound keyset), the last one is unique (`id`),
+# so every position is unique and no OFFSET is ever needed.
+# NOTE: the ordering fields must be NOT NULL.
+
+class GoLeaveCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size' # client can ask for a smaller/bigger page
+    max_page_size = 100
+    # `id` is the tiebreaker for rows that have the same ordering value
+    ordering = ('-id',)
+
+    def paginate(self, queryset, request, view, serializer_class, **serializer_kwargs):
+        # 1. Get only the rows of the current page from the DB
+        page = self.paginate_queryset(queryset, request, view=view)
+
+        # 2. convert to a JSON using a serializer
+        serializer = serializer_class(page, many=True, **serializer_kwargs)
+
+        # 3. return a response with `next`, `previous` and `results`
+        return self.get_paginated_response(serializer.data)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        # a `previous` cursor reads the rows before the position backwards
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, self.decode_position(queryset.model, position)))
+
+        # one extra row tells if there is a page after this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    # the rows after `values` in the order `ordering`:
+    # `a > 1 OR (a = 1 AND b > 2) OR (a = 1 AND b = 2 AND c > 3)`, plus `a >= 1` so the index range starts there
+    def after(self, ordering, values):
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            condition |= Q(**equal, **{f"{name}__{'lt' if field.startswith('-') else 'gt'}": value})
+            equal[name] = value
+        first = ordering[0]
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]}) & condition
+
+    def decode_position(self, model, position):
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [model._meta.get_field(field.lstrip('-')).to_python(value) for field, value in zip(self.ordering, values)]
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value if isinstance(value, int) else str(value))
+        return json.dumps(values)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # an empty `previous` page (rows deleted meanwhile): start again from the first page
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        # an empty page (after the last row): the last page, read backwards from the end
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+
+class LeaveRequestCursorPagination(GoLeaveCursorPagination):
+    # same as `LeaveRequest.Meta.ordering` (newest first)
+    ordering = ('-created_at', '-id')
+
+    # `?ordering=` of the list (e.g. 'start_date'), `id` in the same direction is the tiebreaker
+    def __init__(self, ordering=None):
+        if ordering:
+            self.ordering = (ordering, '-id' if ordering.startswith('-') else 'id')
+
+
+class UserCursorPagination(GoLeaveCursorPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class EmployeeCursorPagination(GoLeaveCursorPagination):
+    ordering = ('-id',)
+
+
+class LeaveBalanceCursorPagination(GoLeaveCursorPagination):
+    # NOT `last_updated`, because it changes on every save and the cursor will jump!
+    ordering = ('-id',)
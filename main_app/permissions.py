@@ -1,11 +1,14 @@
 from rest_framework import permissions
+from .authentication import get_user_role
+
+# the role comes from the token claims (NO DB query), or from `request.user.employee` for old tokens
 
 class IsAdminUser(permissions.BasePermission):
     # Only Admins
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'employee') and request.user.employee.role == 'admin'
+        return get_user_role(request.user) == 'admin'
 
 class IsEmployeeUser(permissions.BasePermission):
     # Only Employees
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'employee') and request.user.employee.role == 'employee'
\ No newline at end of file
+        return get_user_role(request.user) == 'employee'
\ No newline at end of file
@@ -0,0 +1,45 @@
+from types import MappingProxyType
+
+from .cache import VersionedLocalCopy
+
+# In-memory registry of the leave types
+# `LeaveType` is a tiny table that almost never changes, but it is read on every balance check and every leave request,
+# so every worker keeps a read-only copy of it (by `id` and by `type`) instead of asking the DB each time.
+# When a leave type is saved, the version stamp in the cache changes and every worker reloads its copy.
+
+LEAVE_TYPES_VERSION_KEY = 'goleave:leave-types:version'
+
+
+class LeaveTypeRegistry(VersionedLocalCopy):
+    version_key = LEAVE_TYPES_VERSION_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._by_id = MappingProxyType({})
+        self._by_type = MappingProxyType({})
+
+    def _load(self, version):
+        from .models import LeaveType
+
+        leave_types = list(self.from_primary(LeaveType.objects).order_by('id'))
+        self._by_id = MappingProxyType({leave_type.id: leave_type for leave_type in leave_types})
+        self._by_type = MappingProxyType({leave_type.type: leave_type for leave_type in leave_types})
+
+    # Get leave type by id (or None), the returned object is shared, do NOT change it!
+    def get(self, leave_type_id):
+        self._refresh()
+        return self._by_id.get(leave_type_id)
+
+    # Get leave type by `type` code (e.g. 'ANNUAL') or None
+    def get_by_type(self, type_code):
+        self._refresh()
+        return self._by_type.get(type_code)
+
+    def all(self):
+        self._refresh()
+        return tuple(self._by_id.values())
+
+    # `invalidate()` is called from `LeaveType.save()` / `LeaveType.delete()`
+
+
+leave_types = LeaveTypeRegistry()
@@ -0,0 +1,77 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Read replicas, Learned from the Source: `https://docs.djangoproject.com/en/5.2/topics/db/multi-db/#database-routers`
+# the aliases in `GOLEAVE_READ_REPLICAS` are copies of the primary (`default`) kept up to date by the DB replication.
+# `ReplicaStickinessMiddleware` (`main_app/middleware.py`) decides for every request where its reads go:
+#   - GET / HEAD / OPTIONS --> one replica (picked at random, the same for the whole request)
+#   - POST / PUT / PATCH / DELETE --> the primary (reads and writes), then the user is "pinned" to the primary
+#     for `GOLEAVE_REPLICA_STICKY_SECONDS`, so he reads his own writes (e.g. his balance after an approval)
+#     even if the replicas are a few seconds behind.
+# Reads outside a request (management commands, shell, tests) and reads inside a transaction always use the primary.
+
+DEFAULT_STICKY_SECONDS = 10
+
+# the replica of the current request, None --> primary
+read_database = ContextVar('goleave_read_database', default=None)
+
+
+def read_replicas():
+    return list(getattr(settings, 'GOLEAVE_READ_REPLICAS', []))
+
+
+def sticky_seconds():
+    return getattr(settings, 'GOLEAVE_REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+
+
+class ReadReplicaRouter:
+    # `DATABASE_ROUTERS = ['main_app.replicas.ReadReplicaRouter']`
+
+    def db_for_read(self, model, **hints):
+        alias = read_database.get()
+        if alias is None:
+            return None # no opinion: the primary (or the DB of the related object)
+        # a read in a transaction of the primary must see its uncommitted rows (e.g. `select_for_update()`)
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas have the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # the replicas get the tables from the replication
+        return db == DEFAULT_DB_ALIAS
+
+
+# -------------------------🔸 Read-your-writes 🔸-------------------------
+def pin_key(user_id):
+    # set after a write of this user, until it expires his reads go to the primary
+    # (in the `default` cache: must be shared by the workers, the next request may go to another one)
+    return f'goleave:primary-pin:{user_id}'
+
+
+def choose_read_database(replicas):
+    return random.choice(replicas)
+
+
+# a replica may NOT have the change made at `changed_at` (seconds) yet: validators taken from a version stamp
+# (e.g. the ETag of the leave requests list) must NOT be sent with rows read from it
+def replica_may_lag(changed_at):
+    return read_database.get() is not None and time.time() - changed_at < sticky_seconds()
+
+
+# shorter cache timeout for data read from a replica: a lagging replica may return rows older than the write
+# that invalidated the cache, so the entry must NOT live longer than the replication lag we accept
+def replica_cache_timeout(timeout):
+    if read_database.get() is None:
+        return timeout
+    return min(timeout, sticky_seconds())
@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LeaveBalance, BalanceRolloverCheckpoint
+from .registry import leave_types
+from .cache import invalidate_dashboard_stats, invalidate_leave_balances
+
+# Yearly leave balances reset (used by `python manage.py rollover_leave_balances`)
+# every active balance with `reset_date` before the run date starts a new year:
+#   total_days = remaining_days = max_days_allowed + carried over days, used_days = 0, reset_date = Dec 31 of the run year
+#   carried over days = min(remaining_days, `LeaveType.max_carry_over_days`)
+# The balances are processed in chunks ordered by id (keyset, NOT offset), every chunk is ONE short transaction
+# (lock the chunk rows + one `UPDATE` per leave type + save the checkpoint), so:
+#   - other requests wait at most one chunk for a balance row
+#   - after a crash, the next run continues after the last saved chunk
+
+ROLLOVER_CHUNK_SIZE = 1000
+
+
+def expired_balances(run_date):
+    return LeaveBalance.objects.filter(is_active=True, reset_date__lt=run_date)
+
+
+def new_summary(run_date):
+    return {
+        'run_date': run_date,
+        'processed': 0,
+        'carried_over_days': 0,
+        'forfeited_days': 0,
+        'by_leave_type': defaultdict(lambda: {'balances': 0, 'carried_over_days': 0, 'forfeited_days': 0}),
+    }
+
+
+# Add the balances of one chunk to the summary, returns {leave type: [balance ids]}
+def summarize_chunk(summary, rows):
+    ids_by_leave_type = defaultdict(list)
+    for balance_id, leave_type_id, remaining_days in rows:
+        leave_type = leave_types.get(leave_type_id)
+        if leave_type is None:
+            continue
+        carried_over = min(remaining_days, leave_type.max_carry_over_days)
+        ids_by_leave_type[leave_type].append(balance_id)
+
+        totals = summary['by_leave_type'][leave_type.type]
+        totals['balances'] += 1
+        totals['carried_over_days'] += carried_over
+        totals['forfeited_days'] += remaining_days - carried_over
+        summary['processed'] += 1
+        summary['carried_over_days'] += carried_over
+        summary['forfeited_days'] += remaining_days - carried_over
+    return ids_by_leave_type
+
+
+def rollover_balances(run_date=None, chunk_size=ROLLOVER_CHUNK_SIZE, dry_run=False, restart=False):
+    run_date = run_date or date.today()
+    reset_date = date(run_date.year, 12, 31)
+    queryset = expired_balances(run_date).order_by('id').values_list('id', 'leave_type_id', 'remaining_days')
+    summary = new_summary(run_date)
+
+    # Dry run: read the chunks and report the changes, NO writes (not even the checkpoint)
+    if dry_run:
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not rows:
+                break
+            summarize_chunk(summary, rows)
+            last_id = rows[-1][0]
+        summary['dry_run'] = True
+        return summary
+
+    # 1. Get (or create) the checkpoint of this run
+    checkpoint, created = BalanceRolloverCheckpoint.objects.get_or_create(run_date=run_date)
+    if restart and not created:
+        # the totals of the aborted run are reset with the cursor
+        checkpoint.last_balance_id = 0
+        checkpoint.processed = 0
+        checkpoint.carried_over_days = 0
+        checkpoint.finished_at = None
+        checkpoint.save(update_fields=['last_balance_id', 'processed', 'carried_over_days', 'finished_at', 'updated_at'])
+    summary['resumed_after_id'] = checkpoint.last_balance_id
+    last_id = checkpoint.last_balance_id
+
+    # 2. Process one chunk per transaction
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.select_for_update().filter(id__gt=last_id)[:chunk_size])
+            if not rows:
+                break
+
+            chunk_summary = new_summary(run_date)
+            for leave_type, balance_ids in summarize_chunk(chunk_summary, rows).items():
+                LeaveBalance.objects.filter(id__in=balance_ids).rollover(leave_type, reset_date)
+
+            last_id = rows[-1][0]
+            BalanceRolloverCheckpoint.objects.filter(id=checkpoint.id).update(
+                last_balance_id=last_id,
+                processed=F('processed') + chunk_summary['processed'],
+                carried_over_days=F('carried_over_days') + chunk_summary['carried_over_days'],
+                updated_at=timezone.now(),
+            )
+
+        # `update()` does NOT call `LeaveBalance.save()`, so remove the cached balances after every chunk
+        invalidate_leave_balances()
+        merge_summary(summary, chunk_summary)
+
+    # 3. Done
+    BalanceRolloverCheckpoint.objects.filter(id=checkpoint.id).update(finished_at=timezone.now())
+    if summary['processed']:
+        invalidate_dashboard_stats()
+    summary['dry_run'] = False
+    return summary
+
+
+def merge_summary(summary, chunk_summary):
+    for key in ('processed', 'carried_over_days', 'forfeited_days'):
+        summary[key] += chunk_summary[key]
+    for leave_type, totals in chunk_summary['by_leave_type'].items():
+        for key, value in totals.items():
+            summary['by_leave_type'][leave_type][key] += value
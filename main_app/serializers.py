@@ -1,5 +1,9 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import User, Employee, LeaveType, LeaveRequest, LeaveBalance
+from rest_framework.settings import api_settings
+from .models import User, Employee, LeaveType, LeaveRequest, LeaveBalance, LeaveHistory
+from datetime import timedelta
+from .registry import leave_types
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,14 +21,183 @@ class LeaveTypeSerializer(serializers.ModelSerializer):
         model = LeaveType
         fields = '__all__'
 
-class LeaveRequestSerializer(serializers.ModelSerializer):
+# Sparse fieldsets, Learned from the Source: `https://www.django-rest-framework.org/api-guide/serializers/#dynamically-modifying-fields`
+# `?fields=id,status,start_date` keeps only these fields, `?expand=employee,leave_type` chooses the nested objects
+# (all of them by default, none when `?fields=` is used without `?expand=`).
+# `restrict_queryset()` then loads only the columns and joins of the kept fields.
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    expandable_fields = {} # ?expand= name --> nested field name
+    method_field_sources = {} # SerializerMethodField name --> model fields it reads
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and expand is None:
+            return
+
+        keep = set(self.fields) - set(self.expandable_fields.values()) if fields is None else set(fields)
+        keep |= {self.expandable_fields[name] for name in expand or ()}
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    # returns (fields, expand) from the query params, raises `ValidationError` for unknown names
+    @classmethod
+    def sparse_fieldset(cls, query_params):
+        fields = expand = None
+        if 'fields' in query_params:
+            fields = [name for name in query_params['fields'].split(',') if name]
+            allowed = set(cls().fields) - set(cls.expandable_fields.values())
+            unknown = [name for name in fields if name not in allowed]
+            if unknown:
+                raise serializers.ValidationError({'fields': [f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(sorted(allowed))}"]})
+        if 'expand' in query_params:
+            expand = [name for name in query_params['expand'].split(',') if name]
+            unknown = [name for name in expand if name not in cls.expandable_fields]
+            if unknown:
+                raise serializers.ValidationError({'expand': [f"Unknown expansion(s): {', '.join(unknown)}. Allowed: {', '.join(cls.expandable_fields)}"]})
+        return fields, expand
+
+    # `.only()` the columns of the kept fields (+ `extra`, e.g. the pagination ordering) and `select_related()` the nested ones
+    def restrict_queryset(self, queryset, *extra):
+        columns, joins = serializer_columns(self)
+        queryset = queryset.only('id', *extra, *columns)
+        return queryset.select_related(*joins) if joins else queryset.select_related(None)
+
+
+# model fields (and joins) used by the fields of a serializer, nested serializers are followed with `__`
+def serializer_columns(serializer, prefix=''):
+    columns, joins = [], []
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.SerializerMethodField):
+            columns += [prefix + source for source in getattr(serializer, 'method_field_sources', {}).get(name, ())]
+        elif isinstance(field, serializers.ModelSerializer):
+            joins.append(prefix + field.source)
+            columns.append(prefix + field.source)
+            nested_columns, nested_joins = serializer_columns(field, f'{prefix}{field.source}__')
+            columns += nested_columns
+            joins += nested_joins
+        else:
+            columns.append(prefix + field.source)
+    return columns, joins
+
+
+class LeaveRequestSerializer(DynamicFieldsModelSerializer):
     employee_details = EmployeeSerializer(source='employee', read_only=True)
-    leave_type_details = LeaveTypeSerializer(source='leave_type', read_only=True)
+    leave_type_details = serializers.SerializerMethodField()
+
+    expandable_fields = {'employee': 'employee_details', 'leave_type': 'leave_type_details'}
+    # `leave_type_details` comes from the registry, it only needs `leave_type_id`
+    method_field_sources = {'leave_type_details': ('leave_type',)}
+
     class Meta:
         model = LeaveRequest
-        fields = '__all__'
-    
+        # `deducted_days` is kept by the balance deductions only
+        exclude = ['deducted_days']
+
+    def get_leave_type_details(self, obj):
+        # Get the leave type from the registry (NO DB query or join)
+        leave_type = leave_types.get(obj.leave_type_id) or obj.leave_type
+        return LeaveTypeSerializer(leave_type).data
+
+    def validate(self, attrs):
+        employee = attrs.get('employee', getattr(self.instance, 'employee', None))
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        leave_status = attrs.get('status', getattr(self.instance, 'status', None))
+
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': 'End date must be after start date!'})
+
+        # Reject overlapping requests of the same employee (ONE indexed probe, a rejected request never conflicts)
+        if employee and start_date and end_date and leave_status != 'rejected':
+            conflict_ids = LeaveRequest.objects.overlap_ids(
+                employee.id, start_date, end_date, exclude_id=getattr(self.instance, 'id', None)
+            )
+            if conflict_ids:
+                raise serializers.ValidationError(overlap_message(conflict_ids))
+
+        return attrs
+
+    def save(self, **kwargs):
+        # `validate()` is a SELECT: a request created at the same time can pass it too,
+        # then the exclusion constraint (PostgreSQL) refuses the second INSERT/UPDATE --> the same 400 error
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError as error:
+            if not LeaveRequest.is_overlap_error(error):
+                raise
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [overlap_message(
+                LeaveRequest.objects.overlap_ids(
+                    self.validated_data.get('employee', getattr(self.instance, 'employee', None)).id,
+                    self.validated_data.get('start_date', getattr(self.instance, 'start_date', None)),
+                    self.validated_data.get('end_date', getattr(self.instance, 'end_date', None)),
+                    exclude_id=getattr(self.instance, 'id', None),
+                )
+            )]})
+
+
+def overlap_message(conflict_ids):
+    return f'Overlaps with existing leave request(s): {", ".join(map(str, conflict_ids))}'
+
+
 class LeaveBalanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = LeaveBalance
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+# Validate the body of the bulk approve/reject/pending endpoint
+class BulkLeaveRequestTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    action = serializers.ChoiceField(choices=LeaveHistory.ACTION_CHOICES)
+    note = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+# Validate the query params of the leave requests conflicts endpoint
+class LeaveRequestConflictsQuerySerializer(serializers.Serializer):
+    employee = serializers.IntegerField(min_value=1)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    exclude = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({'end_date': 'End date must be after start date!'})
+        return attrs
+
+
+# Validate the filters and the sorting of the leave requests list (`GET /leave-requests/`)
+class LeaveRequestListQuerySerializer(serializers.Serializer):
+    # whitelisted sort keys (NOT null columns, so the cursor pagination can use them)
+    ORDERING_CHOICES = ('-created_at', 'created_at', '-start_date', 'start_date', '-end_date', 'end_date')
+
+    status = serializers.ChoiceField(choices=LeaveRequest.STATUS_CHOICES, required=False)
+    employee = serializers.IntegerField(min_value=1, required=False)
+    leave_type = serializers.IntegerField(min_value=1, required=False)
+    department = serializers.ChoiceField(choices=Employee.DEPARTMENT_CHOICES, required=False)
+    # requests that share at least one day with [start_date, end_date]
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    ordering = serializers.ChoiceField(choices=ORDERING_CHOICES, default='-created_at')
+
+    def validate(self, attrs):
+        if attrs.get('start_date') and attrs.get('end_date') and attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({'end_date': 'End date must be after start date!'})
+        return attrs
+
+
+# Validate the query params of the team absence calendar endpoint
+class AbsenceCalendarQuerySerializer(serializers.Serializer):
+    MAX_DAYS = 366
+
+    department = serializers.ChoiceField(choices=Employee.DEPARTMENT_CHOICES)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({'end_date': 'End date must be after start date!'})
+        if attrs['end_date'] - attrs['start_date'] >= timedelta(days=self.MAX_DAYS):
+            raise serializers.ValidationError({'end_date': f'The period can NOT be longer than {self.MAX_DAYS} days.'})
+        return attrs
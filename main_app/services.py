@@ -0,0 +1,254 @@
+import time
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LeaveRequest, LeaveHistory, LeaveBalance, AbsenceDay
+from .cache import invalidate_dashboard_stats, invalidate_leave_balances, invalidate_leave_requests
+from .metrics import observe_transitions, observe_balance_deductions
+
+# Leave request status changes (approve / reject / pending)
+
+
+# A rejected request can NOT go back to pending/approved if another (not rejected) request of the employee overlaps it
+class LeaveRequestOverlapError(Exception):
+    def __init__(self, conflict_ids):
+        self.conflict_ids = conflict_ids
+        super().__init__(f'Overlaps with existing leave request(s): {", ".join(map(str, conflict_ids))}')
+
+
+# Change the status of ONE leave request (used by approve / reject / pending views)
+# in one transaction with the request row locked, so two admins approving at the same time
+# deduct the balance only once:
+#   - 1 UPDATE on the leave request
+#   - 1 UPDATE on the balance (only when it becomes 'approved')
+#   - 1 INSERT on the history
+# returns (leave_request, changed), raises `LeaveRequest.DoesNotExist` and `LeaveRequestOverlapError`
+def transition_leave_request(leave_request_id, action, user, note=''):
+    started = time.perf_counter()
+    with transaction.atomic():
+        # 1. Get and lock the leave request (`SELECT ... FOR UPDATE`)
+        leave_request = LeaveRequest.objects.select_for_update().get(id=leave_request_id)
+
+        # 2. Same status --> nothing to do
+        changed = leave_request.status != action
+        if changed:
+            # 3. A rejected request did NOT count in the overlap check, check it again before it counts
+            if leave_request.status == 'rejected':
+                conflict_ids = LeaveRequest.objects.overlap_ids(
+                    leave_request.employee_id, leave_request.start_date, leave_request.end_date, exclude_id=leave_request.id
+                )
+                if conflict_ids:
+                    raise LeaveRequestOverlapError(conflict_ids)
+
+            # 4. Update the status (`save()` deducts the balance if it becomes 'approved', or gives it back if it stops being approved)
+            leave_request.status = action
+            try:
+                with transaction.atomic(): # savepoint: the conflicts can still be read after the error
+                    leave_request.save(update_fields=[
+                        'status', 'total_days', 'deducted_days', 'warning_message', 'is_warning_displayed', 'updated_at'
+                    ])
+            except IntegrityError as error:
+                # another overlapping request was reopened/created at the same time (exclusion constraint, PostgreSQL)
+                if not LeaveRequest.is_overlap_error(error):
+                    raise
+                raise LeaveRequestOverlapError(LeaveRequest.objects.overlap_ids(
+                    leave_request.employee_id, leave_request.start_date, leave_request.end_date, exclude_id=leave_request.id
+                ))
+
+            # 5. Add new row on Leave History table (status already matches, so it does NOT save the request again)
+            LeaveHistory.objects.create(
+                leave_request=leave_request,
+                action_type=action,
+                action_by_user_id=user.id,
+                note=note,
+            )
+
+    observe_transitions(action, int(changed), time.perf_counter() - started, 'single')
+    return leave_request, changed
+
+
+# Change the status of many leave requests in ONE transaction
+# instead of (save request + save history + save request again + save balance) for every request:
+#   1. lock the requests (`SELECT ... FOR UPDATE`), skip the rejected ones that would overlap another request
+#   2. deduct the balances (approvals) with one `UPDATE ... SET used_days = used_days + n` per employee & leave type,
+#      or give back the days of the requests that stop being approved (also one UPDATE per employee & leave type)
+#   3. change the status with set-based `UPDATE ... WHERE id IN (...)`
+#   4. add all the history rows with one `bulk_create()`
+#   5. rebuild the absence calendar days of the changed requests (1 DELETE + 1 INSERT)
+# returns one result for every id (in the same order)
+def bulk_transition_leave_requests(leave_request_ids, action, user, note=''):
+    leave_request_ids = list(dict.fromkeys(leave_request_ids)) # remove duplicated ids
+    results = {}
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        # 1. Get and lock the leave requests (ordered by id, so two batches never lock in a different order --> deadlock)
+        leave_requests = list(
+            LeaveRequest.objects.select_for_update()
+            .filter(id__in=leave_request_ids)
+            .order_by('id')
+            .only('id', 'status', 'total_days', 'deducted_days', 'employee_id', 'leave_type_id', 'start_date', 'end_date')
+        )
+        to_update = [leave_request for leave_request in leave_requests if leave_request.status != action]
+
+        for leave_request in leave_requests:
+            if leave_request.status == action:
+                results[leave_request.id] = {'leave_request_id': leave_request.id, 'result': 'unchanged', 'status': action}
+
+        # rejected requests that go back to pending/approved must NOT overlap another request of the employee
+        if action != 'rejected':
+            conflicts = find_reopen_overlaps(to_update)
+            for leave_request in to_update:
+                if leave_request.id in conflicts:
+                    results[leave_request.id] = {
+                        'leave_request_id': leave_request.id, 'result': 'overlap', 'status': leave_request.status,
+                        'conflicts': conflicts[leave_request.id],
+                    }
+            to_update = [leave_request for leave_request in to_update if leave_request.id not in conflicts]
+
+        # 2. Deduct the balances of the approved requests, give back the days of the requests that are not approved anymore
+        deducted_ids = set()
+        if action == 'approved':
+            deducted_ids = deduct_balances(to_update)
+        else:
+            refund_balances([leave_request for leave_request in to_update if leave_request.status == 'approved'])
+
+        # 3. Update the status (set-based, `update()` does NOT set `auto_now` fields)
+        update_ids = [leave_request.id for leave_request in to_update]
+        now = timezone.now()
+        if action == 'approved':
+            LeaveRequest.objects.filter(id__in=deducted_ids).update(
+                status=action, deducted_days=F('total_days'), warning_message='', is_warning_displayed=False, updated_at=now
+            )
+            LeaveRequest.objects.filter(id__in=update_ids).exclude(id__in=deducted_ids).update(
+                status=action, warning_message=LeaveRequest.NOT_DEDUCTED_WARNING, is_warning_displayed=True, updated_at=now
+            )
+        else:
+            LeaveRequest.objects.filter(id__in=update_ids).update(status=action, deducted_days=0, updated_at=now)
+
+        # 4. Add new rows on Leave History table (`bulk_create()` does NOT call `LeaveHistory.save()`)
+        LeaveHistory.objects.bulk_create([
+            LeaveHistory(leave_request_id=leave_request_id, action_type=action, action_by_user_id=user.id, note=note)
+            for leave_request_id in update_ids
+        ])
+
+        # 5. Absence calendar (`update()` does NOT call `LeaveRequest.save()`)
+        for leave_request in to_update:
+            leave_request.status = action
+        AbsenceDay.objects.sync(to_update)
+
+        for leave_request in to_update:
+            result = {'leave_request_id': leave_request.id, 'result': 'updated', 'status': action}
+            if action == 'approved':
+                result['balance_deducted'] = leave_request.id in deducted_ids
+            results[leave_request.id] = result
+
+    observe_transitions(action, len(to_update), time.perf_counter() - started, 'bulk')
+
+    # `update()` and `bulk_create()` do NOT call `save()`, so remove the cached data here
+    if to_update:
+        invalidate_dashboard_stats()
+        invalidate_leave_requests()
+        for employee_id in {leave_request.employee_id for leave_request in to_update}:
+            invalidate_leave_balances(employee_id)
+
+    return [
+        results.get(leave_request_id, {'leave_request_id': leave_request_id, 'result': 'not_found'})
+        for leave_request_id in leave_request_ids
+    ]
+
+
+# The rejected requests (of `leave_requests`) that can NOT leave 'rejected' because they overlap another
+# (not rejected) request of the same employee, returns {leave request id: conflict ids}.
+# ONE query for the other requests of these employees in the period of the batch, then checked in memory
+# (oldest first: of two reopened requests that overlap each other, the first one wins)
+def find_reopen_overlaps(leave_requests):
+    reopened = [leave_request for leave_request in leave_requests if leave_request.status == 'rejected']
+    if not reopened:
+        return {}
+
+    reopened_ids = {leave_request.id for leave_request in reopened}
+    taken = defaultdict(list)
+    for other in (
+        LeaveRequest.objects.filter(
+            employee_id__in={leave_request.employee_id for leave_request in reopened},
+            start_date__lte=max(leave_request.end_date for leave_request in reopened),
+            end_date__gte=min(leave_request.start_date for leave_request in reopened),
+        )
+        .exclude(status='rejected')
+        .exclude(id__in=reopened_ids)
+        .only('id', 'employee_id', 'start_date', 'end_date')
+    ):
+        taken[other.employee_id].append(other)
+
+    conflicts = {}
+    for leave_request in reopened:
+        conflict_ids = sorted(
+            other.id for other in taken[leave_request.employee_id]
+            if other.start_date <= leave_request.end_date and other.end_date >= leave_request.start_date
+        )
+        if conflict_ids:
+            conflicts[leave_request.id] = conflict_ids[:10]
+        else:
+            taken[leave_request.employee_id].append(leave_request)
+    return conflicts
+
+
+# Deduct `total_days` of the approved requests from the balances, returns the ids of the requests that were deducted
+def deduct_balances(leave_requests):
+    # group the requests by (employee, leave type) --> one UPDATE for each balance
+    groups = defaultdict(list)
+    for leave_request in leave_requests:
+        groups[(leave_request.employee_id, leave_request.leave_type_id)].append(leave_request)
+    if not groups:
+        return set()
+
+    # 1. Get and lock all the balances of these groups in ONE query
+    employee_ids = {employee_id for employee_id, leave_type_id in groups}
+    leave_type_ids = {leave_type_id for employee_id, leave_type_id in groups}
+    balances = {
+        (balance.employee_id, balance.leave_type_id): balance
+        for balance in LeaveBalance.objects.select_for_update()
+        .filter(employee_id__in=employee_ids, leave_type_id__in=leave_type_ids)
+        .only('id', 'employee_id', 'leave_type_id', 'remaining_days')
+    }
+
+    deducted_ids = set()
+    for key, group in groups.items():
+        balance = balances.get(key)
+        if balance is None:
+            continue # no balance record --> nothing to deduct
+
+        # 2. take the requests that fit in the remaining days (oldest first)
+        remaining_days = balance.remaining_days
+        days_to_reduce = 0
+        for leave_request in group:
+            days = leave_request.total_days or 0
+            if days <= remaining_days:
+                remaining_days -= days
+                days_to_reduce += days
+                deducted_ids.add(leave_request.id)
+
+        # 3. one UPDATE for all of them
+        if days_to_reduce:
+            LeaveBalance.objects.filter(id=balance.id).deduct(days_to_reduce)
+
+    # counted only if the transaction is committed
+    failed = len(leave_requests) - len(deducted_ids)
+    transaction.on_commit(lambda: observe_balance_deductions(deducted=len(deducted_ids), failed=failed))
+    return deducted_ids
+
+
+# Give back the days deducted by the approval of these requests (they are not approved anymore)
+def refund_balances(leave_requests):
+    # group the deducted days by (employee, leave type) --> one UPDATE for each balance
+    days = defaultdict(int)
+    for leave_request in leave_requests:
+        days[(leave_request.employee_id, leave_request.leave_type_id)] += leave_request.deducted_days
+
+    for (employee_id, leave_type_id), days_to_refund in days.items():
+        if days_to_refund:
+            LeaveBalance.objects.filter(employee_id=employee_id, leave_type_id=leave_type_id).refund(days_to_refund)
@@ -0,0 +1,61 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+# Streaming export (NDJSON = one JSON object per line), Source: `https://github.com/ndjson/ndjson-spec`
+# Used by the big list endpoints with `?format=ndjson` (or `Accept: application/x-ndjson`)
+# the rows are read from the DB in chunks (server-side cursor on PostgreSQL) and written to the client
+# while they are encoded, so the worker memory stays flat however big the table is.
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# rows read from the DB per round trip
+STREAM_CHUNK_SIZE = 2000
+
+# rows encoded before sending them to the client (few big writes instead of many tiny writes)
+STREAM_ROWS_PER_WRITE = 100
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = NDJSON_MEDIA_TYPE
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for normal `Response`s in ndjson mode (e.g. errors), the rows are streamed by `ndjson_response()`
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(encode_row(row) for row in rows).encode(self.charset)
+
+
+# list endpoints that support the streaming export use these renderers
+EXPORT_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+
+def encode_row(row):
+    return json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+
+def is_ndjson_request(request):
+    return getattr(request.accepted_renderer, 'format', None) == NDJSONRenderer.format
+
+
+def ndjson_response(queryset, serializer_class):
+    # one serializer for all rows (NOT a new serializer for every row)
+    serializer = serializer_class()
+
+    def stream_rows():
+        lines = []
+        for obj in queryset.iterator(chunk_size=STREAM_CHUNK_SIZE):
+            lines.append(encode_row(serializer.to_representation(obj)))
+            if len(lines) >= STREAM_ROWS_PER_WRITE:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    return StreamingHttpResponse(stream_rows(), content_type=f'{NDJSON_MEDIA_TYPE}; charset=utf-8')
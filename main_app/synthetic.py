@@ -0,0 +1,205 @@
+import random
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .models import User, Employee, LeaveType, LeaveRequest, LeaveBalance, LeaveHistory, AbsenceDay
+from .workdays import workdays
+from .cache import invalidate_dashboard_stats, invalidate_leave_balances, invalidate_leave_requests
+
+# Synthetic organization (used by `python manage.py generate_synthetic_data` and the benchmarks)
+# the same seed always gives the same employees, requests, statuses and dates (`random.Random(seed)`),
+# so two runs (or two releases) are measured on the same data.
+# Everything is created with `bulk_create()`, the usernames start with `synthetic<seed>_`.
+
+SYNTHETIC_PASSWORD = 'goleave-synthetic'
+
+# one admin for every 50 employees
+EMPLOYEES_PER_ADMIN = 50
+
+# leave type: (weight, min days, max days)
+LEAVE_TYPE_MIX = {
+    'ANNUAL': (60, 1, 10),
+    'SICK': (20, 1, 3),
+    'EMERGENCY': (10, 1, 2),
+    'PATIENT_CARE': (4, 1, 5),
+    'BEREAVEMENT': (3, 1, 5),
+    'SPECIAL': (3, 1, 15),
+}
+
+# status of the requests that already started: (status, weight)
+PAST_STATUS_MIX = (('approved', 70), ('rejected', 15), ('pending', 10), (None, 5))
+FUTURE_STATUS_MIX = (('pending', 60), ('approved', 25), ('rejected', 5), (None, 10))
+
+HISTORY_DAYS = 730 # requests start from 2 years ago ...
+FUTURE_DAYS = 90 # ... until 3 months from today
+
+
+def username_prefix(seed):
+    return f'synthetic{seed}_'
+
+
+def delete_org(seed):
+    # the employees, requests, balances and history are removed by `on_delete=CASCADE`
+    deleted, _ = User.objects.filter(username__startswith=username_prefix(seed)).delete()
+    invalidate_dashboard_stats()
+    invalidate_leave_balances()
+    return deleted
+
+
+@contextmanager
+def keep_dates(model, field_name):
+    # `auto_now_add` replaces the generated dates with now in `bulk_create()`, turn it off while creating the rows
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def weighted_choice(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def generate_org(employees=100, leave_requests=1000, seed=1, today=None):
+    rng = random.Random(seed)
+    today = today or date.today()
+    prefix = username_prefix(seed)
+    leave_types_by_code = {leave_type.type: leave_type for leave_type in LeaveType.objects.all()}
+    leave_type_mix = [(code, mix) for code, mix in LEAVE_TYPE_MIX.items() if code in leave_types_by_code]
+
+    with transaction.atomic():
+        # 1. Users & employees (one password hash for everybody, fixed salt --> same data for the same seed)
+        password = make_password(SYNTHETIC_PASSWORD, salt='goleavesynthetic')
+        users = User.objects.bulk_create([
+            User(
+                username=f'{prefix}{i}',
+                email=f'{prefix}{i}@example.com',
+                password=password,
+                first_name=f'First{i}',
+                last_name=f'Last{i}',
+            )
+            for i in range(employees)
+        ], batch_size=1000)
+        departments = [code for code, name in Employee.DEPARTMENT_CHOICES]
+        admins_count = max(1, employees // EMPLOYEES_PER_ADMIN)
+        employee_rows = Employee.objects.bulk_create([
+            Employee(
+                user_id=user.id,
+                job_title=rng.choice(['Developer', 'Accountant', 'Designer', 'Engineer', 'Specialist', 'Manager']),
+                department=rng.choice(departments),
+                role='admin' if i < admins_count else 'employee',
+                hire_date=date(2015, 1, 1) + timedelta(days=rng.randrange(3650)),
+            )
+            for i, user in enumerate(users)
+        ], batch_size=1000)
+        admin_user_ids = [employee.user_id for employee in employee_rows[:admins_count]]
+
+        # 2. Leave requests: every employee walks forward in time, so his requests never overlap
+        requests_per_employee = [leave_requests // employees] * employees
+        for i in rng.sample(range(employees), leave_requests % employees):
+            requests_per_employee[i] += 1
+
+        rows = []
+        for employee, count in zip(employee_rows, requests_per_employee):
+            if not count:
+                continue
+            max_gap = max(2, (HISTORY_DAYS + FUTURE_DAYS) // count - 5)
+            start_date = today - timedelta(days=HISTORY_DAYS - rng.randrange(max_gap))
+            for j in range(count):
+                code, (weight, min_days, max_days) = weighted_choice(rng, [((code, mix), mix[0]) for code, mix in leave_type_mix])
+                end_date = start_date + timedelta(days=rng.randint(min_days, max_days) - 1)
+                status_mix = PAST_STATUS_MIX if start_date <= today else FUTURE_STATUS_MIX
+                rows.append(LeaveRequest(
+                    employee_id=employee.id,
+                    leave_type_id=leave_types_by_code[code].id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    reason=f'Synthetic {leave_types_by_code[code].get_type_display()}',
+                    is_outside_country=rng.random() < 0.1,
+                    status=weighted_choice(rng, status_mix),
+                    # created a few days before the leave
+                    created_at=timezone.make_aware(
+                        datetime.combine(start_date - timedelta(days=rng.randint(3, 30)), time(8)) + timedelta(minutes=rng.randrange(600))
+                    ),
+                ))
+                start_date = end_date + timedelta(days=rng.randint(1, max_gap))
+
+        # working days of ALL requests in ONE `busday_count()` call
+        for leave_request, total_days in zip(rows, workdays.count_many([row.start_date for row in rows], [row.end_date for row in rows])):
+            leave_request.total_days = total_days
+
+        # 3. Balances of every employee x leave type, with the approved requests already deducted
+        # (oldest first, like the admins approved them)
+        balances = {
+            (employee.id, leave_type.id): LeaveBalance(
+                employee_id=employee.id,
+                leave_type_id=leave_type.id,
+                total_days=leave_type.max_days_allowed,
+                used_days=0,
+                remaining_days=leave_type.max_days_allowed,
+                reset_date=date(today.year, 12, 31),
+            )
+            for employee in employee_rows
+            for leave_type in leave_types_by_code.values()
+        }
+        for leave_request in sorted(rows, key=lambda row: row.created_at):
+            if leave_request.status != 'approved':
+                continue
+            balance = balances[(leave_request.employee_id, leave_request.leave_type_id)]
+            if leave_request.total_days <= balance.remaining_days:
+                balance.used_days += leave_request.total_days
+                balance.remaining_days -= leave_request.total_days
+                leave_request.deducted_days = leave_request.total_days
+            else:
+                leave_request.warning_message = LeaveRequest.NOT_DEDUCTED_WARNING
+                leave_request.is_warning_displayed = True
+        LeaveBalance.objects.bulk_create(balances.values(), batch_size=1000)
+
+        with keep_dates(LeaveRequest, 'created_at'):
+            rows = LeaveRequest.objects.bulk_create(rows, batch_size=1000)
+
+        # 4. History: one action for every reviewed request (some went back to pending first)
+        history = []
+        for leave_request in rows:
+            if leave_request.status is None:
+                continue
+            action_date = leave_request.created_at + timedelta(hours=rng.randint(1, 72))
+            if leave_request.status != 'pending' and rng.random() < 0.1:
+                history.append(LeaveHistory(
+                    leave_request_id=leave_request.id, action_type='pending', action_date=action_date - timedelta(hours=1),
+                    action_by_user_id=rng.choice(admin_user_ids), note='Needs more details',
+                ))
+            history.append(LeaveHistory(
+                leave_request_id=leave_request.id, action_type=leave_request.status, action_date=action_date,
+                action_by_user_id=rng.choice(admin_user_ids), note='',
+            ))
+        with keep_dates(LeaveHistory, 'action_date'):
+            LeaveHistory.objects.bulk_create(history, batch_size=1000)
+
+        # 5. Absence calendar of the approved requests
+        AbsenceDay.objects.sync(rows)
+
+    # `bulk_create()` does NOT call `save()`
+    invalidate_dashboard_stats()
+    invalidate_leave_balances()
+    invalidate_leave_requests()
+
+    statuses = defaultdict(int)
+    for leave_request in rows:
+        statuses[leave_request.status or 'none'] += 1
+    return {
+        'seed': seed,
+        'employees': len(employee_rows),
+        'admins': admins_count,
+        'leave_requests': len(rows),
+        'statuses': dict(sorted(statuses.items())),
+        'history': len(history),
+        'balances': len(balances),
+    }
@@ -1,3 +1,1767 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+
+from django.test import TestCase, TransactionTestCase, SimpleTestCase, RequestFactory, skipUnlessDBFeature, override_settings
+from django.contrib.auth.hashers import check_password
+from rest_framework_simplejwt.tokens import AccessToken
+from django.db import IntegrityError, connection, transaction
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from datetime import date, datetime, timedelta
+from django.utils import timezone
+
+from .models import User, Employee, LeaveType, LeaveRequest, LeaveBalance, LeaveHistory, AbsenceDay, PublicHoliday, BalanceRolloverCheckpoint, LeaveBalanceQuerySet
+from .registry import leave_types
+from .workdays import workdays
+from django.core.management import call_command
+from django.core.checks import run_checks
+from .authentication import GoLeaveTokenObtainPairSerializer, ClaimsJWTAuthentication, get_user_role
+from .serializers import LeaveRequestSerializer
+from .services import transition_leave_request
+from .imports import hash_passwords, MIN_ROWS_FOR_PROCESS_POOL
+from .rollover import rollover_balances
+from .synthetic import generate_org, delete_org
+from .benchmark import run_benchmarks, run_asgi_benchmarks
+from .async_views import run_queries
+from .metrics import Metrics, metrics, format_labels, labels_key
+from .middleware import ReplicaStickinessMiddleware
+from .replicas import ReadReplicaRouter, pin_key, replica_cache_timeout, replica_may_lag
+from .cache import LEAVE_REQUESTS_CHANGED_AT_KEY
 
 # Create your tests here.
+
+# -------------------------🔸 Helpers 🔸-------------------------
+def create_employee(username, role='employee', department='IT'):
+    user = User.objects.create_user(username=username, first_name=username, last_name='Test')
+    return Employee.objects.create(user=user, job_title='Developer', department=department, role=role, hire_date=date(2024, 1, 1))
+
+
+def access_token(user):
+    # same token as `login/` (with `employee_id` and `role` claims)
+    return GoLeaveTokenObtainPairSerializer.get_token(user).access_token
+
+
+def create_leave_requests(employee, leave_type, count):
+    # the same weekdays one week after the other, after his other requests (overlapping requests are refused by PostgreSQL)
+    first = LeaveRequest.objects.filter(employee=employee).count()
+    for i in range(first, first + count):
+        LeaveRequest.objects.create(
+            employee=employee,
+            leave_type=leave_type,
+            start_date=date(2025, 1, 1) + timedelta(weeks=i),
+            end_date=date(2025, 1, 2) + timedelta(weeks=i),
+            reason=f'reason {i}',
+            status='pending',
+        )
+
+
+# -------------------------🔸 Query budget tests 🔸-------------------------
+# Every endpoint has a maximum number of SQL queries (budget),
+# if a change adds an N+1 query the test will fail instead of slowing down production!
+class QueryBudgetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        create_leave_requests(self.employee, self.leave_type, 5)
+
+        token = access_token(self.admin.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def add_more_rows(self):
+        # add more rows to check the number of queries does NOT grow with the data
+        for i in range(5):
+            employee = create_employee(f'extra{i}')
+            create_leave_requests(employee, self.leave_type, 3)
+
+    def assertMaxQueries(self, max_queries, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f"{url} used {len(queries)} queries (budget: {max_queries}):\n" + "\n".join(q['sql'] for q in queries.captured_queries)
+        )
+
+    def assertQueryBudget(self, max_queries, url):
+        self.assertMaxQueries(max_queries, url)
+        self.add_more_rows()
+        self.assertMaxQueries(max_queries, url)
+
+    def test_list_users(self):
+        self.assertQueryBudget(1, '/api/users/')
+
+    def test_list_employees(self):
+        self.assertQueryBudget(1, '/api/employees/')
+
+    def test_employee_details(self):
+        self.assertQueryBudget(1, f'/api/employees/{self.employee.id}/')
+
+    def test_list_leave_types(self):
+        self.assertQueryBudget(1, '/api/leave-types/')
+
+    def test_list_leave_types_from_registry(self):
+        leave_types.all()
+        self.assertMaxQueries(0, '/api/leave-types/')
+
+    def test_list_leave_requests(self):
+        # one page (the ETag comes from a version stamp in the cache)
+        self.assertQueryBudget(1, '/api/leave-requests/')
+
+    def test_leave_request_details(self):
+        leave_request = LeaveRequest.objects.first()
+        self.assertQueryBudget(1, f'/api/leave-requests/{leave_request.id}/')
+
+    def test_list_leave_balances(self):
+        self.assertQueryBudget(1, '/api/leave-balances/')
+
+    def test_employee_leave_balances(self):
+        # ETag watermark + balances
+        self.assertQueryBudget(2, f'/api/leave-balances/{self.employee.id}/')
+
+    def test_cached_employee_leave_balances(self):
+        url = f'/api/leave-balances/{self.employee.id}/'
+        self.assertMaxQueries(2, url)
+        self.assertMaxQueries(0, url)
+
+    def test_employee_leave_balances_cache_is_invalidated_on_save(self):
+        url = f'/api/leave-balances/{self.employee.id}/'
+        self.assertEqual(self.client.get(url).json()['ANNUAL']['used_days'], 0)
+
+        balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        balance.reduce_days(3)
+
+        self.assertEqual(self.client.get(url).json()['ANNUAL']['used_days'], 3)
+
+    def test_employee_leave_balances_cache_is_invalidated_on_delete(self):
+        other = create_employee('other')
+        urls = [f'/api/leave-balances/{self.employee.id}/', f'/api/leave-balances/{other.id}/']
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        # the employee itself, and an employee deleted by CASCADE with his user
+        self.employee.delete()
+        other.user.delete()
+
+        for url in urls:
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_balances_deleted_by_cascade_are_not_loaded(self):
+        url = f'/api/leave-balances/{self.employee.id}/'
+        balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        balance.delete()
+        self.assertNotIn('ANNUAL', self.client.get(url).json())
+
+        # user --> employee --> balances: ONE DELETE for the balances (fast delete), NO SELECT of them
+        with CaptureQueriesContext(connection) as queries:
+            self.employee.user.delete()
+        balance_selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'leavebalance' in q['sql']]
+        self.assertEqual(balance_selects, [])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_unknown_employee_leave_balances(self):
+        response = self.client.get('/api/leave-balances/999999/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_admin_dashboard(self):
+        # employee + counters (ONE query, a subquery with its own index for each) + recent requests
+        self.assertQueryBudget(3, '/api/dashboard/stats/')
+
+    def test_cached_dashboard(self):
+        # first load fills the cache, the second load does NOT use the DB at all
+        self.assertMaxQueries(3, '/api/dashboard/stats/')
+        self.assertMaxQueries(0, '/api/dashboard/stats/')
+
+    def test_dashboard_cache_is_invalidated_on_save(self):
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.json()['pending_requests'], 5)
+
+        create_leave_requests(self.employee, self.leave_type, 1)
+
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.json()['pending_requests'], 6)
+        self.assertEqual(response.json()['total_employees'], 2)
+
+    def test_employee_dashboard(self):
+        token = access_token(self.employee.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        self.assertMaxQueries(3, '/api/dashboard/stats/')
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.json()['total_requests'], 5)
+        self.assertEqual(response.json()['pending_requests'], 5)
+        self.assertEqual(response.json()['approved_requests'], 0)
+
+    def test_admin_permission_from_token_claims(self):
+        token = access_token(self.employee.user)
+        with self.assertNumQueries(0):
+            response = self.client.patch('/api/leave-requests/bulk/', {'ids': [1], 'action': 'rejected'}, content_type='application/json',
+                                         HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 403)
+
+
+# -------------------------🔸 Query plan tests 🔸-------------------------
+# Seed a realistic amount of data, run the endpoints and check with `EXPLAIN` that
+# every query on the big tables uses an index (NOT a full table scan), works on SQLite and PostgreSQL
+BIG_TABLES = ('main_app_leaverequest', 'main_app_leavebalance', 'main_app_absenceday')
+
+
+class QueryPlanTests(TestCase):
+    EMPLOYEES = 300
+    REQUESTS_PER_EMPLOYEE = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        # 2 years of history: most requests are approved or rejected, only a few are pending
+        generate_org(employees=cls.EMPLOYEES, leave_requests=cls.EMPLOYEES * cls.REQUESTS_PER_EMPLOYEE, seed=1)
+        cls.admin = Employee.objects.filter(role='admin').first()
+        cls.employee = Employee.objects.filter(role='employee').first()
+
+        # planner statistics (like a real DB after autovacuum)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('EXPLAIN output is only parsed for SQLite and PostgreSQL')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(('EXPLAIN ' if connection.vendor == 'postgresql' else 'EXPLAIN QUERY PLAN ') + sql)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def full_scans(self, sql, plan):
+        tables = '|'.join(BIG_TABLES)
+        if connection.vendor == 'postgresql':
+            return re.findall(rf'Seq Scan on ({tables})\b', plan)
+        # SQLite: `SEARCH table USING INDEX ...` is an index lookup, `SCAN table` is a full scan,
+        # `SCAN table USING INDEX ...` reads the whole index in order (OK only to stop early with a LIMIT)
+        if ' LIMIT ' in sql:
+            return re.findall(rf'SCAN (?:TABLE )?({tables})\b(?! USING)', plan)
+        return re.findall(rf'SCAN (?:TABLE )?({tables})\b', plan)
+
+    def assertIndexScans(self, url, user=None):
+        token = access_token((user or self.admin).user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(table in sql for table in BIG_TABLES):
+                continue
+            plan = self.explain(sql)
+            self.assertEqual(self.full_scans(sql, plan), [], f'{url}\n{sql}\n{plan}')
+            checked += 1
+        self.assertGreater(checked, 0, f'{url} did not query the leave tables')
+        return response
+
+    def test_leave_requests_list(self):
+        response = self.assertIndexScans('/api/leave-requests/')
+        self.assertIndexScans(response.json()['next'])
+
+    def test_leave_requests_list_filters(self):
+        month_start = date.today().replace(day=1)
+        # my pending requests
+        self.assertIndexScans(f'/api/leave-requests/?employee={self.employee.id}&status=pending', user=self.employee)
+        # department approved this month
+        self.assertIndexScans(
+            f'/api/leave-requests/?department=IT&status=approved&start_date={month_start}&end_date={month_start.replace(day=28)}'
+        )
+        # sorted by start date
+        self.assertIndexScans('/api/leave-requests/?status=approved&ordering=-start_date')
+        response = self.assertIndexScans('/api/leave-requests/?ordering=start_date')
+        self.assertIndexScans(response.json()['next'])
+        # sorted by end date
+        self.assertIndexScans('/api/leave-requests/?status=approved&ordering=-end_date')
+        response = self.assertIndexScans('/api/leave-requests/?ordering=end_date')
+        self.assertIndexScans(response.json()['next'])
+
+    def test_leave_request_details(self):
+        self.assertIndexScans(f'/api/leave-requests/{LeaveRequest.objects.order_by("id").values_list("id", flat=True)[500]}/')
+
+    def test_admin_dashboard(self):
+        self.assertIndexScans('/api/dashboard/stats/')
+
+    def test_employee_dashboard(self):
+        self.assertIndexScans('/api/dashboard/stats/', user=self.employee)
+
+    def test_employee_leave_balances(self):
+        self.assertIndexScans(f'/api/leave-balances/{self.employee.id}/')
+
+    def test_leave_request_conflicts(self):
+        self.assertIndexScans(f'/api/leave-requests/conflicts/?employee={self.employee.id}&start_date=2024-01-01&end_date=2024-03-01')
+
+    def test_absence_calendar(self):
+        self.assertIndexScans('/api/calendar/?department=IT&start_date=2024-01-01&end_date=2024-01-31')
+
+
+# -------------------------🔸 Streaming export tests 🔸-------------------------
+class StreamingExportTests(TestCase):
+
+    def setUp(self):
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        for i in range(3):
+            create_employee(f'employee{i}')
+
+    def get_rows(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        content = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_export_users(self):
+        rows = self.get_rows('/api/users/?format=ndjson')
+        self.assertEqual([row['username'] for row in rows], ['employee0', 'employee1', 'employee2'])
+
+    def test_export_employees(self):
+        rows = self.get_rows('/api/employees/?format=ndjson')
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['user']['username'], 'employee0')
+
+    def test_export_leave_balances(self):
+        rows = self.get_rows('/api/leave-balances/?format=ndjson')
+        # every employee has a balance of every leave type
+        self.assertEqual(len(rows), 3 * LeaveType.objects.count())
+        self.assertEqual(rows[0]['total_days'], LeaveType.objects.get(id=rows[0]['leave_type']).max_days_allowed)
+
+    def test_json_is_still_paginated(self):
+        response = self.client.get('/api/users/')
+        self.assertEqual(len(response.json()['results']), 3)
+
+
+# -------------------------🔸 Cursor pagination tests 🔸-------------------------
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        self.employee = create_employee('employee')
+        create_leave_requests(self.employee, LeaveType.objects.get(type='ANNUAL'), 7)
+        # newest first
+        self.ids = list(LeaveRequest.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def walk(self, url, link='next'):
+        # follow the `next` (or `previous`) links until the last page, returns the ids of every page
+        pages = []
+        while url:
+            self.assertLess(len(pages), 50, 'the pages never end')
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            pages.append([row['id'] for row in response.json()['results']])
+            url = response.json()[link]
+        return pages, response
+
+    def test_walk_every_page(self):
+        pages, last_page = self.walk('/api/leave-requests/?page_size=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.ids)
+
+        # and back from the last page
+        pages_back, first_page = self.walk(last_page.json()['previous'], link='previous')
+        self.assertEqual(pages_back, list(reversed(pages[:-1])))
+        self.assertIsNone(first_page.json()['previous'])
+
+    def test_same_ordering_value_is_ordered_by_id(self):
+        # all the requests created at the same time: `id` is the tiebreaker, every row comes exactly once
+        LeaveRequest.objects.update(created_at=timezone.make_aware(datetime(2025, 1, 1)))
+        pages, last_page = self.walk('/api/leave-requests/?page_size=2')
+        self.assertEqual(sum(pages, []), sorted(self.ids, reverse=True))
+
+    def test_many_rows_with_the_same_sort_value(self):
+        # more rows on the same `start_date` than DRF's OFFSET limit (1000): the cursor keeps (start_date, id)
+        # (rejected requests, so they do NOT overlap for the exclusion constraint)
+        leave_type = LeaveType.objects.get(type='ANNUAL')
+        LeaveRequest.objects.bulk_create([
+            LeaveRequest(employee=self.employee, leave_type=leave_type, start_date=date(2024, 6, 2), end_date=date(2024, 6, 3),
+                         total_days=2, reason=f'same day {i}', status='rejected')
+            for i in range(1300)
+        ])
+        expected = list(LeaveRequest.objects.order_by('start_date', 'id').values_list('id', flat=True))
+
+        pages, last_page = self.walk('/api/leave-requests/?ordering=start_date&page_size=100&fields=id')
+        self.assertEqual(len(pages), 14)
+        self.assertEqual(sum(pages, []), expected)
+
+        pages_back, first_page = self.walk(last_page.json()['previous'], link='previous')
+        self.assertEqual(pages_back, list(reversed(pages[:-1])))
+        self.assertIsNone(first_page.json()['previous'])
+
+    def test_invalid_cursor(self):
+        for position in ('not json', '[1]', '["x", 1]'):
+            cursor = b64encode(urlencode({'p': position}).encode()).decode()
+            self.assertEqual(self.client.get(f'/api/leave-requests/?cursor={cursor}').status_code, 404, position)
+
+    def test_page_size_limit(self):
+        # 20 employees x every leave type = more balances than the biggest page
+        for i in range(20):
+            create_employee(f'extra{i}')
+        self.assertGreater(LeaveBalance.objects.count(), 100)
+
+        for page_size, expected in (('', 20), ('5', 5), ('1000', 100), ('0', 20), ('abc', 20)):
+            response = self.client.get(f'/api/leave-balances/?page_size={page_size}')
+            self.assertEqual(len(response.json()['results']), expected, page_size)
+
+
+# -------------------------🔸 Leave types registry tests 🔸-------------------------
+class LeaveTypeRegistryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        leave_types.invalidate()
+        token = access_token(self.admin.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_lookup_by_id_and_type(self):
+        annual = LeaveType.objects.get(type='ANNUAL')
+        with self.assertNumQueries(1):
+            self.assertEqual(leave_types.get(annual.id).type, 'ANNUAL')
+        with self.assertNumQueries(0):
+            self.assertEqual(leave_types.get_by_type('ANNUAL').id, annual.id)
+            self.assertIsNone(leave_types.get_by_type('UNKNOWN'))
+
+    def test_registry_is_refreshed_after_update(self):
+        sick = leave_types.get_by_type('SICK')
+        response = self.client.put(
+            f'/api/leave-types/{sick.id}/edit/',
+            {'type': 'SICK', 'description': 'Updated', 'max_days_allowed': 20},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(leave_types.get_by_type('SICK').max_days_allowed, 20)
+
+    def test_deploy_check_needs_a_shared_cache(self):
+        # the version stamp must reach the other worker processes
+        def warnings(backend):
+            with override_settings(CACHES={'default': {'BACKEND': backend}}):
+                return [message.id for message in run_checks(tags=['caches'], include_deployment_checks=True)]
+
+        self.assertEqual(warnings('django.core.cache.backends.locmem.LocMemCache'), ['main_app.W001'])
+        self.assertEqual(warnings('django.core.cache.backends.redis.RedisCache'), [])
+        # NOT in the development checks (`runserver` is one process)
+        self.assertEqual(run_checks(tags=['caches']), [])
+
+
+# -------------------------🔸 Bulk approve/reject/pending tests 🔸-------------------------
+class BulkLeaveRequestTransitionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        self.balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        create_leave_requests(self.employee, self.leave_type, 3) # 2 days each
+        self.ids = list(LeaveRequest.objects.order_by('id').values_list('id', flat=True))
+
+        token = access_token(self.admin.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def bulk(self, ids, action):
+        return self.client.patch('/api/leave-requests/bulk/', {'ids': ids, 'action': action}, content_type='application/json')
+
+    def test_bulk_approve(self):
+        response = self.bulk(self.ids + [999999], 'approved')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertEqual([result['result'] for result in response.json()['results']], ['updated', 'updated', 'updated', 'not_found'])
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.used_days, 6)
+        self.assertEqual(self.balance.remaining_days, 24)
+        self.assertEqual(LeaveRequest.objects.filter(status='approved').count(), 3)
+        self.assertEqual(LeaveHistory.objects.filter(action_type='approved').count(), 3)
+
+    def test_bulk_approve_twice_deducts_once(self):
+        self.bulk(self.ids, 'approved')
+        response = self.bulk(self.ids, 'approved')
+        self.assertEqual(response.json()['updated'], 0)
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.used_days, 6)
+        self.assertEqual(LeaveHistory.objects.count(), 3)
+
+    def test_bulk_approve_with_low_balance(self):
+        LeaveBalance.objects.filter(id=self.balance.id).update(used_days=27, remaining_days=3)
+
+        results = self.bulk(self.ids, 'approved').json()['results']
+        self.assertEqual([result['balance_deducted'] for result in results], [True, False, False])
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.remaining_days, 1)
+        self.assertTrue(LeaveRequest.objects.get(id=self.ids[1]).is_warning_displayed)
+
+    def test_bulk_reject(self):
+        response = self.bulk(self.ids, 'rejected')
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertEqual(LeaveRequest.objects.filter(status='rejected').count(), 3)
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.used_days, 0)
+
+    def test_same_number_of_queries_for_any_batch_size(self):
+        create_leave_requests(self.employee, self.leave_type, 20)
+        for i in range(3):
+            employee = create_employee(f'extra{i}')
+            LeaveBalance.objects.get(employee=employee, leave_type=self.leave_type)
+            create_leave_requests(employee, self.leave_type, 5)
+        ids = list(LeaveRequest.objects.values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            self.bulk(ids, 'approved')
+        # auth + permission + lock requests + lock balances + 4 balances + 2 status updates + history + savepoints
+        self.assertLessEqual(len(queries), 14)
+        self.assertEqual(LeaveRequest.objects.filter(status='approved').count(), len(ids))
+
+    def test_invalid_action(self):
+        response = self.bulk(self.ids, 'deleted')
+        self.assertEqual(response.status_code, 400)
+
+
+# -------------------------🔸 Approve/reject/pending tests 🔸-------------------------
+class LeaveRequestTransitionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        self.balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        create_leave_requests(self.employee, self.leave_type, 1) # 2 days
+        self.leave_request = LeaveRequest.objects.get()
+
+        token = access_token(self.admin.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def patch(self, action, leave_request_id=None):
+        return self.client.patch(f'/api/leave-requests/{leave_request_id or self.leave_request.id}/{action}/')
+
+    def test_approve_deducts_once(self):
+        self.assertEqual(self.patch('approve').status_code, 200)
+        self.assertEqual(self.patch('approve').json()['message'], 'Leave request is already approved')
+
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.used_days, 2)
+        self.assertEqual(self.balance.remaining_days, 28)
+        self.assertEqual(LeaveHistory.objects.count(), 1)
+
+    def test_approve_writes_one_row_per_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.patch('approve')
+        writes = [query['sql'] for query in queries.captured_queries if query['sql'].startswith(('UPDATE', 'INSERT'))]
+        # balance, request, absence calendar days and history
+        self.assertEqual(len(writes), 4, writes)
+
+    def test_reject_after_approve_gives_the_days_back(self):
+        self.patch('approve')
+        self.patch('reject')
+        self.balance.refresh_from_db()
+        self.assertEqual((self.balance.used_days, self.balance.remaining_days), (0, 30))
+
+        self.patch('pending')
+        self.patch('approve')
+        self.balance.refresh_from_db()
+        self.assertEqual((self.balance.used_days, self.balance.remaining_days), (2, 28))
+        self.assertEqual(LeaveRequest.objects.get().status, 'approved')
+        self.assertEqual(LeaveHistory.objects.count(), 4)
+
+    def test_approve_pending_approve_deducts_once(self):
+        for action in ('approve', 'pending', 'approve'):
+            self.assertEqual(self.patch(action).status_code, 200)
+
+        self.balance.refresh_from_db()
+        self.assertEqual((self.balance.used_days, self.balance.remaining_days), (2, 28))
+        self.assertEqual(LeaveRequest.objects.get().deducted_days, 2)
+
+    def test_not_deducted_approval_gives_nothing_back(self):
+        LeaveBalance.objects.filter(id=self.balance.id).update(used_days=29, remaining_days=1)
+        self.patch('approve') # 2 days do NOT fit
+        self.patch('pending')
+
+        self.balance.refresh_from_db()
+        self.assertEqual((self.balance.used_days, self.balance.remaining_days), (29, 1))
+
+    def test_bulk_pending_gives_the_days_back(self):
+        create_leave_requests(self.employee, self.leave_type, 1)
+        ids = list(LeaveRequest.objects.order_by('id').values_list('id', flat=True))
+        bulk = lambda action: self.client.patch('/api/leave-requests/bulk/', {'ids': ids, 'action': action}, content_type='application/json')
+
+        for action in ('approved', 'pending', 'approved'):
+            self.assertEqual(bulk(action).status_code, 200)
+        self.balance.refresh_from_db()
+        self.assertEqual((self.balance.used_days, self.balance.remaining_days), (4, 26))
+
+        self.patch('pending', ids[0]) # single after bulk
+        self.balance.refresh_from_db()
+        self.assertEqual((self.balance.used_days, self.balance.remaining_days), (2, 28))
+
+    def test_not_found(self):
+        self.assertEqual(self.patch('approve', 999999).status_code, 404)
+
+    def test_reduce_days_without_enough_balance(self):
+        self.assertFalse(self.balance.reduce_days(31))
+        self.assertTrue(self.balance.reduce_days(30))
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.remaining_days, 0)
+
+
+# -------------------------🔸 Leave requests list filters & sorting 🔸-------------------------
+class LeaveRequestListFilterTests(TestCase):
+
+    def setUp(self):
+        self.annual = LeaveType.objects.get(type='ANNUAL')
+        self.sick = LeaveType.objects.get(type='SICK')
+        self.it = create_employee('it', department='IT')
+        self.hr = create_employee('hr', department='HR')
+        self.requests = {
+            'it_march': self.create(self.it, self.annual, date(2025, 3, 2), date(2025, 3, 4), 'approved'),
+            'it_april': self.create(self.it, self.sick, date(2025, 3, 30), date(2025, 4, 2), 'pending'),
+            'hr_march': self.create(self.hr, self.annual, date(2025, 3, 10), date(2025, 3, 11), 'approved'),
+            'hr_may': self.create(self.hr, self.annual, date(2025, 5, 4), date(2025, 5, 5), 'rejected'),
+        }
+
+    def create(self, employee, leave_type, start_date, end_date, status):
+        return LeaveRequest.objects.create(
+            employee=employee, leave_type=leave_type, start_date=start_date, end_date=end_date, reason='test', status=status,
+        ).id
+
+    def ids(self, query):
+        response = self.client.get(f'/api/leave-requests/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()['results']]
+
+    def assertResults(self, query, *names):
+        self.assertEqual(sorted(self.ids(query)), sorted(self.requests[name] for name in names))
+
+    def test_filters(self):
+        self.assertResults('status=pending', 'it_april')
+        self.assertResults(f'employee={self.hr.id}', 'hr_march', 'hr_may')
+        self.assertResults(f'leave_type={self.sick.id}', 'it_april')
+        self.assertResults('department=IT', 'it_march', 'it_april')
+
+    def test_date_range_returns_overlapping_requests(self):
+        # department approved this month
+        self.assertResults('department=HR&status=approved&start_date=2025-03-01&end_date=2025-03-31', 'hr_march')
+        # starts in March, ends in April
+        self.assertResults('start_date=2025-04-01&end_date=2025-04-30', 'it_april')
+        self.assertResults('start_date=2025-04-01', 'it_april', 'hr_may')
+        self.assertResults('end_date=2025-03-05', 'it_march')
+
+    def test_ordering(self):
+        self.assertEqual(self.ids('ordering=start_date'), [
+            self.requests['it_march'], self.requests['hr_march'], self.requests['it_april'], self.requests['hr_may'],
+        ])
+        self.assertEqual(self.ids('ordering=-end_date'), [
+            self.requests['hr_may'], self.requests['it_april'], self.requests['hr_march'], self.requests['it_march'],
+        ])
+        # default: newest first
+        self.assertEqual(self.ids(''), sorted(self.requests.values(), reverse=True))
+
+    def test_pagination_keeps_filters_and_ordering(self):
+        response = self.client.get('/api/leave-requests/?status=approved&ordering=start_date&page_size=1')
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.requests['it_march']])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.requests['hr_march']])
+        self.assertIsNone(response.json()['next'])
+
+    def test_invalid_params(self):
+        response = self.client.get('/api/leave-requests/?status=unknown&ordering=reason&employee=abc&start_date=2025-02-01&end_date=2025-01-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'status', 'ordering', 'employee'})
+        response = self.client.get('/api/leave-requests/?start_date=2025-02-01&end_date=2025-01-01')
+        self.assertEqual(set(response.json()), {'end_date'})
+
+
+# -------------------------🔸 Sparse fieldsets (`?fields=` / `?expand=`) 🔸-------------------------
+class SparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        self.employee = create_employee('employee')
+        create_leave_requests(self.employee, LeaveType.objects.get(type='ANNUAL'), 3)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        # the page query
+        selects = [query['sql'] for query in queries.captured_queries if 'main_app_leaverequest' in query['sql']]
+        self.assertEqual(len(selects), 1, selects)
+        return response.json(), selects[0]
+
+    def test_default_payload_is_unchanged(self):
+        data, sql = self.get('/api/leave-requests/')
+        row = data['results'][0]
+        self.assertIn('reason', row)
+        self.assertEqual(row['employee_details']['user']['username'], 'employee')
+        self.assertEqual(row['leave_type_details']['type'], 'ANNUAL')
+        # the nested user does NOT need the password hash
+        self.assertNotIn('"password"', sql)
+
+    def test_fields_trim_the_payload_and_the_sql(self):
+        data, sql = self.get('/api/leave-requests/?fields=id,status,start_date&page_size=2')
+        self.assertEqual([set(row) for row in data['results']], [{'id', 'status', 'start_date'}] * 2)
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"reason"', sql)
+        # the next page works (the cursor column is loaded too, NO query per row)
+        data, sql = self.get(data['next'])
+        self.assertEqual(len(data['results']), 1)
+
+    def test_expand(self):
+        data, sql = self.get('/api/leave-requests/?fields=id&expand=leave_type')
+        self.assertEqual(set(data['results'][0]), {'id', 'leave_type_details'})
+        self.assertNotIn('JOIN', sql)
+
+        data, sql = self.get('/api/leave-requests/?expand=employee')
+        self.assertIn('reason', data['results'][0])
+        self.assertIn('employee_details', data['results'][0])
+        self.assertNotIn('leave_type_details', data['results'][0])
+        self.assertIn('JOIN', sql)
+
+        data, sql = self.get('/api/leave-requests/?expand=')
+        self.assertNotIn('employee_details', data['results'][0])
+        self.assertNotIn('JOIN', sql)
+
+    def test_detail(self):
+        leave_request = LeaveRequest.objects.first()
+        data, sql = self.get(f'/api/leave-requests/{leave_request.id}/?fields=id,total_days')
+        self.assertEqual(data, {'id': leave_request.id, 'total_days': leave_request.total_days})
+
+    def test_unknown_names(self):
+        response = self.client.get('/api/leave-requests/?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['fields'][0])
+        response = self.client.get('/api/leave-requests/?expand=history')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expand', response.json())
+
+
+# -------------------------🔸 Conditional GET (ETag / Last-Modified) 🔸-------------------------
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        create_leave_requests(self.employee, self.leave_type, 3)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {access_token(self.admin.user)}'
+
+    def revalidate(self, url, response, max_queries):
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertLessEqual(len(queries), max_queries, [query['sql'] for query in queries.captured_queries])
+        return again
+
+    def test_leave_types(self):
+        response = self.client.get('/api/leave-types/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+        # from the registry: NO query and NO serialization
+        again = self.revalidate('/api/leave-types/', response, 0)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        self.assertEqual(again['ETag'], response['ETag'])
+
+        self.leave_type.max_days_allowed += 1
+        self.leave_type.save()
+        self.assertEqual(self.client.get('/api/leave-types/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_leave_requests_list(self):
+        url = '/api/leave-requests/?status=pending'
+        response = self.client.get(url)
+        # NO query, the page is NOT read
+        self.assertEqual(self.revalidate(url, response, 0).status_code, 304)
+        # another page / filter / fields --> another ETag
+        self.assertNotEqual(self.client.get('/api/leave-requests/?status=pending&fields=id')['ETag'], response['ETag'])
+
+        # status changed with `update()` (bulk)
+        leave_request = LeaveRequest.objects.first()
+        self.client.patch('/api/leave-requests/bulk/', {'ids': [leave_request.id], 'action': 'rejected'}, content_type='application/json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+        # deleted request
+        LeaveRequest.objects.filter(status='pending').first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+        # renamed department of an employee in the payload
+        self.employee.department = 'HR'
+        self.employee.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_if_modified_since_sees_deletions(self):
+        LeaveType.objects.update(updated_at=timezone.make_aware(datetime(2024, 1, 1)))
+        leave_types.invalidate() # `update()` does NOT call `save()`
+        cache.clear() # deletion times
+        cache.set(LEAVE_REQUESTS_CHANGED_AT_KEY, timezone.make_aware(datetime(2024, 1, 1)).timestamp())
+        response = self.client.get('/api/leave-requests/')
+        self.assertEqual(response['Last-Modified'], 'Mon, 01 Jan 2024 00:00:00 GMT')
+        self.assertEqual(self.client.get('/api/leave-requests/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        LeaveRequest.objects.first().delete()
+        self.assertEqual(self.client.get('/api/leave-requests/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200)
+
+    def test_employee_leave_balances(self):
+        url = f'/api/leave-balances/{self.employee.id}/'
+        response = self.client.get(url)
+        # the validators are cached with the balances --> NO query
+        self.assertEqual(self.revalidate(url, response, 0).status_code, 304)
+
+        balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        self.assertTrue(balance.reduce_days(2))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['ANNUAL']['used_days'], 2)
+
+    def test_invalid_params_have_no_validators(self):
+        response = self.client.get('/api/leave-requests/?status=unknown')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+
+
+# -------------------------🔸 Async views (ASGI) 🔸-------------------------
+class AsyncViewsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        create_leave_requests(self.employee, self.leave_type, 3)
+
+    def get(self, url, user):
+        cache.clear()
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access_token(user)}')
+
+    def test_same_payload_as_sync_views(self):
+        for user in (self.admin.user, self.employee.user):
+            sync = self.get('/api/dashboard/stats/', user)
+            response = self.get('/api/async/dashboard/stats/', user)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), sync.json())
+
+        sync = self.get(f'/api/leave-balances/{self.employee.id}/', self.admin.user)
+        response = self.get(f'/api/async/leave-balances/{self.employee.id}/', self.admin.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), sync.json())
+
+    def test_employee_leave_balances(self):
+        url = f'/api/async/leave-balances/{self.employee.id}/'
+        response = self.get(url, self.admin.user)
+        # cached with its validators --> 304 with NO query
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        self.assertEqual(self.get('/api/async/leave-balances/999999/', self.admin.user).status_code, 404)
+
+    def test_drf_handlers(self):
+        self.assertEqual(self.client.options('/api/async/dashboard/stats/').status_code, 200)
+        self.assertEqual(self.client.post('/api/async/dashboard/stats/').status_code, 405)
+
+
+class AsyncConcurrentQueriesTests(TransactionTestCase):
+    serialized_rollback = True # keep the leave types of the data migration
+
+    def test_queries_run_at_the_same_time(self):
+        # both queries must be running to pass the barrier (one after another --> BrokenBarrierError)
+        barrier = threading.Barrier(2, timeout=5)
+
+        def query():
+            barrier.wait()
+            return LeaveType.objects.count(), threading.get_ident()
+
+        (first, first_thread), (second, second_thread) = async_to_sync(run_queries)([query, query])
+        self.assertEqual(first, second)
+        self.assertNotEqual(first_thread, second_thread)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_wsgi_vs_asgi_benchmark(self):
+        generate_org(employees=10, leave_requests=50, seed=1)
+        report = run_asgi_benchmarks(concurrency=4, requests=8, cold_cache=True)
+
+        self.assertEqual({result['name'] for result in report['routes']}, {'dashboard-stats', 'employee-leave-balances'})
+        for result in report['routes']:
+            self.assertEqual(result['wsgi']['status'], [200])
+            self.assertEqual(result['asgi']['status'], [200])
+            self.assertGreater(result['speedup'], 0)
+        json.dumps(report)
+
+
+# -------------------------🔸 Overlap detection 🔸-------------------------
+class LeaveRequestOverlapTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.employee = create_employee('employee')
+        self.other = create_employee('other')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        self.existing = LeaveRequest.objects.create(
+            employee=self.employee, leave_type=self.leave_type,
+            start_date=date(2025, 3, 10), end_date=date(2025, 3, 14), reason='trip', status='pending',
+        )
+
+    def create(self, start_date, end_date, employee=None):
+        return self.client.post('/api/leave-requests/', {
+            'employee': (employee or self.employee).id,
+            'leave_type': self.leave_type.id,
+            'start_date': start_date,
+            'end_date': end_date,
+            'reason': 'new',
+        }, content_type='application/json')
+
+    def test_overlapping_queryset(self):
+        overlapping = LeaveRequest.objects.filter(employee=self.employee).overlapping
+        self.assertTrue(overlapping(date(2025, 3, 14), date(2025, 3, 20)).exists()) # same last day
+        self.assertTrue(overlapping(date(2025, 3, 11), date(2025, 3, 12)).exists()) # inside
+        self.assertFalse(overlapping(date(2025, 3, 15), date(2025, 3, 20)).exists())
+        self.assertFalse(overlapping(date(2025, 3, 1), date(2025, 3, 9)).exists())
+
+    def test_create_rejects_overlap(self):
+        response = self.create('2025-03-12', '2025-03-18')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.existing.id), response.json()['non_field_errors'][0])
+        self.assertEqual(LeaveRequest.objects.count(), 1)
+
+    def test_create_allows_other_periods_and_employees(self):
+        self.assertEqual(self.create('2025-03-15', '2025-03-16').status_code, 201)
+        self.assertEqual(self.create('2025-03-10', '2025-03-14', employee=self.other).status_code, 201)
+
+    def test_rejected_request_does_not_conflict(self):
+        LeaveRequest.objects.filter(id=self.existing.id).update(status='rejected')
+        self.assertEqual(self.create('2025-03-10', '2025-03-14').status_code, 201)
+
+    def test_update_does_not_conflict_with_itself(self):
+        response = self.client.put(f'/api/leave-requests/{self.existing.id}/edit/', {
+            'employee': self.employee.id,
+            'leave_type': self.leave_type.id,
+            'start_date': '2025-03-11',
+            'end_date': '2025-03-15',
+            'reason': 'trip',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_conflicts_endpoint(self):
+        url = f'/api/leave-requests/conflicts/?employee={self.employee.id}&start_date=2025-03-01&end_date=2025-03-10'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['has_conflicts'])
+        self.assertEqual([row['id'] for row in response.json()['conflicts']], [self.existing.id])
+        self.assertEqual(len(queries), 1)
+
+        response = self.client.get(f'{url}&exclude={self.existing.id}')
+        self.assertFalse(response.json()['has_conflicts'])
+
+        response = self.client.get(f'/api/leave-requests/conflicts/?employee={self.employee.id}&start_date=2025-03-10&end_date=2025-03-01')
+        self.assertEqual(response.status_code, 400)
+
+    def rejected(self, start_date, end_date):
+        return LeaveRequest.objects.create(
+            employee=self.employee, leave_type=self.leave_type,
+            start_date=start_date, end_date=end_date, reason='old', status='rejected',
+        )
+
+    def test_rejected_request_can_not_be_reopened_over_another(self):
+        admin = create_employee('admin', role='admin', department='HR')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {access_token(admin.user)}'
+        rejected = self.rejected(date(2025, 3, 12), date(2025, 3, 13))
+
+        for action in ('approve', 'pending'):
+            response = self.client.patch(f'/api/leave-requests/{rejected.id}/{action}/')
+            self.assertEqual(response.status_code, 409, response.content)
+            self.assertEqual(response.json()['conflicts'], [self.existing.id])
+        rejected.refresh_from_db()
+        self.assertEqual(rejected.status, 'rejected')
+        self.assertFalse(LeaveHistory.objects.filter(leave_request=rejected).exists())
+
+        # once the other one is rejected the period is free again
+        self.client.patch(f'/api/leave-requests/{self.existing.id}/reject/')
+        self.assertEqual(self.client.patch(f'/api/leave-requests/{rejected.id}/approve/').status_code, 200)
+
+    def test_bulk_reopen_skips_overlaps(self):
+        admin = create_employee('admin', role='admin', department='HR')
+        overlapping = self.rejected(date(2025, 3, 14), date(2025, 3, 16))
+        free = self.rejected(date(2025, 4, 1), date(2025, 4, 3))
+        # overlaps `free`, which is reopened first in the same batch
+        late = self.rejected(date(2025, 4, 3), date(2025, 4, 4))
+
+        response = self.client.patch('/api/leave-requests/bulk/', {
+            'ids': [overlapping.id, free.id, late.id], 'action': 'pending',
+        }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access_token(admin.user)}')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['updated'], 1)
+        results = {result['leave_request_id']: result for result in response.json()['results']}
+        self.assertEqual(results[overlapping.id], {
+            'leave_request_id': overlapping.id, 'result': 'overlap', 'status': 'rejected', 'conflicts': [self.existing.id],
+        })
+        self.assertEqual(results[free.id]['result'], 'updated')
+        self.assertEqual(results[late.id]['conflicts'], [free.id])
+        self.assertEqual(
+            dict(LeaveRequest.objects.filter(id__in=results).values_list('id', 'status')),
+            {overlapping.id: 'rejected', free.id: 'pending', late.id: 'rejected'},
+        )
+
+    @skipUnless(connection.vendor == 'postgresql', 'exclusion constraints are PostgreSQL only')
+    def test_database_refuses_overlap(self):
+        with self.assertRaises(IntegrityError) as error, transaction.atomic():
+            LeaveRequest.objects.create(
+                employee=self.employee, leave_type=self.leave_type,
+                start_date=date(2025, 3, 14), end_date=date(2025, 3, 15), reason='race', status='pending',
+            )
+        self.assertTrue(LeaveRequest.is_overlap_error(error.exception))
+        self.rejected(date(2025, 3, 14), date(2025, 3, 15)) # rejected requests do NOT count
+
+    @skipUnless(connection.vendor == 'postgresql', 'exclusion constraints are PostgreSQL only')
+    def test_request_that_passed_the_check_is_refused_with_400(self):
+        # two requests at the same time: both pass `validate()`, the constraint refuses the second one
+        with mock.patch.object(LeaveRequestSerializer, 'validate', lambda serializer, attrs: attrs):
+            response = self.create('2025-03-12', '2025-03-18')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn(str(self.existing.id), response.json()['non_field_errors'][0])
+        self.assertEqual(LeaveRequest.objects.count(), 1)
+
+
+# -------------------------🔸 Absence calendar 🔸-------------------------
+class AbsenceCalendarTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin', department='HR')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        self.leave_request = LeaveRequest.objects.create(
+            employee=self.employee, leave_type=self.leave_type,
+            start_date=date(2025, 3, 10), end_date=date(2025, 3, 12), reason='trip', status='pending',
+        )
+
+        token = access_token(self.admin.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def days(self, department='IT'):
+        return set(AbsenceDay.objects.filter(department=department).values_list('date', flat=True))
+
+    def test_days_follow_the_status(self):
+        self.assertEqual(self.days(), set())
+
+        self.client.patch(f'/api/leave-requests/{self.leave_request.id}/approve/')
+        self.assertEqual(self.days(), {date(2025, 3, 10), date(2025, 3, 11), date(2025, 3, 12)})
+
+        self.client.patch(f'/api/leave-requests/{self.leave_request.id}/pending/')
+        self.assertEqual(self.days(), set())
+
+        self.client.patch('/api/leave-requests/bulk/', {'ids': [self.leave_request.id], 'action': 'approved'}, content_type='application/json')
+        self.assertEqual(len(self.days()), 3)
+
+        self.client.patch('/api/leave-requests/bulk/', {'ids': [self.leave_request.id], 'action': 'rejected'}, content_type='application/json')
+        self.assertEqual(self.days(), set())
+
+    def test_days_follow_dates_and_department(self):
+        self.leave_request.status = 'approved'
+        self.leave_request.save()
+        self.leave_request.end_date = date(2025, 3, 10)
+        self.leave_request.save()
+        self.assertEqual(self.days(), {date(2025, 3, 10)})
+
+        self.employee.department = 'QA'
+        self.employee.save()
+        self.assertEqual(self.days('QA'), {date(2025, 3, 10)})
+
+    def test_days_follow_the_employee(self):
+        self.leave_request.status = 'approved'
+        self.leave_request.save()
+        other = create_employee('other', department='QA')
+
+        leave_request = LeaveRequest.objects.get(id=self.leave_request.id)
+        leave_request.employee = other
+        leave_request.save()
+        self.assertEqual(self.days(), set())
+        self.assertEqual(set(AbsenceDay.objects.filter(department='QA').values_list('employee_id', flat=True)), {other.id})
+
+    def test_calendar(self):
+        self.client.patch(f'/api/leave-requests/{self.leave_request.id}/approve/')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/calendar/?department=IT&start_date=2025-03-09&end_date=2025-03-11')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+
+        days = response.json()['days']
+        self.assertEqual([day['count'] for day in days], [0, 1, 1])
+        self.assertEqual(days[1]['employees'][0]['employee_id'], self.employee.id)
+        self.assertEqual(days[1]['employees'][0]['leave_type'], 'ANNUAL')
+
+        response = self.client.get('/api/calendar/?department=IT&start_date=2025-03-09&end_date=2026-03-11')
+        self.assertEqual(response.status_code, 400)
+
+
+# -------------------------🔸 Working-day calendar 🔸-------------------------
+@override_settings(GOLEAVE_WEEKMASK='1111001') # Sunday - Thursday
+class WorkdayCalendarTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        workdays.invalidate()
+
+    def test_weekends_and_holidays_are_not_counted(self):
+        # 2025-03-02 (Sunday) -> 2025-03-08 (Saturday): 5 working days
+        self.assertEqual(workdays.count(date(2025, 3, 2), date(2025, 3, 8)), 5)
+
+        PublicHoliday.objects.create(date=date(2025, 3, 4), name='Holiday')
+        self.assertEqual(workdays.count(date(2025, 3, 2), date(2025, 3, 8)), 4)
+        self.assertEqual(workdays.count(date(2025, 3, 7), date(2025, 3, 8)), 0)
+        self.assertEqual(workdays.count(date(2025, 3, 8), date(2025, 3, 2)), 0)
+
+    @override_settings(GOLEAVE_WEEKMASK='1111100') # Monday - Friday
+    def test_weekmask_setting(self):
+        self.assertEqual(workdays.count(date(2025, 3, 2), date(2025, 3, 8)), 5)
+        self.assertEqual(workdays.count(date(2025, 3, 7), date(2025, 3, 8)), 1)
+
+    def test_count_many_matches_count(self):
+        PublicHoliday.objects.create(date=date(2025, 12, 31), name='Holiday')
+        periods = [(date(2025, 12, 28), date(2026, 1, 4)), (date(2025, 3, 2), date(2025, 3, 2)), (date(2025, 3, 5), date(2025, 3, 1))]
+        counts = workdays.count_many([start for start, end in periods], [end for start, end in periods])
+        self.assertEqual(counts, [workdays.count(start, end) for start, end in periods])
+        self.assertEqual(counts, [5, 1, 0])
+
+    def test_calendar_is_compiled_once(self):
+        workdays.count(date(2025, 3, 2), date(2025, 3, 8))
+        with self.assertNumQueries(0):
+            workdays.count(date(2025, 4, 2), date(2025, 4, 8))
+
+    def test_total_days_and_recalculate_command(self):
+        employee = create_employee('employee')
+        leave_type = LeaveType.objects.get(type='ANNUAL')
+        leave_request = LeaveRequest.objects.create(
+            employee=employee, leave_type=leave_type,
+            start_date=date(2025, 3, 2), end_date=date(2025, 3, 8), reason='trip', status='pending',
+        )
+        self.assertEqual(leave_request.total_days, 5)
+
+        PublicHoliday.objects.create(date=date(2025, 3, 3), name='Holiday')
+        call_command('recalculate_total_days', stdout=io.StringIO())
+        leave_request.refresh_from_db()
+        self.assertEqual(leave_request.total_days, 4)
+
+
+# -------------------------🔸 Balances provisioning 🔸-------------------------
+class LeaveBalanceProvisioningTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        leave_types.invalidate()
+
+    def test_new_employee_gets_all_balances(self):
+        employee = create_employee('employee')
+        balances = LeaveBalance.objects.filter(employee=employee)
+        self.assertEqual(balances.count(), LeaveType.objects.count())
+        annual = balances.get(leave_type__type='ANNUAL')
+        self.assertEqual((annual.total_days, annual.used_days, annual.remaining_days), (30, 0, 30))
+
+    def test_new_leave_type_is_provisioned_for_all_employees(self):
+        employees = [create_employee(f'employee{i}') for i in range(3)]
+        LeaveType.objects.filter(type='SPECIAL').delete()
+        special = LeaveType.objects.create(type='SPECIAL', max_days_allowed=10)
+        for employee in employees:
+            self.assertEqual(LeaveBalance.objects.get(employee=employee, leave_type=special).remaining_days, 10)
+
+    def test_backfill_command(self):
+        employee = create_employee('employee')
+        LeaveBalance.objects.filter(employee=employee, leave_type__type='SICK').delete()
+        annual = LeaveBalance.objects.get(employee=employee, leave_type__type='ANNUAL')
+        annual.used_days = 4
+        annual.save()
+
+        call_command('provision_leave_balances', stdout=io.StringIO())
+        call_command('provision_leave_balances', stdout=io.StringIO()) # safe to run again
+
+        self.assertEqual(LeaveBalance.objects.filter(employee=employee).count(), LeaveType.objects.count())
+        annual.refresh_from_db()
+        self.assertEqual(annual.remaining_days, 26) # existing balances are NOT changed
+
+    def test_save_without_total_days(self):
+        employee = create_employee('employee')
+        balance = LeaveBalance.objects.get(employee=employee, leave_type__type='EMERGENCY')
+        balance.delete()
+        balance = LeaveBalance.objects.create(employee=employee, leave_type=balance.leave_type)
+        self.assertEqual((balance.total_days, balance.remaining_days), (3, 3))
+
+
+# -------------------------🔸 Yearly balances rollover 🔸-------------------------
+class BalanceRolloverTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        leave_types.invalidate()
+        self.annual = LeaveType.objects.get(type='ANNUAL')
+        self.annual.max_days_allowed = 30
+        self.annual.max_carry_over_days = 5
+        self.annual.save()
+        leave_types.invalidate()
+
+        self.balances = []
+        for i, used_days in enumerate([0, 28, 30]):
+            employee = create_employee(f'employee{i}')
+            self.balances.append(self.set_balance(employee, used_days, date(2025, 12, 31)))
+        # not expired yet
+        self.current = self.set_balance(create_employee('current'), 10, date(2026, 12, 31))
+
+    def set_balance(self, employee, used_days, reset_date):
+        balance = LeaveBalance.objects.get(employee=employee, leave_type=self.annual)
+        balance.used_days = used_days
+        balance.reset_date = reset_date
+        balance.save()
+        return balance
+
+    def values(self, balance):
+        balance.refresh_from_db()
+        return balance.total_days, balance.used_days, balance.remaining_days, balance.reset_date
+
+    def test_rollover_with_carry_over(self):
+        summary = rollover_balances(date(2026, 1, 1), chunk_size=2)
+
+        self.assertEqual(summary['processed'], 3)
+        self.assertEqual(summary['carried_over_days'], 5 + 2 + 0)
+        self.assertEqual(summary['forfeited_days'], 25)
+        self.assertEqual(self.values(self.balances[0]), (35, 0, 35, date(2026, 12, 31)))
+        self.assertEqual(self.values(self.balances[1]), (32, 0, 32, date(2026, 12, 31)))
+        self.assertEqual(self.values(self.balances[2]), (30, 0, 30, date(2026, 12, 31)))
+        self.assertEqual(self.values(self.current), (30, 10, 20, date(2026, 12, 31)))
+        self.assertIsNotNone(BalanceRolloverCheckpoint.objects.get(run_date=date(2026, 1, 1)).finished_at)
+
+        # running again does nothing
+        self.assertEqual(rollover_balances(date(2026, 1, 1))['processed'], 0)
+
+    def test_dry_run_does_not_write(self):
+        summary = rollover_balances(date(2026, 1, 1), dry_run=True)
+        self.assertEqual(summary['processed'], 3)
+        self.assertEqual(self.values(self.balances[1]), (30, 28, 2, date(2025, 12, 31)))
+        self.assertFalse(BalanceRolloverCheckpoint.objects.exists())
+
+    def test_resume_after_crash(self):
+        original = LeaveBalanceQuerySet.rollover
+        calls = []
+
+        def crash_on_second_chunk(queryset, leave_type, reset_date):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('crash')
+            return original(queryset, leave_type, reset_date)
+
+        with mock.patch.object(LeaveBalanceQuerySet, 'rollover', crash_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                rollover_balances(date(2026, 1, 1), chunk_size=2)
+
+        checkpoint = BalanceRolloverCheckpoint.objects.get()
+        self.assertEqual(checkpoint.last_balance_id, self.balances[1].id)
+        self.assertEqual(checkpoint.processed, 2)
+        self.assertEqual(self.values(self.balances[2]), (30, 30, 0, date(2025, 12, 31)))
+
+        summary = rollover_balances(date(2026, 1, 1), chunk_size=2)
+        self.assertEqual(summary['resumed_after_id'], self.balances[1].id)
+        self.assertEqual(summary['processed'], 1)
+        self.assertEqual(BalanceRolloverCheckpoint.objects.get().processed, 3)
+        self.assertEqual(self.values(self.balances[2]), (30, 0, 30, date(2026, 12, 31)))
+
+    def test_restart_resets_the_totals(self):
+        with mock.patch.object(LeaveBalanceQuerySet, 'rollover', side_effect=[1, RuntimeError('crash')], autospec=True):
+            with self.assertRaises(RuntimeError):
+                rollover_balances(date(2026, 1, 1), chunk_size=2)
+        self.assertEqual(BalanceRolloverCheckpoint.objects.get().processed, 2)
+
+        # the mock did NOT roll over the first chunk: all 3 balances are processed again, counted once
+        summary = rollover_balances(date(2026, 1, 1), chunk_size=2, restart=True)
+        checkpoint = BalanceRolloverCheckpoint.objects.get()
+        self.assertEqual(summary['processed'], 3)
+        self.assertEqual((checkpoint.processed, checkpoint.carried_over_days), (3, 7))
+
+
+# Many admins approving at the same time (needs a DB with row locks, e.g. PostgreSQL: the `postgres` CI job)
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentApprovalStressTests(TransactionTestCase):
+    serialized_rollback = True # keep the leave types of the data migration (flushed by the other `TransactionTestCase`)
+    THREADS = 8
+    REQUESTS = 80
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        # only 30 days for 80 requests of 2 days --> exactly 15 requests can be deducted
+        self.balance = LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type)
+        create_leave_requests(self.employee, self.leave_type, self.REQUESTS)
+
+    def test_parallel_approvals(self):
+        ids = list(LeaveRequest.objects.values_list('id', flat=True))
+        # every request is approved twice (by two different threads)
+        jobs = ids + ids
+        errors = []
+
+        def approve(leave_request_id):
+            try:
+                transition_leave_request(leave_request_id, 'approved', self.admin.user)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+            list(executor.map(approve, jobs))
+
+        self.assertEqual(errors, [])
+        self.balance.refresh_from_db()
+        self.assertEqual(self.balance.used_days, 30)
+        self.assertEqual(self.balance.remaining_days, 0)
+        self.assertEqual(LeaveRequest.objects.filter(status='approved').count(), self.REQUESTS)
+        self.assertEqual(LeaveHistory.objects.count(), self.REQUESTS)
+        self.assertEqual(LeaveRequest.objects.filter(is_warning_displayed=False).count(), 15)
+
+
+# A read from another connection before the commit sees the old rows (needs a DB where it does NOT wait for the lock, e.g. PostgreSQL)
+@skipUnlessDBFeature('has_select_for_update')
+class CacheInvalidationOnCommitTests(TransactionTestCase):
+    serialized_rollback = True # keep the leave types of the data migration
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        create_leave_requests(self.employee, self.leave_type, 1)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {access_token(self.admin.user)}'
+
+    def get_from_another_connection(self, url):
+        def get():
+            try:
+                return self.client.get(url).json()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(get).result()
+
+    def test_balance_read_before_the_commit_is_not_kept(self):
+        url = f'/api/leave-balances/{self.employee.id}/'
+        leave_request = LeaveRequest.objects.get()
+        with transaction.atomic():
+            transition_leave_request(leave_request.id, 'approved', self.admin.user)
+            # the deduction is not committed yet: the old balance is cached
+            self.assertEqual(self.get_from_another_connection(url)['ANNUAL']['used_days'], 0)
+
+        self.assertEqual(self.client.get(url).json()['ANNUAL']['used_days'], 2)
+
+
+# -------------------------🔸 Synthetic data & benchmarks 🔸-------------------------
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SyntheticDataAndBenchmarkTests(TestCase):
+
+    def snapshot(self):
+        return list(
+            LeaveRequest.objects.order_by('employee__user__username', 'start_date')
+            .values_list('employee__user__username', 'employee__department', 'leave_type__type', 'start_date', 'end_date', 'status', 'total_days')
+        )
+
+    def test_same_seed_same_data(self):
+        summary = generate_org(employees=20, leave_requests=200, seed=7, today=date(2025, 6, 1))
+        self.assertEqual((summary['employees'], summary['leave_requests']), (20, 200))
+        first = self.snapshot()
+
+        delete_org(7)
+        self.assertEqual(LeaveRequest.objects.count(), 0)
+        generate_org(employees=20, leave_requests=200, seed=7, today=date(2025, 6, 1))
+        self.assertEqual(self.snapshot(), first)
+
+        # realistic data: no overlapping requests, balances match the approved requests
+        for employee in Employee.objects.all():
+            periods = list(LeaveRequest.objects.filter(employee=employee).order_by('start_date').values_list('start_date', 'end_date'))
+            for (start_date, end_date), (next_start, next_end) in zip(periods, periods[1:]):
+                self.assertLess(end_date, next_start)
+        for balance in LeaveBalance.objects.all():
+            self.assertEqual(balance.remaining_days, balance.total_days - balance.used_days)
+        self.assertEqual(
+            AbsenceDay.objects.values('leave_request').distinct().count(),
+            LeaveRequest.objects.filter(status='approved').count(),
+        )
+
+    def test_benchmark_every_route(self):
+        generate_org(employees=10, leave_requests=50, seed=1)
+        report = run_benchmarks(iterations=2, warmup=0)
+
+        self.assertEqual(report['meta']['dataset']['leave_requests'], 50)
+        measured = {(result['method'], result['route']) for result in report['routes']}
+        self.assertIn(('GET', 'api/leave-requests/'), measured)
+        self.assertIn(('PATCH', 'api/leave-requests/<int:leave_request_id>/approve/'), measured)
+        self.assertIn(('POST', 'api/login/'), measured)
+        for result in report['routes']:
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
+            self.assertGreater(result['peak_memory_kb'], 0)
+        # the report is JSON
+        json.dumps(report)
+
+        # every call was rolled back
+        self.assertEqual(LeaveRequest.objects.count(), 50)
+        self.assertFalse(User.objects.filter(username__startswith='benchmark_').exists())
+
+
+# -------------------------🔸 Bulk employees import tests 🔸-------------------------
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EmployeeImportTests(TestCase):
+    HEADER = 'username,email,password,first_name,last_name,job_title,department,role,hire_date\n'
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_employee('admin', role='admin')
+        token = access_token(self.admin.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    def test_import_csv(self):
+        content = self.HEADER + (
+            'sara,sara@test.com,pass12345,Sara,Ali,Designer,DES,employee,2024-05-01\n'
+            'admin,admin@test.com,pass12345,Admin,User,Manager,HR,admin,2024-05-01\n'
+            'omar,omar@test.com,pass12345,Omar,Saad,Developer,UNKNOWN,employee,2024-05-01\n'
+            'nora,nora@test.com,pass12345,Nora,Fahad,Accountant,ACC,employee,05/01/2024\n'
+            'sara,sara2@test.com,pass12345,Sara,Two,Designer,DES,employee,2024-05-01\n'
+        )
+        response = self.client.post('/api/employees/import/', content, content_type='text/csv')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual([error['line'] for error in response.json()['errors']], [3, 4, 5, 6])
+
+        employee = Employee.objects.get(user__username='sara')
+        self.assertTrue(employee.user.check_password('pass12345'))
+        self.assertEqual(LeaveBalance.objects.filter(employee=employee).count(), LeaveType.objects.count())
+
+    def test_import_ndjson(self):
+        rows = [
+            {'username': f'user{i}', 'email': f'user{i}@test.com', 'password': 'pass12345', 'first_name': 'User', 'last_name': str(i),
+             'job_title': 'Developer', 'department': 'IT', 'role': 'employee', 'hire_date': '2024-01-01'}
+            for i in range(3)
+        ]
+        content = '\n'.join(json.dumps(row) for row in rows) + '\nnot json\n'
+        response = self.client.post('/api/employees/import/', content, content_type='application/x-ndjson')
+        self.assertEqual(response.json()['created'], 3)
+        self.assertEqual(response.json()['errors'][0]['line'], 4)
+
+    def test_hash_passwords_in_process_pool(self):
+        hashed = hash_passwords([f'password{i}' for i in range(MIN_ROWS_FOR_PROCESS_POOL)], workers=2)
+        self.assertTrue(check_password('password7', hashed[7]))
+
+    def test_only_admins_can_import(self):
+        employee = create_employee('employee')
+        token = access_token(employee.user)
+        response = self.client.post('/api/employees/import/', self.HEADER, content_type='text/csv', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 403)
+
+
+# -------------------------🔸 Request timing middleware 🔸-------------------------
+class RequestTimingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.admin = create_employee('admin', role='admin')
+        create_leave_requests(self.admin, LeaveType.objects.get(type='ANNUAL'), 3)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {access_token(self.admin.user)}'
+
+    def server_timing(self, response):
+        # 'db;dur=1.2;desc="3 queries", auth;dur=0.1, ...' --> {'db': 1.2, 'auth': 0.1, ...}
+        return {
+            metric.split(';')[0]: float(re.search(r'dur=([\d.]+)', metric).group(1))
+            for metric in response['Server-Timing'].split(', ')
+        }
+
+    def test_off_by_default(self):
+        response = self.client.get('/api/leave-requests/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(GOLEAVE_REQUEST_TIMING=True, GOLEAVE_SLOW_REQUEST_MS=60000)
+    def test_server_timing_header_and_log(self):
+        with self.assertLogs('goleave.requests', level='INFO') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/leave-requests/')
+
+        self.assertEqual(response.status_code, 200)
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'auth', 'serializer', 'view', 'total'})
+        self.assertGreater(timing['serializer'], 0)
+        self.assertLessEqual(timing['view'], timing['total'])
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'LeaveRequestListCreateView')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['sql_queries'], len(queries))
+        self.assertNotIn('top_sql', record)
+
+    @override_settings(GOLEAVE_REQUEST_TIMING=True, GOLEAVE_SLOW_REQUEST_MS=0, GOLEAVE_SLOW_REQUEST_TOP_SQL=2)
+    def test_slow_request_logs_top_sql(self):
+        with self.assertLogs('goleave.requests', level='WARNING') as logs:
+            self.client.get('/api/leave-requests/')
+
+        record = logs.records[0].timing
+        self.assertTrue(record['slow'])
+        self.assertTrue(0 < len(record['top_sql']) <= 2)
+        self.assertEqual(sorted(record['top_sql'], key=lambda statement: -statement['ms']), record['top_sql'])
+        self.assertIn('SELECT', record['top_sql'][0]['sql'])
+
+
+# -------------------------🔸 Prometheus metrics 🔸-------------------------
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.admin = create_employee('admin', role='admin')
+        self.employee = create_employee('employee')
+        self.leave_type = LeaveType.objects.get(type='ANNUAL')
+        create_leave_requests(self.employee, self.leave_type, 2)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {access_token(self.admin.user)}'
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def value(self, text, name, le=None, **labels):
+        # the histogram bucket (`le`) is the last label
+        prefix = f'{name}{format_labels(labels_key(labels), **({"le": le} if le else {}))} '
+        for line in text.splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        return None
+
+    def test_request_latency_histogram_by_view_and_status(self):
+        self.client.get('/api/leave-requests/')
+        self.client.get('/api/leave-requests/')
+        self.client.patch('/api/leave-requests/999999/approve/')
+
+        text = self.scrape()
+        self.assertIn('# TYPE goleave_http_request_duration_seconds histogram', text)
+        ok = {'view': 'LeaveRequestListCreateView', 'method': 'GET', 'status': '200'}
+        self.assertEqual(self.value(text, 'goleave_http_request_duration_seconds_count', **ok), 2)
+        self.assertEqual(self.value(text, 'goleave_http_request_duration_seconds_bucket', **ok, le='+Inf'), 2)
+        self.assertGreater(self.value(text, 'goleave_http_request_duration_seconds_sum', **ok), 0)
+        self.assertEqual(self.value(
+            text, 'goleave_http_request_duration_seconds_count', view='ApproveLeaveRequestView', method='PATCH', status='404'
+        ), 1)
+
+    def test_transitions_and_balance_deductions(self):
+        first, second = LeaveRequest.objects.order_by('id')
+        LeaveBalance.objects.filter(employee=self.employee, leave_type=self.leave_type).update(remaining_days=3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/leave-requests/{first.id}/approve/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/leave-requests/bulk/', {'ids': [second.id], 'action': 'approved'}, content_type='application/json')
+        self.client.patch(f'/api/leave-requests/{first.id}/reject/')
+        self.client.patch(f'/api/leave-requests/{first.id}/reject/') # already rejected --> NOT counted
+
+        text = self.scrape()
+        self.assertEqual(self.value(text, 'goleave_leave_request_transitions_total', action='approved', source='single'), 1)
+        self.assertEqual(self.value(text, 'goleave_leave_request_transitions_total', action='approved', source='bulk'), 1)
+        self.assertEqual(self.value(text, 'goleave_leave_request_transitions_total', action='rejected', source='single'), 1)
+        self.assertEqual(self.value(text, 'goleave_leave_request_transition_duration_seconds_count', action='rejected', source='single'), 2)
+        # 3 remaining days: the first request (2 days) is deducted, the second one does NOT fit
+        self.assertEqual(self.value(text, 'goleave_balance_deductions_total', result='deducted'), 1)
+        self.assertEqual(self.value(text, 'goleave_balance_deductions_total', result='failed'), 1)
+
+    def test_workers_are_added_up(self):
+        other_worker = Metrics()
+        other_worker.inc('goleave_balance_deductions_total', 5, result='failed')
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(GOLEAVE_METRICS_DIR=directory):
+            # another worker process wrote its numbers in the shared directory
+            with open(os.path.join(directory, 'metrics-999999999.json'), 'w') as file:
+                json.dump(other_worker.snapshot(), file)
+
+            metrics.inc('goleave_balance_deductions_total', 2, result='failed')
+            text = self.scrape()
+            self.assertTrue(os.path.exists(metrics.path()))
+
+        self.assertEqual(self.value(text, 'goleave_balance_deductions_total', result='failed'), 7)
+
+    def test_pool_numbers_of_running_workers_only(self):
+        def pool_samples(connections):
+            return lambda: [('goleave_db_pool_connections', {'database': 'default'}, connections)]
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(GOLEAVE_METRICS_DIR=directory):
+            # a running worker (the parent process) and a dead one
+            for pid, worker in ((os.getppid(), Metrics([pool_samples(3)])), (999999999, Metrics([pool_samples(4)]))):
+                with open(os.path.join(directory, f'metrics-{pid}.json'), 'w') as file:
+                    json.dump(worker.snapshot(), file)
+
+            with mock.patch.object(metrics, 'collectors', [pool_samples(2)]):
+                text = self.scrape()
+
+        self.assertIn('# TYPE goleave_db_pool_connections gauge', text)
+        self.assertEqual(self.value(text, 'goleave_db_pool_connections', database='default'), 5)
+
+    @skipUnless(connection.settings_dict['OPTIONS'].get('pool'), 'needs a connection pool (psycopg 3)')
+    def test_connection_pool(self):
+        self.client.get('/api/leave-requests/')
+        text = self.scrape()
+        self.assertGreaterEqual(self.value(text, 'goleave_db_pool_requests_total', database='default'), 1)
+        self.assertGreaterEqual(self.value(text, 'goleave_db_pool_connections', database='default'), 1)
+        self.assertEqual(
+            self.value(text, 'goleave_db_pool_max_connections', database='default'),
+            connection.settings_dict['OPTIONS']['pool'].get('max_size', connection.settings_dict['OPTIONS']['pool'].get('min_size', 4)),
+        )
+
+    @override_settings(GOLEAVE_METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.client.defaults['HTTP_AUTHORIZATION'] = 'Bearer secret'
+        self.scrape()
+
+
+# -------------------------🔸 Read replicas 🔸-------------------------
+# NO DB (`SimpleTestCase`): the middleware only decides where the reads go, we check the router answer inside the "view"
+@override_settings(GOLEAVE_READ_REPLICAS=['replica'], GOLEAVE_REPLICA_STICKY_SECONDS=10)
+class ReadReplicaTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReadReplicaRouter()
+        self.middleware = ReplicaStickinessMiddleware(self.view)
+
+    def view(self, request):
+        self.read_from = self.router.db_for_read(LeaveRequest)
+        self.cache_timeout = replica_cache_timeout(300)
+        self.may_lag = replica_may_lag(time.time() - 5), replica_may_lag(time.time() - 60)
+        return HttpResponse()
+
+    def request(self, method, user_id=None, issued_seconds_ago=60):
+        headers = {}
+        if user_id is not None:
+            token = AccessToken()
+            token['user_id'] = user_id
+            token['iat'] = int(time.time()) - issued_seconds_ago
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        return getattr(RequestFactory(), method)('/api/dashboard/stats/', **headers)
+
+    def call(self, method, user_id=None, issued_seconds_ago=60):
+        self.middleware(self.request(method, user_id, issued_seconds_ago))
+        return self.read_from
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.call('get', user_id=1), 'replica')
+        # cached entries read from a replica live at most the sticky time
+        self.assertEqual(self.cache_timeout, 10)
+        # a change of 5 seconds ago may not be on the replica yet, one of 60 seconds ago is
+        self.assertEqual(self.may_lag, (True, False))
+        self.assertEqual(self.call('get'), 'replica') # anonymous
+        # outside a request --> no opinion (primary)
+        self.assertIsNone(self.router.db_for_read(LeaveRequest))
+        self.assertEqual(self.router.db_for_write(LeaveRequest), 'default')
+        self.assertEqual(replica_cache_timeout(300), 300)
+        self.assertFalse(replica_may_lag(time.time()))
+
+    def test_read_your_writes(self):
+        self.assertIsNone(self.call('patch', user_id=1))
+        # the same user reads from the primary, the others still from the replica
+        self.assertIsNone(self.call('get', user_id=1))
+        self.assertEqual(self.call('get', user_id=2), 'replica')
+
+        cache.delete(pin_key(1)) # sticky time is over
+        self.assertEqual(self.call('get', user_id=1), 'replica')
+
+        # just logged in (maybe right after signup): new token --> primary
+        self.assertIsNone(self.call('get', user_id=3, issued_seconds_ago=1))
+
+    def test_async_requests(self):
+        async def view(request):
+            return self.view(request)
+
+        middleware = ReplicaStickinessMiddleware(view)
+        async_to_sync(middleware)(self.request('get', user_id=5))
+        self.assertEqual(self.read_from, 'replica')
+        async_to_sync(middleware)(self.request('post', user_id=5))
+        self.assertIsNone(self.read_from)
+        self.assertIsNotNone(cache.get(pin_key(5)))
+
+    @override_settings(GOLEAVE_READ_REPLICAS=[])
+    def test_off_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaStickinessMiddleware(self.view)
+
+
+# -------------------------🔸 Claims-based JWT tests 🔸-------------------------
+class ClaimsJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        self.employee = create_employee('employee')
+        self.employee.user.set_password('pass12345')
+        self.employee.user.save()
+
+    def test_login_token_has_claims(self):
+        response = self.client.post('/api/login/', {'username': 'employee', 'password': 'pass12345'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        token = AccessToken(response.json()['access'])
+        self.assertEqual(token['employee_id'], self.employee.id)
+        self.assertEqual(token['role'], 'employee')
+
+    def test_user_is_loaded_only_when_used(self):
+        user = ClaimsJWTAuthentication().get_user(access_token(self.employee.user))
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_authenticated)
+            self.assertEqual(user.id, self.employee.user.id)
+            self.assertEqual(get_user_role(user), 'employee')
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, 'employee')
+
+    def test_old_token_without_claims(self):
+        user = ClaimsJWTAuthentication().get_user(AccessToken.for_user(self.employee.user))
+        self.assertEqual(get_user_role(user), 'employee')
+
+    def refresh(self, refresh_token):
+        return self.client.post('/api/token/refresh/', {'refresh': str(refresh_token)}, content_type='application/json')
+
+    def test_refresh_reads_the_role_again(self):
+        admin = create_employee('admin', role='admin')
+        refresh_token = GoLeaveTokenObtainPairSerializer.get_token(admin.user)
+
+        # demoted after the login: the refreshed access token is NOT admin anymore
+        admin.role = 'employee'
+        admin.save()
+        response = self.refresh(refresh_token)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(AccessToken(response.json()['access'])['role'], 'employee')
+
+        response = self.client.patch('/api/leave-requests/bulk/', {'ids': [1], 'action': 'rejected'}, content_type='application/json',
+                                     HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        self.assertEqual(response.status_code, 403)
+
+    def test_refresh_refuses_inactive_and_deleted_users(self):
+        refresh_token = GoLeaveTokenObtainPairSerializer.get_token(self.employee.user)
+
+        User.objects.filter(id=self.employee.user.id).update(is_active=False)
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+
+        self.employee.user.delete()
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
@@ -1,5 +1,6 @@
 from django.urls import path
-from .views import Home, UserListView, UserDetailView, EmployeeListCreateView, EmployeeDetailView, EmployeeUpdateView, EmployeeDeleteView, LeaveTypeListView, LeaveTypeUpdateView, LeaveRequestListCreateView, LeaveRequestDetailView, LeaveRequestUpdateView, LeaveRequestDeleteView, ApproveLeaveRequestView, RejectLeaveRequestView, PendingLeaveRequestView, LeaveBalanceListView, LeaveBalanceByEmployeeView, SignupUserView, DashboardStatsView # EmployeeListView, EmployeeCreateView, LeaveRequestListView, LeaveRequestCreateView
+from .views import Home, UserListView, UserDetailView, EmployeeListCreateView, EmployeeImportView, EmployeeDetailView, EmployeeUpdateView, EmployeeDeleteView, LeaveTypeListView, LeaveTypeUpdateView, LeaveRequestListCreateView, LeaveRequestDetailView, LeaveRequestUpdateView, LeaveRequestDeleteView, ApproveLeaveRequestView, RejectLeaveRequestView, PendingLeaveRequestView, BulkLeaveRequestTransitionView, LeaveRequestConflictsView, LeaveBalanceListView, LeaveBalanceByEmployeeView, SignupUserView, DashboardStatsView, AbsenceCalendarView # EmployeeListView, EmployeeCreateView, LeaveRequestListView, LeaveRequestCreateView
+from .async_views import AsyncDashboardStatsView, AsyncLeaveBalanceByEmployeeView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
@@ -9,6 +10,7 @@ urlpatterns = [
     # path('employees/', EmployeeListView.as_view(), name='list-all-employees'),
     # path('employees/', EmployeeCreateView.as_view(), name='create-employee'),
     path('employees/', EmployeeListCreateView.as_view(), name='employees'),
+    path('employees/import/', EmployeeImportView.as_view(), name='import-employees'),
     path('employees/<int:employee_id>/', EmployeeDetailView.as_view(), name='display-employee-details'),
     path('employees/<int:employee_id>/edit/', EmployeeUpdateView.as_view(), name='update-employee'),
     path('employees/<int:employee_id>/delete/', EmployeeDeleteView.as_view(), name='delete-employee'),
@@ -17,6 +19,8 @@ urlpatterns = [
     # path('leave-requests/', LeaveRequestListView.as_view(), name='list-all-leave-requests'),
     # path('leave-requests/', LeaveRequestCreateView.as_view(), name='create-leave-request'),
     path('leave-requests/', LeaveRequestListCreateView.as_view(), name='leave-requests'),
+    path('leave-requests/bulk/', BulkLeaveRequestTransitionView.as_view(), name='bulk-leave-requests'),
+    path('leave-requests/conflicts/', LeaveRequestConflictsView.as_view(), name='leave-request-conflicts'),
     path('leave-requests/<int:leave_request_id>/', LeaveRequestDetailView.as_view(), name='display-leave-request-details'),
     path('leave-requests/<int:leave_request_id>/edit/', LeaveRequestUpdateView.as_view(), name='update-leave-request'),
     path('leave-requests/<int:leave_request_id>/delete/', LeaveRequestDeleteView.as_view(), name='delete-leave-request'),
@@ -30,4 +34,9 @@ urlpatterns = [
     path('login/', TokenObtainPairView.as_view(), name='login'), # token obtain pair
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'), # get new access token
     path('dashboard/stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('calendar/', AbsenceCalendarView.as_view(), name='absence-calendar'),
+
+    # async versions (ASGI) of the read-heavy views
+    path('async/dashboard/stats/', AsyncDashboardStatsView.as_view(), name='async-dashboard-stats'),
+    path('async/leave-balances/<int:employee_id>/', AsyncLeaveBalanceByEmployeeView.as_view(), name='async-list-employee-leave-balances'),
 ]
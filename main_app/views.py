@@ -1,18 +1,32 @@
+import hmac
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
-from rest_framework.permissions import AllowAny, AllowAny, AllowAnyOrReadOnly
+from rest_framework import status, serializers
+from rest_framework.permissions import AllowAny
 from .permissions import IsAdminUser, IsEmployeeUser
 
-from django.db.models import Count, Q
+from django.db.models import Count, F, Func, IntegerField, Q, Subquery
 from django.utils import timezone
 from datetime import timedelta
 
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
-
-from .models import User, Employee, LeaveType, LeaveRequest, LeaveHistory, LeaveBalance
-from .serializers import UserSerializer, EmployeeSerializer, LeaveTypeSerializer, LeaveRequestSerializer, LeaveBalanceSerializer
+from django.core.cache import cache
+from django.conf import settings
+from django.http import HttpResponse
+
+from .models import User, Employee, LeaveType, LeaveRequest, LeaveHistory, LeaveBalance, AbsenceDay
+from .serializers import UserSerializer, EmployeeSerializer, LeaveTypeSerializer, LeaveRequestSerializer, LeaveBalanceSerializer, BulkLeaveRequestTransitionSerializer, LeaveRequestConflictsQuerySerializer, LeaveRequestListQuerySerializer, AbsenceCalendarQuerySerializer
+from .services import transition_leave_request, bulk_transition_leave_requests, LeaveRequestOverlapError
+from .imports import IMPORT_FORMATS, parse_rows, import_employees
+from .pagination import LeaveRequestCursorPagination, UserCursorPagination, EmployeeCursorPagination, LeaveBalanceCursorPagination
+from .streaming import EXPORT_RENDERER_CLASSES, is_ndjson_request, ndjson_response
+from .registry import leave_types
+from .metrics import render_metrics, METRICS_CONTENT_TYPE
+from .conditional import conditional_get, queryset_watermark, objects_watermark, latest, last_modified_time, timestamp_datetime
+from .replicas import replica_cache_timeout, replica_may_lag
+from .cache import dashboard_stats_key, leave_balances_key, leave_requests_version, DASHBOARD_CACHE_TIMEOUT, LEAVE_BALANCES_CACHE_TIMEOUT
 
 # Create your views here.
 
@@ -26,15 +40,18 @@ class Home(APIView):
 
 class UserListView(APIView):
     permission_classes = [AllowAny]
+    renderer_classes = EXPORT_RENDERER_CLASSES
 
     def get(self, request):
         # Get all of users from the DB
         queryset = User.objects.all()
-        
-        # convert to a JSON using a serializer
-        serializer = UserSerializer(queryset, many=True)
 
-        return Response(serializer.data)
+        # `?format=ndjson` --> stream ALL users (used by HR nightly export)
+        if is_ndjson_request(request):
+            return ndjson_response(queryset.order_by('id'), UserSerializer)
+        
+        # return one page (cursor pagination) converted to a JSON using a serializer
+        return UserCursorPagination().paginate(queryset, request, self, UserSerializer)
 
 
 class UserDetailView(APIView):
@@ -57,15 +74,18 @@ class UserDetailView(APIView):
 
 class EmployeeListCreateView(APIView):
     permission_classes = [AllowAny]
+    renderer_classes = EXPORT_RENDERER_CLASSES
 
     def get(self, request):
-        # Get all of all employees from the DB
-        queryset = Employee.objects.all()
-        
-        # convert to a JSON using a serializer
-        serializer = EmployeeSerializer(queryset, many=True)
+        # Get all of all employees (with their users) from the DB
+        queryset = Employee.objects.with_user()
 
-        return Response(serializer.data)
+        # `?format=ndjson` --> stream ALL employees
+        if is_ndjson_request(request):
+            return ndjson_response(queryset.order_by('id'), EmployeeSerializer)
+        
+        # return one page (cursor pagination) converted to a JSON using a serializer
+        return EmployeeCursorPagination().paginate(queryset, request, self, EmployeeSerializer)
     
 
     def post(self, request):
@@ -112,13 +132,42 @@ class EmployeeListCreateView(APIView):
 #             return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class EmployeeImportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        # 1. Get the file (multipart `file` field) or the raw body (Content-Type: text/csv or application/x-ndjson)
+        is_multipart = (request.content_type or '').startswith('multipart/form-data')
+        upload = request.FILES.get('file') if is_multipart else None
+        content = upload.read() if upload else (b'' if is_multipart else request.body)
+        if not content:
+            return Response({'error': 'Please upload a CSV or NDJSON file!'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 2. Get the file format: `?type=csv|ndjson`, or from the file name / content type
+        file_format = request.query_params.get('type')
+        if not file_format:
+            name = upload.name if upload else ''
+            is_ndjson = name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (request.content_type or '')
+            file_format = 'ndjson' if is_ndjson else 'csv'
+        if file_format not in IMPORT_FORMATS:
+            return Response({'error': f'Unsupported file type: {file_format}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # 3. Import all rows (bad rows are reported and skipped)
+            result = import_employees(parse_rows(content, file_format))
+            return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST)
+
+        except Exception as error:
+            return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class EmployeeDetailView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, employee_id):
         try:
             # Get single Employee from the DB using her id
-            queryset = get_object_or_404(Employee, id=employee_id)
+            queryset = get_object_or_404(Employee.objects.with_user(), id=employee_id)
 
             # convert to a JSON using a serializer
             serializer = EmployeeSerializer(queryset)
@@ -137,7 +186,7 @@ class EmployeeUpdateView(APIView):
         try:
             # Get the single employee from the DB
             # Look up an employee in the DB and if it does not exist return a 404 
-            queryset = get_object_or_404(Employee, id=employee_id)
+            queryset = get_object_or_404(Employee.objects.with_user(), id=employee_id)
             # Overwrite it with the new data
             serializer = EmployeeSerializer(queryset, data=request.data)
             # save it!
@@ -169,9 +218,15 @@ class EmployeeDeleteView(APIView):
 class LeaveTypeListView(APIView):
     permission_classes = [AllowAny]
 
+    def get_validators(self, request):
+        # watermark of the leave types registry (NO DB query)
+        last_change, count = objects_watermark(leave_types.all())
+        return (last_change, count), last_modified_time(last_change, 'leavetype')
+
+    @conditional_get
     def get(self, request):
-        # Get all of all leave types from the DB
-        queryset = LeaveType.objects.all()
+        # Get all of all leave types from the registry (NO DB query)
+        queryset = leave_types.all()
         
         # convert to a JSON using a serializer
         serializer = LeaveTypeSerializer(queryset, many=True)
@@ -203,14 +258,57 @@ class LeaveRequestListCreateView(APIView):
     permission_classes = [AllowAny]
 
     # List Leave Requests
-    def get(self, request):
-        # Get all of all leave requests from the DB
+    # ?status=&employee=&leave_type=&department=&start_date=&end_date=&ordering=&fields=&expand= (all optional)
+    def get_validators(self, request):
+        # 1. Validate the filters, the sort key and the fields
+        self.query = LeaveRequestListQuerySerializer(data=request.query_params)
+        if not self.query.is_valid():
+            return None, None
+        params = self.query.validated_data
+        self.fields, self.expand = LeaveRequestSerializer.sparse_fieldset(request.query_params)
+        payload_fields = LeaveRequestSerializer(fields=self.fields, expand=self.expand).fields
+
+        # 2. The leave requests that match the filters, in SQL (NOT read yet)
         queryset = LeaveRequest.objects.all()
-        
-        # convert to a JSON using a serializer
-        serializer = LeaveRequestSerializer(queryset, many=True)
+        for field in ('status', 'employee', 'leave_type'):
+            if field in params:
+                queryset = queryset.filter(**{field: params[field]})
+        if 'department' in params:
+            queryset = queryset.filter(employee__department=params['department'])
+        if 'start_date' in params:
+            queryset = queryset.filter(end_date__gte=params['start_date'])
+        if 'end_date' in params:
+            queryset = queryset.filter(start_date__lte=params['end_date'])
+        self.queryset = queryset
+
+        # 3. Version stamp of ALL the leave requests and their employees (NO query, changed by every write)
+        # + the leave types when they are in the payload
+        # NOTE: `auth_user` is NOT tracked, a changed name or email does NOT change the ETag
+        version, changed_at = leave_requests_version()
+        if replica_may_lag(changed_at):
+            return None, None # the replica may still return the rows before the change
+        parts = (version,)
+        last_change = timestamp_datetime(changed_at)
+        if 'leave_type_details' in payload_fields:
+            types_change, types_count = objects_watermark(leave_types.all())
+            parts += (types_change, types_count)
+            last_change = latest(last_change, types_change)
+        return parts, last_modified_time(last_change, 'leavetype')
+
+    # `get_validators()` runs first: `304 Not Modified` if the client already has this page
+    @conditional_get
+    def get(self, request):
+        if self.query.errors:
+            return Response(self.query.errors, status=status.HTTP_400_BAD_REQUEST)
+        ordering = self.query.validated_data['ordering']
 
-        return Response(serializer.data)
+        # 4. Load only the columns and joins of the asked fields (+ the ordering column for the cursor)
+        queryset = LeaveRequestSerializer(fields=self.fields, expand=self.expand).restrict_queryset(self.queryset, ordering.lstrip('-'))
+
+        # 5. return one page (cursor pagination, in the asked order) converted to a JSON using a serializer
+        return LeaveRequestCursorPagination(ordering).paginate(
+            queryset, request, self, LeaveRequestSerializer, fields=self.fields, expand=self.expand
+        )
     
     # Create Leave Requests
     def post(self, request):
@@ -222,6 +320,10 @@ class LeaveRequestListCreateView(APIView):
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             # if any field is Invalid, return this
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # refused by the exclusion constraint (an overlapping request was saved at the same time)
+        except serializers.ValidationError as error:
+            return Response(error.detail, status=status.HTTP_400_BAD_REQUEST)
         
         except Exception as error:
             return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -256,16 +358,49 @@ class LeaveRequestListCreateView(APIView):
 #             return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class LeaveRequestConflictsView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # 1. Validate the query params: ?employee=1&start_date=2025-01-01&end_date=2025-01-05[&exclude=7]
+        serializer = LeaveRequestConflictsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        fields, expand = LeaveRequestSerializer.sparse_fieldset(request.query_params)
+
+        try:
+            # 2. Get the leave requests of this employee that overlap the period (ONE query on the range index)
+            queryset = LeaveRequest.objects.filter(employee_id=params['employee']).overlapping(params['start_date'], params['end_date'])
+            if params.get('exclude'):
+                queryset = queryset.exclude(id=params['exclude'])
+            queryset = LeaveRequestSerializer(fields=fields, expand=expand).restrict_queryset(queryset).order_by('start_date', 'id')
+
+            # 3. convert to a JSON using a serializer
+            serializer = LeaveRequestSerializer(queryset, many=True, fields=fields, expand=expand)
+
+            return Response({
+                'has_conflicts': bool(serializer.data),
+                'conflicts': serializer.data,
+            })
+
+        except Exception as error:
+            return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class LeaveRequestDetailView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, leave_request_id):
+        # `?fields=` / `?expand=` (optional)
+        fields, expand = LeaveRequestSerializer.sparse_fieldset(request.query_params)
         try:
-            # Get single Leave Request from the DB using her id
-            queryset = get_object_or_404(LeaveRequest, id=leave_request_id)
+            # Get single Leave Request from the DB using her id (only the columns of the asked fields)
+            serializer = LeaveRequestSerializer(fields=fields, expand=expand)
+            queryset = get_object_or_404(serializer.restrict_queryset(LeaveRequest.objects.all()), id=leave_request_id)
 
             # convert to a JSON using a serializer
-            serializer = LeaveRequestSerializer(queryset)
+            serializer = LeaveRequestSerializer(queryset, fields=fields, expand=expand)
 
             # return a Response
             return Response(serializer.data)
@@ -281,7 +416,7 @@ class LeaveRequestUpdateView(APIView):
         try:
             # Get the single leave request from the DB
             # Look up an leave request in the DB and if it does not exist return a 404 
-            queryset = get_object_or_404(LeaveRequest, id=leave_request_id)
+            queryset = get_object_or_404(LeaveRequest.objects.with_details(), id=leave_request_id)
             # Overwrite it with the new data
             serializer = LeaveRequestSerializer(queryset, data=request.data)
             # save it!
@@ -289,6 +424,10 @@ class LeaveRequestUpdateView(APIView):
                 serializer.save()
                 return Response(serializer.data, status=status.HTTP_200_OK)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # refused by the exclusion constraint (an overlapping request was saved at the same time)
+        except serializers.ValidationError as error:
+            return Response(error.detail, status=status.HTTP_400_BAD_REQUEST)
         
         except Exception as error:
             return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -315,30 +454,27 @@ class ApproveLeaveRequestView(APIView):
 
     def patch(self, request, leave_request_id):
         try:
-            # TODO:
-            # 1. Get the LeaveRequest object with ID
-            leave_request = get_object_or_404(LeaveRequest, id=leave_request_id)
-            
-            # 2. Update status to 'approved'
-            leave_request.status = 'approved'
-            
-            # 3. Save it to the DB
-            leave_request.save()
-            
-            # 4. Add new row on Leave History table
-            LeaveHistory.objects.create(
-                leave_request= leave_request,
-                action_type= 'approved',
-                action_by_user= request.user,
-                note= request.data.get('note', '')
+            # 1. Update status to 'approved' in one transaction (request + balance + Leave History)
+            leave_request, changed = transition_leave_request(
+                leave_request_id,
+                'approved',
+                request.user,
+                request.data.get('note', '')
             )
         
-            # 5. Return a response
+            # 2. Return a response
             return Response({
-                'message': 'Leave request approved successfully',
+                'message': 'Leave request approved successfully' if changed else 'Leave request is already approved',
                 'leave_request_id': leave_request.id,
                 'new_status': 'approved',
             }, status=status.HTTP_200_OK)
+
+        except LeaveRequest.DoesNotExist:
+            return Response({'error': f'Leave request {leave_request_id} not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        except LeaveRequestOverlapError as error:
+            # a rejected request that overlaps another request of the employee can NOT be reopened
+            return Response({'error': str(error), 'conflicts': error.conflict_ids}, status=status.HTTP_409_CONFLICT)
             
         except Exception as error:
             return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -349,30 +485,23 @@ class RejectLeaveRequestView(APIView):
 
     def patch(self, request, leave_request_id):
         try:
-            # TODO:
-            # 1. Get the LeaveRequest object with ID
-            leave_request = get_object_or_404(LeaveRequest, id=leave_request_id)
-            
-            # 2. Update status to 'rejected'
-            leave_request.status = 'rejected'
-            
-            # 3. Save it to the DB
-            leave_request.save()
-            
-            # 4. Add new row on Leave History table
-            LeaveHistory.objects.create(
-                leave_request= leave_request,
-                action_type= 'rejected',
-                action_by_user= request.user,
-                note= request.data.get('note', '')
+            # 1. Update status to 'rejected' in one transaction (request + Leave History)
+            leave_request, changed = transition_leave_request(
+                leave_request_id,
+                'rejected',
+                request.user,
+                request.data.get('note', '')
             )
         
-            # 5. Return a response
+            # 2. Return a response
             return Response({
-                'message': 'Leave request rejected successfully',
+                'message': 'Leave request rejected successfully' if changed else 'Leave request is already rejected',
                 'leave_request_id': leave_request.id,
                 'new_status': 'rejected',
             }, status=status.HTTP_200_OK)
+
+        except LeaveRequest.DoesNotExist:
+            return Response({'error': f'Leave request {leave_request_id} not found'}, status=status.HTTP_404_NOT_FOUND)
             
         except Exception as error:
             return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -383,48 +512,76 @@ class PendingLeaveRequestView(APIView):
 
     def patch(self, request, leave_request_id):
         try:
-            # TODO:
-            # 1. Get the LeaveRequest object with ID
-            leave_request = get_object_or_404(LeaveRequest, id=leave_request_id)
-            
-            # 2. Update status to 'pending'
-            leave_request.status = 'pending'
-            
-            # 3. Save it to the DB
-            leave_request.save()
-            
-            # 4. Add new row on Leave History table
-            LeaveHistory.objects.create(
-                leave_request= leave_request,
-                action_type= 'pending',
-                action_by_user= request.user,
-                note= request.data.get('note', '')
+            # 1. Update status to 'pending' in one transaction (request + Leave History)
+            leave_request, changed = transition_leave_request(
+                leave_request_id,
+                'pending',
+                request.user,
+                request.data.get('note', '')
             )
         
-            # 5. Return a response
+            # 2. Return a response
             return Response({
-                'message': 'Leave request pending successfully',
+                'message': 'Leave request pending successfully' if changed else 'Leave request is already pending',
                 'leave_request_id': leave_request.id,
                 'new_status': 'pending',
             }, status=status.HTTP_200_OK)
+
+        except LeaveRequest.DoesNotExist:
+            return Response({'error': f'Leave request {leave_request_id} not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        except LeaveRequestOverlapError as error:
+            # a rejected request that overlaps another request of the employee can NOT be reopened
+            return Response({'error': str(error), 'conflicts': error.conflict_ids}, status=status.HTTP_409_CONFLICT)
             
         except Exception as error:
             return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 
+class BulkLeaveRequestTransitionView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def patch(self, request):
+        # 1. Validate the body: { "ids": [1, 2, 3], "action": "approved" | "rejected" | "pending", "note": "" }
+        serializer = BulkLeaveRequestTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # 2. Change the status of all leave requests in one transaction
+            results = bulk_transition_leave_requests(
+                serializer.validated_data['ids'],
+                serializer.validated_data['action'],
+                request.user,
+                serializer.validated_data['note'],
+            )
+
+            # 3. Return a response with the result of every leave request
+            return Response({
+                'action': serializer.validated_data['action'],
+                'updated': sum(1 for result in results if result['result'] == 'updated'),
+                'results': results,
+            }, status=status.HTTP_200_OK)
+
+        except Exception as error:
+            return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class LeaveBalanceListView(APIView):
     permission_classes = [AllowAny]
+    renderer_classes = EXPORT_RENDERER_CLASSES
 
     def get(self, request):
         # TODO:
         # 1. Get all of all leave balances from the DB
         queryset = LeaveBalance.objects.all()
-        
-        # 2. convert to a JSON using a serializer
-        serializer = LeaveBalanceSerializer(queryset, many=True)
 
-        # 3. return a response
-        return Response(serializer.data)
+        # `?format=ndjson` --> stream ALL leave balances
+        if is_ndjson_request(request):
+            return ndjson_response(queryset.order_by('id'), LeaveBalanceSerializer)
+        
+        # 2. return one page (cursor pagination) converted to a JSON using a serializer
+        return LeaveBalanceCursorPagination().paginate(queryset, request, self, LeaveBalanceSerializer)
 
 
 # class LeaveBalanceByEmployeeView(APIView):
@@ -440,38 +597,74 @@ class LeaveBalanceListView(APIView):
 
 #         # 3. return a response
 #         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+# balances of one employee organized by leave type code (also used by `AsyncLeaveBalanceByEmployeeView`)
+def employee_balance_data(leave_balances):
+    balance_data = {}
+    for balance in leave_balances:
+        # Get the leave type from the registry (NO join)
+        leave_type = leave_types.get(balance.leave_type_id) or balance.leave_type
+        # compute the warning only once for each balance
+        warning_status, warning_message = balance.get_warning_status()
+        balance_data[leave_type.type] = {
+            'remaining_days': balance.remaining_days,
+            'used_days': balance.used_days,
+            'total_days': balance.total_days,
+            'max_days_allowed': leave_type.max_days_allowed,
+            'warning_status': warning_status,
+            'warning_message': warning_message
+        }
+    return balance_data
+
+
 class LeaveBalanceByEmployeeView(APIView):
     permission_classes= [AllowAny]
 
+    def get_validators(self, request, employee_id):
+        # the cached balances keep their validators, so a cached answer (200 or 304) needs NO DB query
+        self.cache_key = leave_balances_key(employee_id)
+        self.cached = cache.get(self.cache_key)
+        if self.cached is not None:
+            return self.cached['validators']
+
+        # watermark of his balances (ONE query on the (employee, is_active) index) + the leave types (`max_days_allowed`)
+        last_change, count = queryset_watermark(LeaveBalance.objects.filter(employee_id=employee_id, is_active=True), 'last_updated')
+        types_change, types_count = objects_watermark(leave_types.all())
+        self.validators = (
+            (last_change, count, types_change, types_count),
+            last_modified_time(latest(last_change, types_change), 'leavebalance', 'leavetype'),
+        )
+        return self.validators
+
+    @conditional_get
     def get(self, request, employee_id):  # 🔥 أضف employee_id هنا
-        try:
-            # استخدم employee_id من الـ URL بدل request.user
-            employee = Employee.objects.get(id=employee_id)
-            leave_balances = LeaveBalance.objects.filter(
-                employee=employee, 
-                is_active=True
-            ).select_related('leave_type')
-            
-            # organize balance_data by leave_types
-            balance_data = {}
-            for balance in leave_balances:
-                balance_data[balance.leave_type.type] = {
-                    'remaining_days': balance.remaining_days,
-                    'used_days': balance.used_days,
-                    'total_days': balance.total_days,
-                    'max_days_allowed': balance.leave_type.max_days_allowed,
-                    'warning_status': balance.get_warning_status()[0],
-                    'warning_message': balance.get_warning_status()[1]
-                }
-            
-            return Response(balance_data)
-            
-        except Employee.DoesNotExist:
+        # 1. Return the cached balances of this employee (removed when any of his balances is saved)
+        cache_key = self.cache_key
+        if self.cached is not None:
+            return Response(self.cached['data'])
+
+        # استخدم employee_id من الـ URL بدل request.user
+        leave_balances = LeaveBalance.objects.filter(
+            employee_id=employee_id, 
+            is_active=True
+        )
+        
+        # 2. organize balance_data by leave_types
+        balance_data = employee_balance_data(leave_balances)
+
+        # no balances, check if the employee exists
+        if not balance_data and not Employee.objects.filter(id=employee_id).exists():
             return Response(
                 {'error': 'Employee profile not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # 3. Save it in the cache (with the validators computed BEFORE reading the balances)
+        cache.set(cache_key, {'data': balance_data, 'validators': self.validators}, timeout=replica_cache_timeout(LEAVE_BALANCES_CACHE_TIMEOUT))
+        
+        return Response(balance_data)
+
 class SignupUserView(APIView):
     permission_classes = [AllowAny]
 
@@ -542,43 +735,143 @@ class SignupUserView(APIView):
         
 
 
+# `(SELECT COUNT(*) FROM ... WHERE ...)` of a queryset, to read many counters in one SELECT
+def count_subquery(queryset):
+    return Subquery(queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count'), output_field=IntegerField())
+
+
+# The dashboard stats of an employee: a list of functions, every one runs its query and returns a part of the stats
+# the queries do NOT depend on each other, so `AsyncDashboardStatsView` runs them at the same time.
+def dashboard_queries(employee):
+    if employee.role == 'admin':
+        # Get all counters in ONE query, every counter is a scalar subquery with its own index
+        # (NOT one join of all employees x all requests):
+        #   - pending --> partial index `WHERE status = 'pending'`
+        #   - approved this month --> (status, created_at) index, range from the first day of the month
+        month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+
+        def admin_counters():
+            return Employee.objects.filter(pk=employee.pk).values(
+                total_employees=count_subquery(Employee.objects.all()),
+                pending_requests=count_subquery(LeaveRequest.objects.filter(status='pending')),
+                approved_this_month=count_subquery(LeaveRequest.objects.filter(
+                    status='approved', created_at__gte=month_start, created_at__lt=next_month_start
+                )),
+            ).get()
+
+        def recent_requests():
+            queryset = LeaveRequest.objects.with_details().order_by('-created_at', '-id')[:5]
+            return {'recent_requests': LeaveRequestSerializer(queryset, many=True).data}
+
+        return [admin_counters, recent_requests]
+
+    # Get all counters of my requests in ONE query
+    def my_counters():
+        return LeaveRequest.objects.filter(employee=employee).aggregate(
+            total_requests=Count('id'),
+            approved_requests=Count('id', filter=Q(status='approved')),
+            pending_requests=Count('id', filter=Q(status='pending')),
+        )
+
+    def leave_balance():
+        balance = LeaveBalance.objects.filter(employee=employee).first()
+        return {'leave_balance': LeaveBalanceSerializer(balance).data if balance else None}
+
+    return [my_counters, leave_balance]
+
+
 class DashboardStatsView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
         user = request.user
-        employee = Employee.objects.filter(user=user).first()
+
+        # 1. Return the cached stats if nothing changed since the last load (zero DB queries)
+        cache_key = dashboard_stats_key(user.id)
+        stats = cache.get(cache_key)
+        if stats is not None:
+            return Response(stats)
+
+        employee = Employee.objects.filter(user_id=user.id).first()
+        if employee is None:
+            return Response(
+                {'error': 'Employee profile not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        if employee.role == 'admin':
-            total_employees = Employee.objects.count()
-            pending_requests = LeaveRequest.objects.filter(status='pending').count()
-            approved_this_month = LeaveRequest.objects.filter(
-                status='approved',
-                created_at__month=timezone.now().month
-            ).count()
-            
-            recent_requests = LeaveRequest.objects.select_related('employee__user').order_by('-created_at')[:5]
-            
-            stats = {
-                'total_employees': total_employees,
-                'pending_requests': pending_requests,
-                'approved_this_month': approved_this_month,
-                'recent_requests': LeaveRequestSerializer(recent_requests, many=True).data
-            }
-            
-        else:
-            my_requests = LeaveRequest.objects.filter(employee=employee)
-            total_requests = my_requests.count()
-            approved_requests = my_requests.filter(status='approved').count()
-            pending_requests = my_requests.filter(status='pending').count()
-            
-            leave_balance = LeaveBalance.objects.filter(employee=employee).first()
-            
-            stats = {
-                'total_requests': total_requests,
-                'approved_requests': approved_requests,
-                'pending_requests': pending_requests,
-                'leave_balance': LeaveBalanceSerializer(leave_balance).data if leave_balance else None
-            }
+        # 2. Run the queries of his role one after another
+        stats = {}
+        for query in dashboard_queries(employee):
+            stats.update(query())
+
+        # 3. Save the stats in the cache (removed when any leave request/history/balance is saved)
+        cache.set(cache_key, stats, timeout=replica_cache_timeout(DASHBOARD_CACHE_TIMEOUT))
         
-        return Response(stats)
\ No newline at end of file
+        return Response(stats)
+
+
+class AbsenceCalendarView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # 1. Validate the query params: ?department=IT&start_date=2025-01-01&end_date=2025-01-31
+        serializer = AbsenceCalendarQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        try:
+            # 2. Get who is out on every day of the period (ONE query on the (department, date) index)
+            absences = (
+                AbsenceDay.objects.for_department(params['department'], params['start_date'], params['end_date'])
+                .order_by('date', 'employee_id')
+                .values(
+                    'date', 'employee_id', 'leave_request_id', 'leave_request__leave_type_id',
+                    'employee__user__first_name', 'employee__user__last_name',
+                )
+            )
+
+            # 3. One entry for every day of the period (days without absences have `count: 0`)
+            days = {}
+            day = params['start_date']
+            while day <= params['end_date']:
+                days[day] = []
+                day += timedelta(days=1)
+
+            for absence in absences:
+                leave_type = leave_types.get(absence['leave_request__leave_type_id'])
+                days[absence['date']].append({
+                    'employee_id': absence['employee_id'],
+                    'name': f"{absence['employee__user__first_name']} {absence['employee__user__last_name']}".strip(),
+                    'leave_request_id': absence['leave_request_id'],
+                    'leave_type': leave_type.type if leave_type else None,
+                })
+
+            return Response({
+                'department': params['department'],
+                'start_date': params['start_date'],
+                'end_date': params['end_date'],
+                'days': [
+                    {'date': day, 'count': len(employees), 'employees': employees}
+                    for day, employees in days.items()
+                ],
+            })
+
+        except Exception as error:
+            return Response({'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# -------------------------🔸 Metrics (Prometheus) 🔸-------------------------
+# `GET /metrics` (scraped by Prometheus, NO JWT), protected by `GOLEAVE_METRICS_TOKEN` if it is set:
+# `Authorization: Bearer <GOLEAVE_METRICS_TOKEN>`
+class MetricsView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        token = getattr(settings, 'GOLEAVE_METRICS_TOKEN', None)
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse('Unauthorized\n', status=status.HTTP_401_UNAUTHORIZED, content_type='text/plain')
+
+        return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from .cache import VersionedLocalCopy
+
+# Working-day calendar
+# `total_days` of a leave request = number of working days between `start_date` and `end_date` (both included),
+# weekends (`GOLEAVE_WEEKMASK` setting) and public holidays (`PublicHoliday` table) are NOT counted.
+# Counting is done by NumPy `busday_count()` on arrays, so thousands of requests are counted in ONE call.
+# Every worker keeps the compiled calendars (one for every year range) in memory,
+# when a holiday is saved the version stamp in the cache changes and every worker compiles them again.
+
+WORKDAYS_VERSION_KEY = 'goleave:workdays:version'
+
+DEFAULT_WEEKMASK = '1111100' # Monday - Friday
+
+
+class WorkdayCalendar(VersionedLocalCopy):
+    version_key = WORKDAYS_VERSION_KEY
+
+    def __init__(self):
+        super().__init__()
+        self._calendars = {}
+
+    @property
+    def weekmask(self):
+        return getattr(settings, 'GOLEAVE_WEEKMASK', DEFAULT_WEEKMASK)
+
+    def _load(self, version):
+        # the calendars are compiled again on next use
+        self._calendars = {}
+
+    # Compiled calendar of the years [first_year, last_year] (weekmask + holidays of these years)
+    def calendar(self, first_year, last_year):
+        self._refresh()
+        key = (first_year, last_year, self.weekmask)
+        calendar = self._calendars.get(key)
+        if calendar is None:
+            from .models import PublicHoliday
+
+            holidays = self.from_primary(PublicHoliday.objects).filter(date__year__gte=first_year, date__year__lte=last_year).values_list('date', flat=True)
+            calendar = np.busdaycalendar(weekmask=self.weekmask, holidays=np.array(list(holidays), dtype='datetime64[D]'))
+            self._calendars = {**self._calendars, key: calendar}
+        return calendar
+
+    # Number of working days between two dates (both included)
+    def count(self, start_date, end_date):
+        if not start_date or not end_date or end_date < start_date:
+            return 0
+        calendar = self.calendar(start_date.year, end_date.year)
+        return int(np.busday_count(start_date, end_date + timedelta(days=1), busdaycal=calendar))
+
+    # Same as `count()` for many periods at once, returns a list of ints (same order)
+    def count_many(self, start_dates, end_dates):
+        if not start_dates:
+            return []
+        starts = np.array(start_dates, dtype='datetime64[D]')
+        ends = np.array(end_dates, dtype='datetime64[D]') + np.timedelta64(1, 'D')
+        calendar = self.calendar(int(starts.min().astype(object).year), int(ends.max().astype(object).year))
+        counts = np.busday_count(starts, ends, busdaycal=calendar)
+        # end before start --> 0 (`busday_count()` returns a negative number)
+        return np.maximum(counts, 0).tolist()
+
+    # `invalidate()` is called from `PublicHoliday.save()` / `PublicHoliday.delete()`
+
+
+workdays = WorkdayCalendar()